@@ -0,0 +1,242 @@
+import collections
+import os
+import struct
+import threading
+import time
+import uuid
+from Utils.FrameRing import jpeg_size
+from Utils.Metrics import metrics
+
+def _chunk(fourcc, data):
+    padding = b"\0" if len(data) % 2 else b""
+    return fourcc + struct.pack("<I", len(data)) + data + padding
+
+def _list(list_type, data):
+    return _chunk(b"LIST", list_type + data)
+
+def write_mjpeg_avi(path, jpeg_frames, fps):
+    """Écrit des JPEG déjà encodés dans un fichier AVI Motion-JPEG, sans réencodage.
+
+    Le fichier est écrit à côté puis renommé (jamais de vidéo à moitié écrite).
+    La taille de l'image est lue dans l'en-tête de la première frame.
+    """
+    width, height = jpeg_size(jpeg_frames[0])
+    count = len(jpeg_frames)
+    largest = max(len(frame) for frame in jpeg_frames)
+    rate = max(1, round(fps * 1000))  # dwRate / dwScale = fps
+
+    avih = struct.pack("<IIIIIIIIII4I", round(1e6 / fps), largest * round(fps + 1), 0, 0x10,
+                       count, 0, 1, largest, width, height, 0, 0, 0, 0)
+    strh = struct.pack("<4s4sIHHIIIIIIIIhhhh", b"vids", b"MJPG", 0, 0, 0, 0, 1000, rate, 0,
+                       count, largest, 0xFFFFFFFF, 0, 0, 0, width, height)
+    strf = struct.pack("<IiiHH4sIiiII", 40, width, height, 1, 24, b"MJPG", width * height * 3, 0, 0, 0, 0)
+    header = _list(b"hdrl", _chunk(b"avih", avih) +
+                   _list(b"strl", _chunk(b"strh", strh) + _chunk(b"strf", strf)))
+
+    movi = []
+    index = []
+    offset = 4  # Décalages de idx1 comptés depuis le type 'movi'
+    for frame in jpeg_frames:
+        chunk = _chunk(b"00dc", frame)
+        index.append(struct.pack("<4sIII", b"00dc", 0x10, offset, len(frame)))
+        movi.append(chunk)
+        offset += len(chunk)
+    movi_list = _list(b"movi", b"".join(movi))
+    body = b"AVI " + header + movi_list + _chunk(b"idx1", b"".join(index))
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as output:
+        output.write(b"RIFF" + struct.pack("<I", len(body)) + body)
+    os.replace(temp_path, path)
+
+class JpegRing:
+    """Dernières secondes d'un flux en JPEG, bornées en durée ET en octets."""
+
+    def __init__(self, seconds, max_bytes):
+        self.seconds = seconds
+        self.max_bytes = max_bytes
+        self.frames = collections.deque()  # (horodatage, octets JPEG)
+        self.bytes_used = 0
+
+    def append(self, timestamp, jpeg):
+        self.frames.append((timestamp, jpeg))
+        self.bytes_used += len(jpeg)
+        while self.frames and (timestamp - self.frames[0][0] > self.seconds
+                               or self.bytes_used > self.max_bytes):
+            self.bytes_used -= len(self.frames.popleft()[1])
+
+class PendingClip:
+    """Clip en cours d'enregistrement: pré-roll copié du ring puis frames de post-roll."""
+
+    def __init__(self, path, frames, start, end):
+        self.path = path
+        self.frames = list(frames)
+        self.bytes_used = sum(len(jpeg) for _, jpeg in self.frames)
+        self.start = start
+        self.end = end
+        self.reasons = []
+
+class ClipRecorder:
+    """Enregistre une courte vidéo (pré-roll + post-roll) autour d'un événement.
+
+    Un thread suit le flux brut d'une caméra (FrameBroadcaster) à `fps` images
+    par seconde et garde les `pre_roll` dernières secondes en JPEG dans un
+    ring borné à `max_bytes`. Le JPEG de la caméra est gardé tel quel s'il
+    n'est pas plus large que `width`; sinon il vient du cache d'encodage du
+    hub: si un client regarde le flux au même palier (largeur, qualité), la
+    frame n'est pas réencodée.
+
+    trigger() renvoie immédiatement le chemin du futur clip. Le clip reçoit
+    encore `post_roll` secondes de frames, puis il est mis en file pour le
+    thread d'écriture (AVI Motion-JPEG, sans réencodage). Un déclenchement
+    pendant le post-roll prolonge le clip en cours (au plus `max_seconds` au
+    total) au lieu d'en créer un second.
+
+    Le clip en cours et les clips en attente d'écriture partagent un budget
+    de `max_bytes`: au-delà, le clip en cours n'accepte plus de frames, et un
+    nouveau clip est refusé (compté dans "clips_dropped") tant que le disque
+    n'a pas rattrapé son retard. La mémoire d'un enregistreur ne dépasse donc
+    pas 2 x `max_bytes` (ring + clips).
+    """
+
+    def __init__(self, name, hub, clip_dir, pre_roll=5.0, post_roll=5.0, fps=5.0,
+                 width=640, quality=70, max_bytes=8_000_000, max_seconds=30.0, on_written=None):
+        self.name = name
+        self.hub = hub
+        self.clip_dir = clip_dir
+        self.post_roll = post_roll
+        self.fps = fps
+        self.width = width
+        self.quality = quality
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.on_written = on_written
+        self.running = True
+        self._ring = JpegRing(pre_roll, max_bytes)
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._active = None
+        self._write_queue = collections.deque()  # Clips terminés, en attente d'écriture
+        self._queued_bytes = 0                   # Octets des clips en attente ou en cours d'écriture
+        self._stats = {"clips_written": 0, "clips_dropped": 0, "errors": 0, "frames_recorded": 0,
+                       "last_clip_bytes": 0, "last_write_ms": 0.0}
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._writer_thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer_thread.start()
+
+    def trigger(self, reason, now=None):
+        """Démarre (ou prolonge) un clip. Renvoie son chemin relatif à static/, ou None sans frame."""
+        now = time.time() if now is None else now
+        with self._lock:
+            if self._active is not None:
+                self._active.end = min(max(self._active.end, now + self.post_roll),
+                                       self._active.start + self.max_seconds)
+                self._active.reasons.append(reason)
+                return self._relative(self._active.path)
+            if not self._ring.frames:
+                return None
+            if self._queued_bytes + self._ring.bytes_used > self.max_bytes:
+                self._stats["clips_dropped"] += 1
+                print(f"[{self.name}] Clip ({reason}) abandonné: "
+                      f"{self._queued_bytes / 1e6:.1f} Mo de clips encore en attente d'écriture.")
+                return None
+            timestamp_str = time.strftime("%Y%m%d_%H%M%S", time.localtime(now))
+            filename = f"clip_{self.name}_{timestamp_str}_{str(uuid.uuid4())[:4]}.avi"
+            start = self._ring.frames[0][0]
+            self._active = PendingClip(os.path.join(self.clip_dir, filename), self._ring.frames,
+                                       start, min(now + self.post_roll, start + self.max_seconds))
+            self._active.reasons.append(reason)
+            print(f"[{self.name}] Enregistrement du clip {filename} ({reason}).")
+            return self._relative(self._active.path)
+
+    def _relative(self, path):
+        # Chemin servi par Flask sous /static, comme les images du journal
+        return os.path.relpath(path, "static").replace("\\", "/")
+
+    def _run(self):
+        last_seq, last_added = 0, 0.0
+        interval = 1.0 / self.fps
+        while self.running:
+            seq, ref = self.hub.wait_for_next(last_seq, timeout=1.0)
+            if ref is None:
+                self._finish_if_due(time.time())
+                continue
+            last_seq = seq
+            with ref:
+                timestamp = ref.timestamp
+                if not timestamp or timestamp - last_added < interval:
+                    continue  # Image d'attente (caméra absente) ou cadence du clip déjà atteinte
+                if ref.jpeg is not None and ref.width <= self.width:
+                    jpeg = ref.jpeg  # JPEG de la caméra, gardé tel quel
+                else:
+                    part = self.hub.get_encoded(seq, ref.frame, self.quality, self.width)
+                    if part is None:
+                        continue
+                    jpeg = part[part.index(b"\r\n\r\n") + 4:-2]  # Octets JPEG de la partie MJPEG
+            last_added = timestamp
+            with self._lock:
+                self._ring.append(timestamp, jpeg)
+                self._stats["frames_recorded"] += 1
+                clip = self._active
+                if clip is not None and clip.bytes_used + self._queued_bytes + len(jpeg) <= self.max_bytes:
+                    clip.frames.append((timestamp, jpeg))
+                    clip.bytes_used += len(jpeg)
+            self._finish_if_due(timestamp)
+
+    def _finish_if_due(self, now):
+        with self._condition:
+            clip = self._active
+            if clip is None or now < clip.end:
+                return
+            self._active = None
+            self._write_queue.append(clip)
+            self._queued_bytes += clip.bytes_used
+            self._condition.notify()
+
+    def _write_loop(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._write_queue or not self.running)
+                if not self._write_queue:
+                    return
+                clip = self._write_queue.popleft()
+            try:
+                self._write(clip)
+            finally:
+                with self._lock:
+                    self._queued_bytes -= clip.bytes_used
+
+    def _write(self, clip):
+        start_time = time.time()
+        try:
+            os.makedirs(self.clip_dir, exist_ok=True)
+            duration = clip.frames[-1][0] - clip.frames[0][0]
+            fps = (len(clip.frames) - 1) / duration if duration > 0 else self.fps
+            write_mjpeg_avi(clip.path, [jpeg for _, jpeg in clip.frames], fps)
+        except Exception as e:
+            print(f"Erreur lors de l'écriture du clip {clip.path}: {e}")
+            with self._lock:
+                self._stats["errors"] += 1
+            return
+        write_ms = (time.time() - start_time) * 1000
+        metrics.observe("stage_seconds", write_ms / 1000, stage="disk_write", kind="clip")
+        with self._lock:
+            self._stats["clips_written"] += 1
+            self._stats["last_clip_bytes"] = clip.bytes_used
+            self._stats["last_write_ms"] = write_ms
+        print(f"[{self.name}] Clip enregistré: {clip.path} ({len(clip.frames)} images, "
+              f"{clip.bytes_used / 1e6:.1f} Mo, {', '.join(clip.reasons)}).")
+        if self.on_written is not None:
+            self.on_written(clip.path)
+
+    def stop(self):
+        with self._condition:
+            self.running = False
+            self._condition.notify_all()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, buffered_frames=len(self._ring.frames),
+                        buffered_bytes=self._ring.bytes_used, recording=self._active is not None,
+                        queued_clips=len(self._write_queue), queued_bytes=self._queued_bytes)
@@ -0,0 +1,45 @@
+import cv2
+import numpy as np
+
+COCO_NAMES = {0: "person"}
+
+class Detections:
+    """Résultat de détection compact, indépendant d'Ultralytics.
+
+    `boxes` est un tableau float32 (N, 6): x1, y1, x2, y2, confiance, classe.
+    Il expose le sous-ensemble de l'API des Results Ultralytics utilisé par
+    detect_batch (len(boxes), plot(), plot(img=...)), si bien que les résultats
+    venant des processus d'inférence s'utilisent comme ceux du modèle local.
+    """
+
+    def __init__(self, boxes, orig_img, names=None):
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 6)
+        self.orig_img = orig_img
+        self.names = names or COCO_NAMES
+
+    @classmethod
+    def from_result(cls, result):
+        """Convertit un Results Ultralytics (tenseurs) en Detections (NumPy)."""
+        data = result.boxes.data
+        if hasattr(data, "cpu"):
+            data = data.cpu().numpy()
+        return cls(data, result.orig_img, result.names)
+
+    def plot(self, img=None, color=(0, 0, 255)):
+        """Dessine les boîtes sur une copie de `img` (ou de l'image d'origine)."""
+        canvas = np.array(self.orig_img if img is None else img, copy=True)
+        for x1, y1, x2, y2, confidence, class_id in self.boxes.tolist():
+            top_left, bottom_right = (int(x1), int(y1)), (int(x2), int(y2))
+            cv2.rectangle(canvas, top_left, bottom_right, color, 2)
+            label = f"{self.names.get(int(class_id), int(class_id))} {confidence:.2f}"
+            cv2.putText(canvas, label, (top_left[0], max(12, top_left[1] - 5)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+        return canvas
+
+def detection_array(result):
+    """Boîtes (N, 6) d'un résultat, qu'il soit un Results Ultralytics ou un Detections."""
+    if result is None:
+        return np.zeros((0, 6), dtype=np.float32)
+    if isinstance(result, Detections):
+        return result.boxes
+    return Detections.from_result(result).boxes
@@ -0,0 +1,273 @@
+import collections
+import queue
+import threading
+import time
+from Utils.Metrics import metrics
+
+try:
+    import mysql.connector
+    from mysql.connector import pooling
+    MYSQL_AVAILABLE = True
+except ImportError:
+    MYSQL_AVAILABLE = False
+
+CREATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS door_opening_log (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    timestamp DOUBLE NOT NULL,
+    camera VARCHAR(64) NOT NULL,
+    image_path VARCHAR(255) NULL,
+    track_id BIGINT NULL,
+    clip_path VARCHAR(255) NULL,
+    INDEX idx_timestamp (timestamp),
+    INDEX idx_camera_timestamp (camera, timestamp)
+)
+"""
+
+# Colonnes de door_opening_log dans l'ordre des requêtes SELECT/INSERT
+LOG_COLUMNS = ("timestamp", "camera", "image_path", "track_id", "clip_path")
+
+# Colonnes ajoutées après la création initiale de la table (migration au démarrage)
+ADDED_COLUMNS = {
+    "track_id": "BIGINT NULL",
+    "clip_path": "VARCHAR(255) NULL",
+}
+
+class DoorLogStore:
+    """Journal des ouvertures de porte, persisté dans MySQL.
+
+    Les écritures sont mises en file et insérées par lots depuis un thread
+    dédié (jamais dans le thread de la requête HTTP); les connexions viennent
+    d'un pool. Tant qu'elles ne sont pas insérées, les entrées restent visibles
+    en tête des requêtes. Si MySQL est injoignable, le journal
+    est conservé en mémoire (MAX_LOG_ENTRIES dernières entrées), avec la même
+    interface; de même sans tentative de connexion si `db_config` vaut None.
+
+    `version` augmente à chaque modification: elle sert d'ETag à /logs.
+    """
+
+    def __init__(self, db_config, pool_size=5, max_memory_entries=100,
+                 batch_size=50, flush_interval=0.5, connect=True):
+        self.version = 0
+        self.db_config = db_config
+        self.pool_size = pool_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pending = collections.deque()  # Entrées en attente d'insertion (plus récente à gauche)
+        self._memory = collections.deque(maxlen=max_memory_entries)  # Mode sans base
+        self._next_memory_id = 1
+        self._wakeup = queue.Queue()
+        if connect:
+            self.connect()
+
+    def connect(self):
+        """Ouvre le pool MySQL (lent si le serveur ne répond pas). Renvoie True si le journal est persistant.
+
+        Avec connect=False, le journal fonctionne en mémoire jusqu'à cet appel
+        (fait en arrière-plan au démarrage); les entrées ajoutées entre-temps
+        sont alors insérées en base.
+        """
+        if not MYSQL_AVAILABLE or self.db_config is None or self._pool is not None:
+            return self._pool is not None
+        try:
+            pool = pooling.MySQLConnectionPool(
+                pool_name="door_log", pool_size=self.pool_size, **self.db_config)
+            self._execute(CREATE_TABLE_SQL, pool=pool)
+            self._add_missing_columns(pool)
+            print("Database connection pool ready (door_opening_log)!")
+        except mysql.connector.Error as err:
+            print(f"Error: {err}")
+            print("Journal des ouvertures conservé en mémoire uniquement.")
+            return False
+        with self._lock:
+            self._pool = pool
+            # Entrées reçues avant la connexion (même ordre: plus récente à gauche)
+            self._pending.extend(dict(entry, id=None) for entry in self._memory)
+            self._memory.clear()
+            self.version += 1
+        self._writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._writer_thread.start()
+        if self._pending:
+            self._wakeup.put_nowait(True)
+        return True
+
+    @property
+    def persistent(self):
+        return self._pool is not None
+
+    @property
+    def pending_count(self):
+        """Entrées en attente d'insertion en base."""
+        with self._lock:
+            return len(self._pending)
+
+    def _execute(self, sql, params=None, many=False, fetch=False, pool=None):
+        connection = (pool or self._pool).get_connection()
+        try:
+            cursor = connection.cursor(dictionary=True)
+            try:
+                if many:
+                    cursor.executemany(sql, params)
+                else:
+                    cursor.execute(sql, params or ())
+                rows = cursor.fetchall() if fetch else None
+                connection.commit()
+                return rows
+            finally:
+                cursor.close()
+        finally:
+            connection.close()  # Rend la connexion au pool
+
+    def _add_missing_columns(self, pool):
+        """Met à niveau une table créée par une version précédente."""
+        rows = self._execute(
+            "SELECT column_name AS name FROM information_schema.columns "
+            "WHERE table_schema = DATABASE() AND table_name = 'door_opening_log'", fetch=True, pool=pool)
+        existing = {row["name"].lower() for row in rows}
+        for column, definition in ADDED_COLUMNS.items():
+            if column not in existing:
+                self._execute(f"ALTER TABLE door_opening_log ADD COLUMN {column} {definition}", pool=pool)
+                print(f"Colonne {column} ajoutée à door_opening_log.")
+
+    def add(self, entry):
+        """Ajoute une entrée {"timestamp", "camera", "image_path", "track_id", "clip_path"} au journal (O(1), non bloquant).
+
+        Returns:
+            dict: l'entrée telle qu'elle apparaîtra dans query() (id None tant qu'elle n'est pas insérée).
+        """
+        with self._lock:
+            self.version += 1
+            if self._pool is None:
+                entry = dict(entry, id=self._next_memory_id)
+                self._next_memory_id += 1
+                self._memory.appendleft(entry)
+                return dict(entry)
+            entry = dict(entry, id=None)
+            self._pending.appendleft(entry)
+        self._wakeup.put_nowait(True)
+        return dict(entry)
+
+    def _writer_loop(self):
+        while True:
+            self._wakeup.get()
+            # Laisser les écritures rapprochées s'accumuler pour un seul INSERT
+            time.sleep(self.flush_interval)
+            while True:
+                with self._lock:
+                    batch = list(self._pending)[-self.batch_size:]  # Les plus anciennes d'abord
+                if not batch:
+                    break
+                batch.reverse()
+                start_time = time.perf_counter()
+                try:
+                    self._execute(
+                        f"INSERT INTO door_opening_log ({', '.join(LOG_COLUMNS)}) "
+                        f"VALUES ({', '.join(['%s'] * len(LOG_COLUMNS))})",
+                        [tuple(entry.get(column) for column in LOG_COLUMNS) for entry in batch],
+                        many=True)
+                except mysql.connector.Error as err:
+                    print(f"Erreur lors de l'écriture du journal des ouvertures: {err}")
+                    time.sleep(5)  # Réessayer plus tard, les entrées restent en attente
+                    continue
+                metrics.observe("stage_seconds", time.perf_counter() - start_time, stage="disk_write", kind="database")
+                with self._lock:
+                    for _ in batch:
+                        self._pending.pop()
+                    self.version += 1  # Les entrées ont maintenant un id
+
+    @staticmethod
+    def parse_cursor(value):
+        """Curseur de /logs: id (entier) ou « t<timestamp> » (page terminée par
+        une entrée pas encore insérée, donc sans id). ValueError si invalide."""
+        if value is None or value == "":
+            return None
+        if value.startswith("t"):
+            return ("timestamp", float(value[1:]))
+        return int(value)
+
+    def query(self, cursor=None, limit=50, since=None, until=None, camera=None):
+        """Renvoie une page du journal, de la plus récente à la plus ancienne.
+
+        Args:
+            cursor: valeur `next_cursor` de la page précédente (voir parse_cursor), exclusive.
+            limit: nombre maximum d'entrées.
+            since, until: bornes de timestamp (secondes epoch, incluses).
+            camera: ne garder que cette caméra.
+
+        Returns:
+            dict: {"entries": [...], "next_cursor": id, « t<timestamp> » ou None}.
+            Si MySQL ne répond pas, seules les entrées en attente sont renvoyées,
+            avec "degraded": True.
+        """
+        if isinstance(cursor, str):
+            cursor = self.parse_cursor(cursor)
+        before_timestamp = cursor[1] if isinstance(cursor, tuple) else None
+        before_id = cursor if isinstance(cursor, int) else None
+
+        def matches(entry):
+            return ((since is None or entry["timestamp"] >= since)
+                    and (until is None or entry["timestamp"] <= until)
+                    and (camera is None or entry["camera"] == camera))
+
+        if self._pool is None:
+            with self._lock:
+                candidates = [entry for entry in self._memory
+                              if (before_id is None or entry["id"] < before_id)
+                              and (before_timestamp is None or entry["timestamp"] < before_timestamp)
+                              and matches(entry)]
+            page = candidates[:limit]
+            next_cursor = page[-1]["id"] if len(candidates) > limit else None
+            return {"entries": page, "next_cursor": next_cursor}
+
+        # Les entrées en attente sont plus récentes que toutes celles de la base:
+        # elles ouvrent la première page et, si elles la dépassent, les pages
+        # suivantes (curseur « t<timestamp> » de la dernière entrée affichée).
+        pending = []
+        if before_id is None:
+            with self._lock:
+                pending = [dict(entry) for entry in self._pending
+                           if (before_timestamp is None or entry["timestamp"] < before_timestamp)
+                           and matches(entry)]
+
+        conditions, params = [], []
+        if before_id is not None:
+            conditions.append("id < %s")
+            params.append(before_id)
+        if before_timestamp is not None:
+            conditions.append("timestamp < %s")
+            params.append(before_timestamp)
+        if since is not None:
+            conditions.append("timestamp >= %s")
+            params.append(since)
+        if until is not None:
+            conditions.append("timestamp <= %s")
+            params.append(until)
+        if camera is not None:
+            conditions.append("camera = %s")
+            params.append(camera)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        params.append(limit)
+        try:
+            rows = self._execute(
+                f"SELECT id, {', '.join(LOG_COLUMNS)} FROM door_opening_log {where} "
+                f"ORDER BY id DESC LIMIT %s", params, fetch=True)
+        except mysql.connector.Error as err:
+            print(f"Erreur lors de la lecture du journal des ouvertures: {err}")
+            # Base indisponible: les entrées en attente restent consultables
+            page = pending[:limit]
+            next_cursor = f"t{page[-1]['timestamp']!r}" if len(pending) > limit else None
+            return {"entries": page, "next_cursor": next_cursor, "degraded": True}
+
+        # Une entrée insérée entre la copie de la file et le SELECT apparaîtrait deux fois
+        inserted = {(row["timestamp"], row["camera"]) for row in rows}
+        pending = [entry for entry in pending if (entry["timestamp"], entry["camera"]) not in inserted]
+        merged = pending + rows
+        page = merged[:limit]
+        next_cursor = None
+        if len(merged) > limit or len(rows) == limit:
+            last = page[-1]
+            # Page terminée par une entrée en attente: reprendre après son timestamp
+            next_cursor = last["id"] if last["id"] is not None else f"t{last['timestamp']!r}"
+        return {"entries": page, "next_cursor": next_cursor}
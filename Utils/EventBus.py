@@ -0,0 +1,124 @@
+import asyncio
+import collections
+import json
+import threading
+import time
+from Utils.StreamHub import AsyncWakeup
+
+def sse_message(event_id, event_type, data):
+    """Formate un événement Server-Sent Events."""
+    payload = json.dumps(data, separators=(",", ":"))
+    return f"id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n"
+
+class EventBus:
+    """Diffuse des événements d'état (bouton, journal, détection) aux clients SSE.
+
+    publish() est non bloquant: l'événement reçoit un identifiant croissant,
+    est gardé dans un historique borné et les abonnés sont réveillés par une
+    Condition (aucun sondage). Un client qui se reconnecte avec Last-Event-ID
+    reçoit les événements manqués encore présents dans l'historique.
+
+    Les identifiants envoyés sont préfixés par l'époque du processus
+    ("<époque>-<numéro>"): après un redémarrage du serveur, la numérotation
+    repart de 1 et un Last-Event-ID de l'ancien processus est ignoré (le
+    client repart de l'état complet au lieu d'attendre ce numéro).
+    """
+
+    def __init__(self, history=256):
+        self._condition = threading.Condition()
+        self._events = collections.deque(maxlen=history)  # (id, type, données)
+        self._last_id = 0
+        self.epoch = format(time.time_ns() // 1_000_000, "x")
+        self._wakeup = AsyncWakeup()
+        self.subscriber_count = 0
+
+    def publish(self, event_type, data):
+        with self._condition:
+            self._last_id += 1
+            self._events.append((self._last_id, event_type, data))
+            self._condition.notify_all()
+        self._wakeup.notify_all()
+
+    @property
+    def last_id(self):
+        with self._condition:
+            return self._last_id
+
+    def parse_event_id(self, value):
+        """Numéro d'événement d'un en-tête Last-Event-ID, None s'il est absent,
+        invalide ou émis par un autre processus."""
+        epoch, _, number = (value or "").partition("-")
+        if epoch != self.epoch or not number.isdigit():
+            return None
+        return int(number)
+
+    def _start_id(self, last_event_id):
+        # Appelé sous self._condition. Un numéro à venir (incohérent) vaut une première connexion.
+        if last_event_id is None or last_event_id > self._last_id:
+            return self._last_id
+        return last_event_id
+
+    def _message(self, event_id, event_type, data):
+        return sse_message(f"{self.epoch}-{event_id}", event_type, data)
+
+    def _events_after(self, last_id, timeout):
+        with self._condition:
+            self._condition.wait_for(lambda: self._last_id > last_id, timeout)
+            return [event for event in self._events if event[0] > last_id]
+
+    def subscribe(self, last_event_id=None, initial=None, heartbeat=15.0):
+        """Générateur de messages SSE pour un client.
+
+        Args:
+            last_event_id: numéro du dernier événement reçu (voir parse_event_id), ou None.
+            initial: fonction renvoyant (type, données) d'un état complet envoyé à la connexion.
+            heartbeat: secondes entre deux commentaires de maintien de la connexion.
+        """
+        with self._condition:
+            self.subscriber_count += 1
+            last_id = self._start_id(last_event_id)
+        try:
+            yield "retry: 3000\n\n"
+            if initial is not None:
+                event_type, data = initial()
+                yield self._message(last_id, event_type, data)
+            while True:
+                started = time.monotonic()
+                events = self._events_after(last_id, heartbeat)
+                for event_id, event_type, data in events:
+                    yield self._message(event_id, event_type, data)
+                    last_id = event_id
+                if not events and time.monotonic() - started >= heartbeat * 0.9:
+                    yield ": ping\n\n"  # Détecte les clients partis, garde les proxys ouverts
+        finally:
+            with self._condition:
+                self.subscriber_count -= 1
+
+    async def subscribe_async(self, last_event_id=None, initial=None, heartbeat=15.0):
+        """Variante asynchrone de subscribe() pour le serveur ASGI (aucun thread par client)."""
+        event = self._wakeup.register()
+        with self._condition:
+            self.subscriber_count += 1
+            last_id = self._start_id(last_event_id)
+        try:
+            yield "retry: 3000\n\n"
+            if initial is not None:
+                event_type, data = initial()
+                yield self._message(last_id, event_type, data)
+            while True:
+                event.clear()
+                with self._condition:
+                    events = [item for item in self._events if item[0] > last_id]
+                if not events:
+                    try:
+                        await asyncio.wait_for(event.wait(), heartbeat)
+                    except asyncio.TimeoutError:
+                        yield ": ping\n\n"
+                    continue
+                for event_id, event_type, data in events:
+                    yield self._message(event_id, event_type, data)
+                    last_id = event_id
+        finally:
+            self._wakeup.unregister(event)
+            with self._condition:
+                self.subscriber_count -= 1
@@ -0,0 +1,263 @@
+import struct
+import threading
+import cv2
+import numpy as np
+
+def _readonly_view(array):
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+def jpeg_size(jpeg):
+    """(largeur, hauteur) lues dans l'en-tête SOF d'un JPEG, sans le décoder."""
+    position = 2
+    while position + 9 <= len(jpeg):
+        if jpeg[position] != 0xFF:
+            break
+        marker = jpeg[position + 1]
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">HH", jpeg[position + 5:position + 9])
+            return width, height
+        position += 2 + struct.unpack(">H", jpeg[position + 2:position + 4])[0]
+    raise ValueError("en-tête JPEG sans dimensions")
+
+class FrameRef:
+    """Référence comptée vers une frame du ring (ou vers une frame détachée).
+
+    `frame` est une vue en lecture seule: les lecteurs ne copient jamais, et
+    seul l'appelant qui veut dessiner dessus doit faire sa propre copie.
+    Chaque FrameRef compte pour une référence; il faut appeler release()
+    (ou utiliser `with`) une fois la frame consommée.
+    """
+
+    __slots__ = ("_ring", "_index", "frame", "seq", "timestamp", "_released")
+
+    jpeg = None  # Pas d'octets JPEG d'origine (voir EncodedFrame)
+
+    def __init__(self, ring, index, frame, seq, timestamp):
+        self._ring = ring
+        self._index = index
+        self.frame = frame
+        self.seq = seq
+        self.timestamp = timestamp
+        self._released = False
+
+    @classmethod
+    def detached(cls, frame, seq=0, timestamp=0.0):
+        """Enveloppe une frame hors ring (image d'attente, frame annotée...)."""
+        return cls(None, -1, _readonly_view(frame), seq, timestamp)
+
+    def retain(self):
+        """Renvoie une nouvelle référence vers la même frame."""
+        if self._ring is None:
+            return FrameRef(None, -1, self.frame, self.seq, self.timestamp)
+        return self._ring._retain(self)
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        if self._ring is not None:
+            self._ring._release(self._index)
+
+    @property
+    def width(self):
+        return self.frame.shape[1]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+# Facteurs de réduction que le décodeur JPEG applique directement (mise à l'échelle DCT)
+_REDUCED_FLAGS = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4,
+                  8: cv2.IMREAD_REDUCED_COLOR_8}
+
+class EncodedFrame:
+    """Frame reçue déjà compressée (JPEG de la caméra), décodée seulement si on la lit.
+
+    `jpeg` garde les octets d'origine: le flux brut les renvoie tels quels.
+    `frame` décode à la première lecture (une seule fois, quel que soit le
+    nombre de lecteurs); reduced() décode directement à 1/2, 1/4 ou 1/8 de la
+    taille, bien moins cher qu'un décodage complet suivi d'un redimensionnement.
+
+    Même interface qu'un FrameRef (seq, timestamp, retain, release, with);
+    l'objet n'est jamais modifié, retain() et release() n'ont donc rien à compter.
+    """
+
+    def __init__(self, jpeg, seq, timestamp):
+        self.jpeg = jpeg
+        self.seq = seq
+        self.timestamp = timestamp
+        self.width, self.height = jpeg_size(jpeg)
+        self._decoded = {}
+        self._lock = threading.Lock()
+
+    def _decode(self, factor):
+        with self._lock:
+            image = self._decoded.get(factor)
+            if image is None:
+                flags = _REDUCED_FLAGS[factor] if factor > 1 else cv2.IMREAD_COLOR
+                image = cv2.imdecode(np.frombuffer(self.jpeg, np.uint8), flags)
+                if image is None:
+                    raise ValueError("JPEG de la caméra illisible")
+                image = _readonly_view(image)
+                self._decoded[factor] = image
+            return image
+
+    @property
+    def frame(self):
+        return self._decode(1)
+
+    @property
+    def decoded(self):
+        return bool(self._decoded)
+
+    def reduced(self, factor):
+        """Image décodée à 1/factor de la taille (factor: 1, 2, 4 ou 8)."""
+        return self._decode(factor)
+
+    def retain(self):
+        return self
+
+    def release(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+class FrameRing:
+    """Anneau préalloué de buffers NumPy pour les frames capturées.
+
+    Le thread de capture décode directement dans un slot libre
+    (acquire_write_slot / commit), sans copie. Le ring garde lui-même une
+    référence sur la dernière frame publiée; un slot n'est réutilisé que
+    lorsque plus personne ne le référence.
+    """
+
+    def __init__(self, slots=6, shape=(480, 640, 3), dtype=np.uint8):
+        if slots < 2:
+            raise ValueError("Le ring doit contenir au moins 2 slots")
+        self._buffers = [np.zeros(shape, dtype=dtype) for _ in range(slots)]
+        self._views = [_readonly_view(buffer) for buffer in self._buffers]
+        self._refcounts = [0] * slots
+        self._writing = [False] * slots
+        self._condition = threading.Condition()
+        self._latest = -1
+        self._seq = 0
+        self._timestamp = 0.0
+        self._closed = False
+        self._encoded = None  # Dernière frame si elle est un EncodedFrame (hors slots)
+        self.overruns = 0  # Captures abandonnées faute de slot libre
+
+    @property
+    def seq(self):
+        with self._condition:
+            return self._seq
+
+    def acquire_write_slot(self):
+        """Réserve un slot libre pour l'écriture.
+
+        Returns:
+            tuple: (index, buffer inscriptible), ou None si tous les slots sont référencés.
+        """
+        with self._condition:
+            for index, count in enumerate(self._refcounts):
+                if count == 0 and not self._writing[index]:
+                    self._writing[index] = True
+                    return index, self._buffers[index]
+            self.overruns += 1
+            return None
+
+    def abort(self, index):
+        """Rend un slot réservé sans publier de frame."""
+        with self._condition:
+            self._writing[index] = False
+
+    def commit(self, index, frame, timestamp):
+        """Publie le slot `index` comme dernière frame et réveille les lecteurs.
+
+        `frame` est le tableau renvoyé par le décodeur. S'il ne s'agit pas du
+        buffer du slot (taille de frame différente), il devient le nouveau buffer.
+
+        Returns:
+            FrameRef: une référence sur la frame publiée, à libérer par l'appelant.
+        """
+        with self._condition:
+            self._writing[index] = False
+            self._encoded = None
+            if frame is not self._buffers[index]:
+                self._buffers[index] = frame
+                self._views[index] = _readonly_view(frame)
+            previous = self._latest
+            self._latest = index
+            self._refcounts[index] += 2  # Une pour le ring, une pour l'appelant
+            if previous >= 0:
+                self._refcounts[previous] -= 1
+            self._seq += 1
+            self._timestamp = timestamp
+            self._condition.notify_all()
+            return FrameRef(self, index, self._views[index], self._seq, timestamp)
+
+    def publish_encoded(self, jpeg, timestamp):
+        """Publie un JPEG de la caméra sans le décoder (voir EncodedFrame).
+
+        La frame n'occupe aucun slot: le slot de la frame précédente est rendu.
+
+        Returns:
+            EncodedFrame: la frame publiée.
+        """
+        with self._condition:
+            encoded = EncodedFrame(jpeg, self._seq + 1, timestamp)  # ValueError si l'en-tête est invalide
+            if self._latest >= 0:
+                self._refcounts[self._latest] -= 1
+                self._latest = -1
+            self._seq += 1
+            self._timestamp = timestamp
+            self._encoded = encoded
+            self._condition.notify_all()
+            return encoded
+
+    def acquire_latest(self):
+        """Renvoie une référence sur la dernière frame, ou None si aucune."""
+        with self._condition:
+            return self._acquire_latest_locked()
+
+    def wait_for_newer(self, last_seq, timeout=1.0):
+        """Bloque jusqu'à ce qu'une frame de séquence > last_seq soit publiée.
+
+        Returns:
+            FrameRef ou None si le délai a expiré (ou si le ring est fermé).
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._seq > last_seq or self._closed, timeout)
+            if self._seq <= last_seq:
+                return None
+            return self._acquire_latest_locked()
+
+    def close(self):
+        """Réveille tous les lecteurs en attente (arrêt de la capture)."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def _acquire_latest_locked(self):
+        if self._encoded is not None:
+            return self._encoded
+        if self._latest < 0:
+            return None
+        self._refcounts[self._latest] += 1
+        return FrameRef(self, self._latest, self._views[self._latest], self._seq, self._timestamp)
+
+    def _retain(self, ref):
+        with self._condition:
+            self._refcounts[ref._index] += 1
+            return FrameRef(self, ref._index, ref.frame, ref.seq, ref.timestamp)
+
+    def _release(self, index):
+        with self._condition:
+            self._refcounts[index] -= 1
@@ -1,53 +1,229 @@
 import cv2
 import os
-import uuid
 import time
+import collections
+import concurrent.futures
+import threading
+from Utils.Metrics import metrics
 
+# Anciennes images temporaires des alertes (maintenant encodées en mémoire): vidé au démarrage
 TEMP_IMAGE_DIR = "temp_images"
+# Vignettes en WebP (3 à 4 fois plus légères qu'en JPEG), si OpenCV sait l'écrire
+THUMBNAIL_EXT = ".webp" if cv2.haveImageWriter(".webp") else ".jpg"
 
-def setup_temp_dir():
-    """Crée le répertoire temporaire s'il n'existe pas."""
-    if not os.path.exists(TEMP_IMAGE_DIR):
+class SnapshotWriter:
+    """Écriture des images JPEG en arrière-plan, hors des threads critiques.
+
+    submit() met la frame en file et rend immédiatement un Future qui donnera
+    le chemin écrit (ou None en cas d'échec ou d'abandon). Le thread d'écriture
+    encode le JPEG puis l'écrit de façon atomique (fichier temporaire + rename),
+    si bien qu'un lecteur ne voit jamais de fichier à moitié écrit.
+
+    La file est bornée. Quand le disque ne suit pas:
+        - "drop_oldest": la plus ancienne écriture en attente est abandonnée;
+        - "drop_newest": la nouvelle écriture est refusée;
+        - "block": submit() attend jusqu'à `block_timeout` secondes (contre-pression),
+          puis refuse.
+
+    Avec `thumbnail_path`, une vignette (voir encode_thumbnail) est écrite
+    dans la foulée, à partir de la même frame: pas de second décodage.
+    submit_thumbnail() crée, dans la même file, la vignette d'une image déjà
+    sur disque.
+    """
+
+    def __init__(self, max_queue=16, policy="drop_oldest", block_timeout=0.5, jpeg_quality=90,
+                 thumbnail_width=160, thumbnail_quality=70):
+        if policy not in ("drop_oldest", "drop_newest", "block"):
+            raise ValueError(f"Politique de file inconnue: {policy}")
+        self.max_queue = max_queue
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.jpeg_quality = jpeg_quality
+        self.thumbnail_width = thumbnail_width
+        self.thumbnail_quality = thumbnail_quality
+        self._queue = collections.deque()
+        self._condition = threading.Condition()
+        self._known_dirs = set()
+        self._stats = {"written": 0, "thumbnails": 0, "dropped": 0, "errors": 0,
+                       "last_write_ms": 0.0, "max_write_ms": 0.0}
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, frame, path, quality=None, thumbnail_path=None):
+        """Planifie l'écriture de `frame` (ndarray ou FrameRef, libéré après encodage) vers `path`,
+        et de sa vignette vers `thumbnail_path` si donné.
+
+        Returns:
+            concurrent.futures.Future: résolu avec le chemin écrit, ou None.
+        """
+        return self._enqueue((frame, path, quality or self.jpeg_quality,
+                              concurrent.futures.Future(), thumbnail_path))
+
+    def submit_thumbnail(self, source_path, thumbnail_path):
+        """Planifie la création de la vignette d'une image déjà écrite (`source_path`).
+
+        Returns:
+            concurrent.futures.Future: résolu avec le chemin de la vignette, ou None.
+        """
+        return self._enqueue((None, source_path, None, concurrent.futures.Future(), thumbnail_path))
+
+    def _enqueue(self, job):
+        future = job[3]
+        dropped = None
+        with self._condition:
+            if len(self._queue) >= self.max_queue:
+                if self.policy == "drop_oldest":
+                    dropped = self._queue.popleft()
+                elif self.policy == "block":
+                    self._condition.wait_for(lambda: len(self._queue) < self.max_queue,
+                                             self.block_timeout)
+                if len(self._queue) >= self.max_queue:
+                    dropped = job
+            if dropped is not job:
+                self._queue.append(job)
+                self._condition.notify_all()
+            if dropped is not None:
+                self._stats["dropped"] += 1
+        if dropped is not None:
+            print(f"AVERTISSEMENT: écriture de {os.path.basename(dropped[1])} abandonnée (disque trop lent).")
+            self._finish(dropped, None)
+        return future
+
+    def stats(self):
+        with self._condition:
+            return dict(self._stats, queued=len(self._queue))
+
+    def _finish(self, job, result):
+        frame = job[0]
+        if hasattr(frame, "release"):
+            frame.release()
+        job[3].set_result(result)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._queue)
+                job = self._queue.popleft()
+                self._condition.notify_all()  # Place libérée pour un submit() bloqué
+            frame, path, quality, _, thumbnail_path = job
+            if frame is None:
+                self._write_thumbnail_only(job)
+                continue
+            start_time = time.time()
+            result = None
+            thumbnail = None
+            try:
+                image = frame.frame if hasattr(frame, "frame") else frame
+                encode_start = time.perf_counter()
+                try:
+                    ret, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+                    if thumbnail_path:
+                        thumbnail = encode_thumbnail(image, thumbnail_path, self.thumbnail_width,
+                                                     self.thumbnail_quality)
+                finally:
+                    if hasattr(frame, "release"):
+                        frame.release()  # La frame n'est plus nécessaire une fois encodée
+                if not ret:
+                    raise ValueError("échec de l'encodage JPEG")
+                write_start = time.perf_counter()
+                metrics.observe("stage_seconds", write_start - encode_start, stage="jpeg_encode", stream="snapshot")
+                self.write_atomic(path, buffer.tobytes())
+                if thumbnail is not None:
+                    self.write_atomic(thumbnail_path, thumbnail)
+                metrics.observe("stage_seconds", time.perf_counter() - write_start, stage="disk_write", kind="snapshot")
+                result = path
+            except Exception as e:
+                print(f"Erreur lors de l'écriture de l'image {path}: {e}")
+                with self._condition:
+                    self._stats["errors"] += 1
+            write_ms = (time.time() - start_time) * 1000
+            with self._condition:
+                if result is not None:
+                    self._stats["written"] += 1
+                    if thumbnail is not None:
+                        self._stats["thumbnails"] += 1
+                self._stats["last_write_ms"] = write_ms
+                self._stats["max_write_ms"] = max(self._stats["max_write_ms"], write_ms)
+            job[3].set_result(result)
+
+    def _write_thumbnail_only(self, job):
+        _, source_path, _, future, thumbnail_path = job
+        result = None
         try:
-            os.makedirs(TEMP_IMAGE_DIR)
-            print(f"Répertoire temporaire '{TEMP_IMAGE_DIR}' créé.")
-        except OSError as e:
-            print(f"Erreur lors de la création du répertoire temporaire '{TEMP_IMAGE_DIR}': {e}")
-            # Si on ne peut pas créer le dossier, on ne pourra pas sauvegarder
-            raise
+            if not os.path.exists(thumbnail_path):  # Demandée plusieurs fois avant d'être écrite
+                data = encode_thumbnail(cv2.imread(source_path), thumbnail_path,
+                                        self.thumbnail_width, self.thumbnail_quality)
+                if data is None:
+                    raise ValueError("image illisible")
+                self.write_atomic(thumbnail_path, data)
+                with self._condition:
+                    self._stats["thumbnails"] += 1
+            result = thumbnail_path
+        except Exception as e:
+            print(f"Erreur lors de la création de la vignette {thumbnail_path}: {e}")
+            with self._condition:
+                self._stats["errors"] += 1
+        future.set_result(result)
 
-def save_temp_image(frame, filename_prefix="detection"):
-    """Sauvegarde la frame donnée dans un fichier JPG temporaire.
+    def write_atomic(self, path, data):
+        """Écrit `data` dans `path` via un fichier temporaire renommé (crée le répertoire au besoin)."""
+        directory = os.path.dirname(path)
+        if directory and directory not in self._known_dirs:
+            os.makedirs(directory, exist_ok=True)
+            self._known_dirs.add(directory)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as output:
+            output.write(data)
+        os.replace(temp_path, path)
 
-    Args:
-        frame (numpy.ndarray): L'image (frame) à sauvegarder.
-        filename_prefix (str): Préfixe pour le nom du fichier.
+def encode_thumbnail(image, path, max_width=160, quality=70):
+    """Encode une vignette de `image` (réduite à `max_width` pixels de large) au format
+    donné par l'extension de `path` (.webp ou .jpg).
 
     Returns:
-        str: Le chemin complet vers le fichier sauvegardé, ou None en cas d'erreur.
+        bytes: la vignette encodée, ou None en cas d'échec.
     """
-    setup_temp_dir() # Assure que le dossier existe
+    if image is None:
+        return None
+    height, width = image.shape[:2]
+    if width > max_width:
+        image = cv2.resize(image, (max_width, max(1, int(height * max_width / width))),
+                           interpolation=cv2.INTER_AREA)
+    if path.endswith(".webp"):
+        ret, buffer = cv2.imencode('.webp', image, [cv2.IMWRITE_WEBP_QUALITY, quality])
+    else:
+        ret, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer.tobytes() if ret else None
+
+# Écrivain des images de log de /control/door (et de leurs vignettes)
+snapshot_writer = SnapshotWriter()
 
+def encode_jpeg_within_budget(frame, max_bytes, max_width=1280, qualities=(90, 80, 70, 60, 50, 40)):
+    """Encode la frame en JPEG en mémoire, sans dépasser `max_bytes`.
+
+    L'image est d'abord réduite à `max_width` pixels de large, puis la qualité
+    est baissée palier par palier; si cela ne suffit pas, l'image est encore
+    réduite (x0.75) et l'opération recommence.
+
+    Returns:
+        bytes: le JPEG encodé, ou None si la frame est vide ou n'a pas pu être encodée.
+    """
     if frame is None:
-        print("Erreur: Tentative de sauvegarde d'une frame None.")
         return None
-
-    try:
-        # Générer un nom de fichier unique
-        timestamp = time.strftime("%Y%m%d_%H%M%S")
-        unique_id = str(uuid.uuid4())[:8] # Court UUID pour l'unicité
-        filename = f"{filename_prefix}_{timestamp}_{unique_id}.jpg"
-        filepath = os.path.join(TEMP_IMAGE_DIR, filename)
-
-        # Sauvegarder l'image
-        success = cv2.imwrite(filepath, frame)
-
-        if success:
-            # print(f"Image temporaire sauvegardée: {filepath}") # Log optionnel
-            return filepath
-        else:
-            print(f"Erreur lors de la sauvegarde de l'image vers {filepath}")
-            return None
-    except Exception as e:
-        print(f"Exception lors de la sauvegarde de l'image temporaire: {e}")
-        return None 
\ No newline at end of file
+    image = frame
+    while True:
+        height, width = image.shape[:2]
+        if width > max_width:
+            scale = max_width / width
+            image = cv2.resize(image, (max_width, max(1, int(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+            continue
+        for quality in qualities:
+            ret, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            if not ret:
+                return None
+            if buffer.nbytes <= max_bytes:
+                return buffer.tobytes()
+        if width <= 64:
+            return None  # Budget irréaliste
+        max_width = int(width * 0.75)
@@ -0,0 +1,113 @@
+import os
+import shutil
+import time
+import numpy as np
+
+def yolo_class():
+    """Classe YOLO d'Ultralytics, ou None si absent.
+
+    Importée au premier chargement de modèle et non à l'import du module:
+    l'import d'Ultralytics (torch) prend plusieurs secondes et ne doit pas
+    retarder le démarrage du serveur web.
+    """
+    try:
+        from ultralytics import YOLO
+    except ImportError:
+        return None
+    return YOLO
+
+# Backends supportés: nom -> format d'export Ultralytics (None: modèle .pt natif)
+BACKEND_EXPORT_FORMATS = {
+    "pytorch": None,
+    "onnx": "onnx",
+    "openvino": "openvino",
+}
+
+EXPORT_CACHE_DIR = "models_cache"
+
+class Detector:
+    """Modèle YOLO chargé pour un backend donné, appelable comme un modèle Ultralytics.
+
+    Ultralytics sait exécuter les modèles exportés (ONNX Runtime, OpenVINO) avec
+    la même API que le modèle PyTorch: detect_batch n'a donc pas à connaître le
+    backend utilisé.
+    """
+
+    def __init__(self, backend, model, model_path, imgsz):
+        self.backend = backend
+        self.model = model
+        self.model_path = model_path
+        self.imgsz = imgsz
+
+    def __call__(self, frames, **kwargs):
+        kwargs.setdefault("imgsz", self.imgsz)
+        return self.model(frames, **kwargs)
+
+    def warmup(self, runs=3):
+        """Lance quelques inférences à vide (allocation, compilation des graphes)."""
+        blank = np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)
+        start_time = time.time()
+        for _ in range(runs):
+            self([blank], conf=0.5, classes=[0], verbose=False)
+        print(f"Préchauffage du backend {self.backend}: {runs} inférence(s) en {time.time() - start_time:.2f}s")
+
+def exported_model_path(model_path, backend, imgsz):
+    """Chemin du modèle exporté en cache pour (modèle, backend, taille d'entrée)."""
+    base = os.path.splitext(os.path.basename(model_path))[0]
+    if backend == "onnx":
+        return os.path.join(EXPORT_CACHE_DIR, f"{base}_{imgsz}.onnx")
+    return os.path.join(EXPORT_CACHE_DIR, f"{base}_{imgsz}_{backend}_model")
+
+def export_model(model_path, backend, imgsz):
+    """Exporte le modèle PyTorch vers `backend` s'il n'est pas déjà en cache.
+
+    Returns:
+        str: chemin du modèle exporté.
+    """
+    target = exported_model_path(model_path, backend, imgsz)
+    if os.path.exists(target):
+        return target
+    print(f"Export du modèle {model_path} vers {backend} (imgsz={imgsz})...")
+    # dynamic=True pour accepter des lots de plusieurs caméras
+    exported = yolo_class()(model_path).export(format=BACKEND_EXPORT_FORMATS[backend], imgsz=imgsz, dynamic=True)
+    os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+    shutil.move(str(exported), target)
+    print(f"Modèle exporté mis en cache: {target}")
+    return target
+
+def load_backend(backend, model_path, imgsz):
+    """Charge le modèle pour un backend précis (lève une exception en cas d'échec)."""
+    if backend not in BACKEND_EXPORT_FORMATS:
+        raise ValueError(f"Backend d'inférence inconnu: {backend}")
+    path = model_path if backend == "pytorch" else export_model(model_path, backend, imgsz)
+    return Detector(backend, yolo_class()(path, task="detect"), path, imgsz)
+
+def load_detector(backend, model_path, imgsz=640, warmup_runs=3, fallback=True):
+    """Charge le détecteur configuré, le préchauffe et se replie sur PyTorch en cas d'échec.
+
+    Returns:
+        Detector ou None si Ultralytics/le modèle n'est pas disponible.
+    """
+    if yolo_class() is None:
+        print("ERREUR: Ultralytics (YOLOv8) n'est pas installé. Veuillez l'installer avec 'pip install ultralytics'")
+        return None
+    if not os.path.exists(model_path):
+        print(f"ATTENTION: Le modèle {model_path} n'existe pas!")
+        print(f"Vous pouvez le télécharger depuis: https://github.com/ultralytics/assets/releases/download/v0.0.0/yolov8n.pt")
+
+    candidates = [backend]
+    if fallback and backend != "pytorch":
+        candidates.append("pytorch")
+    for candidate in candidates:
+        try:
+            print(f"Chargement du modèle YOLOv8 ({candidate}) depuis {model_path}...")
+            detector = load_backend(candidate, model_path, imgsz)
+            if warmup_runs > 0:
+                detector.warmup(warmup_runs)
+            print(f"Modèle YOLOv8 chargé avec succès (backend: {candidate})")
+            return detector
+        except Exception as e:
+            print(f"Erreur lors du chargement du backend {candidate}: {e}")
+            if candidate != candidates[-1]:
+                print("Repli sur le backend PyTorch.")
+    return None
@@ -0,0 +1,164 @@
+import multiprocessing
+import sys
+import threading
+import numpy as np
+from multiprocessing import shared_memory
+from Utils.Detections import Detections
+
+def _worker_main(conn, shm_name, backend, model_path, imgsz, warmup_runs):
+    """Boucle d'un processus d'inférence.
+
+    Reçoit par le pipe la description des frames déposées dans la mémoire
+    partagée, exécute le modèle et renvoie pour chaque frame un tableau
+    compact (N, 6) de boîtes. Aucune image ne transite par le pipe.
+    """
+    from Utils.InferenceBackends import load_detector
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    detector = load_detector(backend, model_path, imgsz=imgsz, warmup_runs=warmup_runs)
+    conn.send(detector is not None)
+    try:
+        while True:
+            request = conn.recv()
+            if request is None:
+                break
+            layouts, kwargs = request
+            frames = [np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=offset)
+                      for offset, shape in layouts]
+            try:
+                results = detector(frames, verbose=False, **kwargs)
+                boxes = [Detections.from_result(result).boxes for result in results]
+                conn.send(("ok", boxes))
+            except Exception as e:
+                conn.send(("error", str(e)))
+            del frames
+    finally:
+        shm.close()
+        conn.close()
+
+def _start_without_main(process):
+    """Démarre `process` sans que l'enfant réexécute le script principal.
+
+    Avec spawn et forkserver, l'enfant réimporte le script lancé (app.py,
+    asgi.py) sous le nom __mp_main__ avant d'appeler sa cible. _worker_main
+    n'utilise que Utils/: on masque le script le temps du démarrage, pour que
+    l'enfant ne recrée ni pool MySQL, ni threads, ni second modèle.
+    """
+    main = sys.modules["__main__"]
+    saved = {name: main.__dict__[name] for name in ("__file__", "__spec__") if name in main.__dict__}
+    main.__dict__.pop("__file__", None)
+    main.__spec__ = None
+    try:
+        process.start()
+    finally:
+        main.__dict__.pop("__spec__", None)
+        main.__dict__.update(saved)
+
+class _Worker:
+    def __init__(self, context, capacity, backend, model_path, imgsz, warmup_runs):
+        self.shm = shared_memory.SharedMemory(create=True, size=capacity)
+        self.capacity = capacity
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, daemon=True,
+            args=(child_conn, self.shm.name, backend, model_path, imgsz, warmup_runs))
+        _start_without_main(self.process)
+        child_conn.close()
+
+    def submit(self, frames, kwargs):
+        """Copie les frames dans la mémoire partagée et envoie la requête."""
+        layouts, offset = [], 0
+        for frame in frames:
+            frame = np.ascontiguousarray(frame, dtype=np.uint8)
+            if offset + frame.nbytes > self.capacity:
+                raise ValueError("Frames trop grandes pour la mémoire partagée du processus d'inférence")
+            target = np.ndarray(frame.shape, dtype=np.uint8, buffer=self.shm.buf, offset=offset)
+            target[...] = frame
+            layouts.append((offset, frame.shape))
+            offset += frame.nbytes
+        self.conn.send((layouts, kwargs))
+
+    def collect(self):
+        status, payload = self.conn.recv()
+        if status != "ok":
+            raise RuntimeError(f"Erreur du processus d'inférence: {payload}")
+        return payload
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=5)
+        self.shm.close()
+        self.shm.unlink()
+
+class InferencePool:
+    """Exécute YOLO dans un ou plusieurs processus séparés (hors du GIL de Flask).
+
+    Les frames passent par `multiprocessing.shared_memory` et les résultats
+    reviennent sous forme de tableaux de boîtes (Detections); les annotations
+    sont dessinées par le processus web. Appelable comme un modèle Ultralytics:
+    un lot est réparti entre les processus, qui travaillent en parallèle.
+    """
+
+    def __init__(self, workers, backend, model_path, imgsz=640, warmup_runs=3,
+                 max_batch=4, max_frame_shape=(720, 1280, 3)):
+        # Le pool est créé pendant que les threads de capture tournent déjà: pas de
+        # fork direct (verrous hérités dans l'état où les threads les tiennent).
+        # forkserver sous Linux, spawn sinon (Windows); les enfants ne réimportent
+        # pas le script principal (voir _start_without_main).
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        context = multiprocessing.get_context(method)
+        capacity = int(np.prod(max_frame_shape)) * max_batch
+        self.backend = backend
+        self.imgsz = imgsz
+        self._lock = threading.Lock()
+        self._workers = [_Worker(context, capacity, backend, model_path, imgsz, warmup_runs)
+                         for _ in range(workers)]
+        ready = [worker.conn.recv() for worker in self._workers]
+        if not all(ready):
+            self.close()
+            raise RuntimeError("Le modèle n'a pas pu être chargé dans les processus d'inférence")
+        print(f"{workers} processus d'inférence prêts (backend: {backend})")
+
+    def __call__(self, frames, **kwargs):
+        kwargs.setdefault("imgsz", self.imgsz)
+        kwargs.pop("verbose", None)
+        frames = list(frames)
+        with self._lock:
+            # Répartition entrelacée des frames entre les processus
+            count = len(self._workers)
+            chunks = [frames[index::count] for index in range(count)]
+            busy = []
+            try:
+                for worker, chunk in zip(self._workers, chunks):
+                    if chunk:
+                        worker.submit(chunk, kwargs)
+                        busy.append(worker)
+            except Exception:
+                # Vider les réponses déjà demandées pour garder les pipes synchronisés
+                for worker in busy:
+                    worker.conn.recv()
+                raise
+            # Chaque processus sollicité est vidé, même si l'un d'eux a échoué: sinon
+            # sa réponse resterait dans le pipe et serait lue au lot suivant.
+            boxes_by_chunk, error = [], None
+            for worker in busy:
+                try:
+                    boxes_by_chunk.append(worker.collect())
+                except Exception as e:
+                    error = error or e
+            if error is not None:
+                raise error
+        # Remise dans l'ordre d'origine (frame i -> processus i % count)
+        results = [None] * len(frames)
+        for chunk_index, boxes in enumerate(boxes_by_chunk):
+            for position, chunk_boxes in enumerate(boxes):
+                frame_index = chunk_index + position * count
+                results[frame_index] = Detections(chunk_boxes, frames[frame_index])
+        return results
+
+    def close(self):
+        for worker in self._workers:
+            worker.close()
@@ -0,0 +1,196 @@
+import collections
+import contextlib
+import os
+import sys
+import threading
+import time
+
+# Quantiles exposés sur /metrics pour chaque série de durées
+QUANTILES = (0.5, 0.95, 0.99)
+
+class Summary:
+    """Durées récentes d'une étape: ring des `window` dernières mesures + cumul.
+
+    Une série peut avoir plusieurs threads écrivains (ex. écritures de clips
+    simultanées): observe() prend un verrou propre à la série, jamais disputé
+    en pratique, pour ne perdre aucune mise à jour du cumul (count, total).
+    Les quantiles sont calculés à la lecture, sur le ring.
+    """
+
+    def __init__(self, window=1024):
+        self.samples = collections.deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+            self.count += 1
+            self.total += seconds
+
+    def snapshot(self):
+        """Renvoie (mesures du ring, count, total), lus ensemble."""
+        with self._lock:
+            return tuple(self.samples), self.count, self.total
+
+    def quantiles(self, quantiles=QUANTILES):
+        return _quantiles(self.snapshot()[0], quantiles)
+
+def _quantiles(samples, quantiles=QUANTILES):
+    samples = sorted(samples)
+    if not samples:
+        return {q: None for q in quantiles}
+    last = len(samples) - 1
+    return {q: samples[min(last, int(q * len(samples)))] for q in quantiles}
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+def _format_value(value):
+    if value is None:
+        return "NaN"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class MetricsRegistry:
+    """Mesures de la chaîne capture -> détection -> flux -> notifications.
+
+    Les durées par étape sont rangées dans des Summary, une série par jeu
+    d'étiquettes (étape, caméra, flux...). Les autres valeurs (fps, frames
+    sautées, clients connectés, files d'attente) ne sont pas recopiées ici:
+    des fonctions de collecte, appelées à chaque lecture de /metrics, les
+    lisent directement dans les compteurs existants.
+    """
+
+    def __init__(self, prefix="doorcam", window=1024):
+        self.prefix = prefix
+        self.window = window
+        self._summaries = {}   # (nom, étiquettes triées) -> Summary
+        self._help = {}
+        self._collectors = []
+        self._lock = threading.Lock()  # Création et parcours des séries
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def summary(self, name, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        summary = self._summaries.get(key)
+        if summary is None:
+            with self._lock:
+                summary = self._summaries.setdefault(key, Summary(self.window))
+        return summary
+
+    def observe(self, name, seconds, **labels):
+        self.summary(name, **labels).observe(seconds)
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        """Mesure la durée du bloc `with` dans la série (name, labels)."""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start_time, **labels)
+
+    def series(self, name):
+        """Renvoie [(étiquettes (dict), Summary)] des séries de durées `name`."""
+        with self._lock:
+            items = list(self._summaries.items())
+        return [(dict(labels), summary) for (series_name, labels), summary in items
+                if series_name == name]
+
+    def add_collector(self, collector):
+        """Ajoute une fonction appelée à chaque lecture.
+
+        Elle renvoie des tuples (nom, type, aide, étiquettes (dict), valeur),
+        type valant "gauge" ou "counter".
+        """
+        self._collectors.append(collector)
+
+    def render(self):
+        """Exposition au format texte de Prometheus (version 0.0.4)."""
+        families = collections.OrderedDict()  # nom -> (type, aide, [(étiquettes, valeur)])
+        with self._lock:
+            # Copie: les threads de capture, détection et clips créent des séries pendant la lecture
+            items = sorted(self._summaries.items(), key=lambda item: item[0])
+        for (name, labels), summary in items:
+            family = families.setdefault(f"{self.prefix}_{name}",
+                                         ("summary", self._help.get(name, name), []))
+            samples, count, total = summary.snapshot()
+            for quantile, value in _quantiles(samples).items():
+                family[2].append(("", labels + (("quantile", quantile),), value))
+            family[2].append(("_sum", labels, total))
+            family[2].append(("_count", labels, count))
+        for collector in self._collectors:
+            try:
+                samples = list(collector())
+            except Exception as e:
+                print(f"Erreur d'une collecte de métriques: {e}")
+                continue
+            for name, kind, help_text, labels, value in samples:
+                family = families.setdefault(f"{self.prefix}_{name}", (kind, help_text, []))
+                family[2].append(("", tuple(sorted(labels.items())), value))
+
+        lines = []
+        for name, (kind, help_text, samples) in families.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+# Registre partagé par l'application (comme notification_queue ou snapshot_writer)
+metrics = MetricsRegistry()
+
+class SamplingProfiler:
+    """Profileur par échantillonnage des piles de tous les threads, à la demande.
+
+    Pendant `seconds` secondes, la pile de chaque thread est relevée toutes les
+    `interval` secondes (sys._current_frames, sans instrumenter le code: le
+    coût est nul hors profilage). Le résultat est au format « piles
+    repliées » (une ligne par pile: « thread;fonction;... nombre »), lisible
+    tel quel ou avec flamegraph.pl / speedscope. Un seul profil à la fois.
+    """
+
+    def __init__(self, max_seconds=30.0):
+        self.max_seconds = max_seconds
+        self._busy = threading.Lock()
+
+    @staticmethod
+    def _stack(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def profile(self, seconds, interval=0.005):
+        """Renvoie le profil en piles repliées, ou None si un profil est déjà en cours."""
+        if not self._busy.acquire(blocking=False):
+            return None
+        try:
+            seconds = max(0.1, min(seconds, self.max_seconds))
+            counts = collections.Counter()
+            own_id = threading.get_ident()
+            deadline = time.monotonic() + seconds
+            samples = 0
+            while time.monotonic() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id != own_id:
+                        counts[f"{names.get(thread_id, thread_id)};{self._stack(frame)}"] += 1
+                samples += 1
+                time.sleep(interval)
+        finally:
+            self._busy.release()
+        lines = [f"# {samples} relevés en {seconds:.1f}s (intervalle {interval * 1000:.0f} ms)"]
+        lines.extend(f"{stack} {count}" for stack, count in counts.most_common())
+        return "\n".join(lines) + "\n"
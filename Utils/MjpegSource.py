@@ -0,0 +1,234 @@
+import threading
+import time
+import urllib.request
+import cv2
+import numpy as np
+
+class LatestJpegSource:
+    """Base des sources qui reçoivent des JPEG dans un thread de lecture (HTTP, série).
+
+    Le thread de lecture appelle _store() pour chaque JPEG complet; seul le
+    DERNIER est gardé (les précédents non lus sont abandonnés sans être
+    décodés): read() renvoie donc toujours l'image la plus récente, jamais une
+    image en retard dans un tampon. Le décodage est fait dans read(), par le
+    thread de capture. Chien de garde: sans nouvelle image depuis
+    `stale_after` secondes, la source est signalée périmée et read() renvoie
+    (False, None).
+
+    Expose la partie de l'interface de cv2.VideoCapture utilisée par CameraManager
+    (isOpened, read, grab, set, release), plus read_jpeg() qui rend les octets
+    JPEG de la caméra sans les décoder.
+    """
+
+    def __init__(self, name, stale_after=2.0, extra_stats=None):
+        self.name = name
+        self.stale_after = stale_after
+        self.running = True
+        self._condition = threading.Condition()
+        self._jpeg = None
+        self._received_at = 0.0
+        self._seq = 0
+        self._read_seq = 0
+        self._stats = {"connected": False, "reconnects": 0, "frames_received": 0,
+                       "frames_decoded": 0, "frames_forwarded": 0, "frames_skipped": 0, "decode_errors": 0,
+                       "receive_fps": 0.0, "decode_ms": 0.0, "stale": False, "stale_events": 0,
+                       "frame_age_ms": None, "last_error": None}
+        self._stats.update(extra_stats or {})
+
+    def _store(self, jpeg):
+        now = time.time()
+        with self._condition:
+            if self._seq > self._read_seq:
+                self._stats["frames_skipped"] += 1  # Jamais lue: remplacée par plus récente
+            if self._received_at:
+                interval = now - self._received_at
+                if interval > 0:
+                    fps = self._stats["receive_fps"]
+                    self._stats["receive_fps"] = 1 / interval if fps == 0 else 0.9 * fps + 0.1 / interval
+            self._jpeg = jpeg
+            self._received_at = now
+            self._seq += 1
+            self._stats["frames_received"] += 1
+            self._condition.notify_all()
+
+    def _set_disconnected(self, error):
+        with self._condition:
+            self._stats["connected"] = False
+            self._stats["reconnects"] += 1
+            self._stats["last_error"] = str(error)
+
+    # --- Interface de type cv2.VideoCapture ---
+
+    def isOpened(self):
+        return self.running
+
+    def _take_latest(self):
+        with self._condition:
+            # Périmée si aucune image n'est arrivée dans les `stale_after` s suivant la précédente
+            deadline = (self._received_at or time.time()) + self.stale_after
+            fresh = self._condition.wait_for(lambda: self._seq > self._read_seq or not self.running,
+                                             max(0.05, deadline - time.time()))
+            if not fresh or not self.running:
+                if not self._stats["stale"]:
+                    self._stats["stale_events"] += 1
+                    print(f"AVERTISSEMENT: aucune image de {self.name} depuis {self.stale_after:.1f}s (flux périmé).")
+                self._stats["stale"] = True
+                return None
+            self._stats["stale"] = False
+            self._read_seq = self._seq
+            self._stats["frame_age_ms"] = round((time.time() - self._received_at) * 1000, 1)
+            return self._jpeg
+
+    def grab(self):
+        """Marque la dernière image comme lue sans la décoder."""
+        return self._take_latest() is not None
+
+    def read_jpeg(self):
+        """Renvoie (True, octets JPEG) de l'image la plus récente non encore lue, sans la décoder."""
+        jpeg = self._take_latest()
+        if jpeg is None:
+            return False, None
+        with self._condition:
+            self._stats["frames_forwarded"] += 1
+        return True, jpeg
+
+    def read(self, buffer=None):
+        """Renvoie (True, image BGR) pour l'image la plus récente non encore lue.
+
+        `buffer` est accepté pour la compatibilité avec cv2.VideoCapture mais
+        l'image décodée est un nouveau tableau (FrameRing l'adopte).
+        """
+        jpeg = self._take_latest()
+        if jpeg is None:
+            return False, None
+        start_time = time.perf_counter()
+        frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+        decode_ms = (time.perf_counter() - start_time) * 1000
+        with self._condition:
+            if frame is None:
+                self._stats["decode_errors"] += 1
+                return False, None
+            self._stats["frames_decoded"] += 1
+            previous = self._stats["decode_ms"]
+            self._stats["decode_ms"] = round(decode_ms if previous == 0 else 0.9 * previous + 0.1 * decode_ms, 2)
+        return True, frame
+
+    def set(self, prop_id, value):
+        return False  # Résolution et cadence sont réglées sur la caméra elle-même
+
+    def release(self):
+        self.running = False
+        with self._condition:
+            self._condition.notify_all()
+
+    def stats(self):
+        with self._condition:
+            stats = dict(self._stats)
+        stats["receive_fps"] = round(stats["receive_fps"], 2)
+        return stats
+
+class MjpegHttpSource(LatestJpegSource):
+    """Lecture directe d'un flux MJPEG HTTP (ESP32-CAM, caméra IP), sans cv2.VideoCapture.
+
+    Un thread lit le flux multipart en continu (voir LatestJpegSource). Si la
+    connexion tombe ou ne reçoit plus rien pendant `read_timeout` secondes, le
+    thread se reconnecte avec un délai exponentiel (de `backoff_initial` à
+    `backoff_max`), sans bloquer les lecteurs.
+    """
+
+    def __init__(self, url, read_timeout=5.0, stale_after=2.0, backoff_initial=0.5, backoff_max=30.0):
+        super().__init__(url, stale_after)
+        self.url = url
+        self.read_timeout = read_timeout
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self._response = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    # --- Thread de lecture ---
+
+    def _run(self):
+        delay = self.backoff_initial
+        while self.running:
+            try:
+                self._response = urllib.request.urlopen(self.url, timeout=self.read_timeout)
+                boundary = self._boundary(self._response.headers.get("Content-Type", ""))
+                with self._condition:
+                    self._stats["connected"] = True
+                print(f"Flux MJPEG connecté: {self.url}")
+                for jpeg in self._parts(self._response, boundary):
+                    self._store(jpeg)
+                    delay = self.backoff_initial  # Flux sain: le prochain échec repart du délai minimal
+                    if not self.running:
+                        break
+                raise ConnectionError("fin du flux")
+            except Exception as e:
+                if not self.running:
+                    break
+                self._set_disconnected(e)
+                print(f"Flux MJPEG {self.url} interrompu ({e}); nouvelle tentative dans {delay:.1f}s.")
+                self._close_response()
+                time.sleep(delay)
+                delay = min(delay * 2, self.backoff_max)
+        self._close_response()
+
+    @staticmethod
+    def _boundary(content_type):
+        for parameter in content_type.split(";")[1:]:
+            key, _, value = parameter.strip().partition("=")
+            if key.lower() == "boundary":
+                value = value.strip('"')
+                return value[2:] if value.startswith("--") else value
+        raise ValueError(f"Content-Type sans boundary: {content_type!r}")
+
+    @staticmethod
+    def _parts(stream, boundary):
+        """Génère les JPEG d'un flux multipart (avec ou sans Content-Length)."""
+        delimiter = b"--" + boundary.encode()
+        line = stream.readline()
+        while True:
+            # Avancer jusqu'au délimiteur de la partie suivante
+            while not line.startswith(delimiter):
+                if not line:
+                    return
+                line = stream.readline()
+            if line.rstrip().endswith(b"--"):
+                return  # Délimiteur final
+            length = None
+            while True:
+                line = stream.readline()
+                if not line:
+                    return
+                if line in (b"\r\n", b"\n"):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                if name.strip().lower() == "content-length":
+                    length = int(value.strip())
+            if length is not None:
+                data = stream.read(length)
+                if len(data) < length:
+                    return
+                line = stream.readline()
+                yield data
+            else:
+                # Sans longueur: la partie s'arrête au délimiteur suivant
+                chunks = []
+                line = stream.readline()
+                while line and not line.startswith(delimiter):
+                    chunks.append(line)
+                    line = stream.readline()
+                data = b"".join(chunks)
+                yield data[:-2] if data.endswith(b"\r\n") else data.rstrip(b"\n")
+
+    def _close_response(self):
+        response, self._response = self._response, None
+        if response is not None:
+            try:
+                response.close()
+            except Exception:
+                pass
+
+    def release(self):
+        super().release()
+        self._close_response()
@@ -0,0 +1,51 @@
+import cv2
+
+class MotionGate:
+    """Pré-filtre de mouvement peu coûteux placé devant YOLO.
+
+    La frame est réduite (largeur `width`), passée en niveaux de gris et floutée,
+    puis comparée à un fond moyen glissant. Un pixel est "en mouvement" si son
+    écart au fond dépasse `pixel_threshold`; la scène bouge si la proportion de
+    ces pixels dépasse `area_threshold`. Sans mouvement, l'inférence n'est
+    autorisée qu'au rythme d'un battement (`heartbeat` secondes) pour revalider
+    l'état de la scène.
+    """
+
+    def __init__(self, width=160, pixel_threshold=25, area_threshold=0.01,
+                 heartbeat=2.0, background_alpha=0.1):
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.area_threshold = area_threshold
+        self.heartbeat = heartbeat
+        self.background_alpha = background_alpha
+        self._background = None
+        self._last_inference_time = 0.0
+        self.last_motion_ratio = 0.0
+
+    def _prepare(self, frame):
+        height, width = frame.shape[:2]
+        scale = self.width / float(width)
+        small = cv2.resize(frame, (self.width, max(1, int(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def motion_ratio(self, frame):
+        """Met à jour le fond et renvoie la proportion de pixels en mouvement (0..1)."""
+        gray = self._prepare(frame)
+        if self._background is None or self._background.shape != gray.shape:
+            self._background = gray.astype("float32")
+            return 1.0  # Première frame: on force une inférence
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self._background))
+        cv2.accumulateWeighted(gray, self._background, self.background_alpha)
+        _, mask = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        return cv2.countNonZero(mask) / float(mask.size)
+
+    def should_infer(self, frame, now):
+        """Indique si YOLO doit tourner sur cette frame (mouvement ou battement)."""
+        self.last_motion_ratio = self.motion_ratio(frame)
+        if (self.last_motion_ratio >= self.area_threshold
+                or now - self._last_inference_time >= self.heartbeat):
+            self._last_inference_time = now
+            return True
+        return False
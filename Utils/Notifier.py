@@ -1,72 +1,257 @@
 import asyncio
+import collections
 import discord
+import io
 import queue
-import os # Ajouté
+import threading
+import time
+from Utils.Metrics import metrics
 
-# File d'attente thread-safe pour communiquer entre le thread de détection (Flask/OpenCV) 
-# et le thread du bot Discord (asyncio).
-notification_queue = queue.Queue()
+class NotificationBridge:
+    """Passerelle thread -> asyncio pour les notifications.
 
-TARGET_USER_ID = 272795289218318336 # L'ID de l'utilisateur à notifier
+    Les threads de détection appellent put_nowait() (non bloquant); la tâche
+    du bot Discord attend get() dans sa boucle asyncio, sans thread d'exécuteur
+    bloqué. Les éléments sont transmis par loop.call_soon_threadsafe dans une
+    asyncio.Queue. Avant que le bot soit prêt (bind()), ils sont gardés en
+    attente. Au-delà de `maxsize` éléments non lus, put_nowait() lève queue.Full.
+    Le temps passé dans la passerelle est mesuré (étape "notification_queue").
+    """
 
-async def notification_sender_task(client: discord.Client):
-    print("Tâche d'envoi de notifications (avec images) démarrée.")
-    loop = asyncio.get_running_loop()
-    while True:
-        image_path_to_delete = None
+    def __init__(self, maxsize=20):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._loop = None
+        self._queue = None
+        self._backlog = collections.deque()  # Avant bind()
+        self._unread = 0
+
+    def bind(self, loop):
+        """Attache la passerelle à la boucle du bot (à appeler depuis cette boucle)."""
+        with self._lock:
+            if self._loop is loop:
+                return  # on_ready peut être rappelé après une reconnexion
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            while self._backlog:
+                self._queue.put_nowait(self._backlog.popleft())
+
+    def put_nowait(self, item):
+        with self._lock:
+            if self._unread >= self.maxsize:
+                raise queue.Full
+            self._unread += 1
+            item = (time.perf_counter(), item)
+            if self._loop is None:
+                self._backlog.append(item)
+                return
+            loop, target = self._loop, self._queue
         try:
-            notification_data = await loop.run_in_executor(None, notification_queue.get)
-            message_content, image_path = notification_data
-            
-            print(f"Notification reçue: '{message_content}', Image: {os.path.basename(image_path) if image_path else 'Aucune'}")
-            
-            if image_path and os.path.exists(image_path):
-                image_path_to_delete = image_path
-            
-            user = await client.fetch_user(TARGET_USER_ID)
-            
-            if user:
-                discord_file = None
-                embed = discord.Embed(
-                    title="🚨 Mouvement détecté",
-                    description=message_content,
-                    color=discord.Color.red()
-                )
-                embed.set_footer(text="Système de détection - Sécurité")
-                
-                if image_path and os.path.exists(image_path):
-                    try:
-                        discord_file = discord.File(image_path, filename="capture.jpg")
-                        embed.set_image(url="attachment://capture.jpg")
-                        print(f"Objet discord.File créé pour {os.path.basename(image_path)}")
-                    except Exception as file_error:
-                        print(f"Erreur lors de la création de discord.File pour {image_path}: {file_error}")
-                        discord_file = None
-
-                await user.send(embed=embed, file=discord_file)
-                
-                if discord_file:
-                    print(f"Notification avec image envoyée à {user.name}")
-                else:
-                    print(f"Notification texte envoyée à {user.name} (pas d'image ou erreur fichier)")
-            else:
-                print(f"Erreur: Impossible de trouver l'utilisateur avec l'ID {TARGET_USER_ID}")
-        
-        except discord.NotFound:
-            print(f"Erreur: Utilisateur {TARGET_USER_ID} non trouvé.")
-        except discord.Forbidden:
-            print(f"Erreur: Le bot n'a pas la permission d'envoyer un message/fichier à l'utilisateur {TARGET_USER_ID}.")
-            print("Vérifiez que l'utilisateur partage un serveur avec le bot ou autorise les DMs.")
-        except discord.HTTPException as http_error:
-            print(f"Erreur HTTP Discord lors de l'envoi de la notification: {http_error}")
-            if 'request entity too large' in str(http_error).lower():
-                print("L'image était peut-être trop volumineuse pour Discord.")
-        except Exception as e:
-            print(f"Erreur inattendue dans notification_sender_task: {e}")
-            await asyncio.sleep(5)
-        finally:
-            if image_path_to_delete:
-                try:
-                    os.remove(image_path_to_delete)
-                except OSError as remove_error:
-                    print(f"Erreur lors de la suppression de l'image temporaire {image_path_to_delete}: {remove_error}")
+            loop.call_soon_threadsafe(target.put_nowait, item)
+        except RuntimeError:  # Boucle du bot fermée
+            with self._lock:
+                self._unread -= 1
+            raise queue.Full
+
+    async def get(self):
+        queued_at, item = await self._queue.get()
+        with self._lock:
+            self._unread -= 1
+        metrics.observe("stage_seconds", time.perf_counter() - queued_at, stage="notification_queue")
+        return item
+
+    def qsize(self):
+        with self._lock:
+            return self._unread
+
+# Passerelle entre le thread de détection (Flask/OpenCV) et le bot Discord (asyncio).
+# Éléments: (message, JPEG en bytes ou None, instant de la détection).
+notification_queue = NotificationBridge()
+
+TARGET_USER_ID = 272795289218318336 # Destinataire par défaut (si aucune liste n'est donnée)
+
+# Compteurs d'envoi (lus par /stats)
+delivery_stats = {
+    "alerts_received": 0,
+    "messages_sent": 0,      # Un message par destinataire
+    "alerts_coalesced": 0,   # Alertes fusionnées dans un message précédent
+    "send_failures": 0,      # Abandons définitifs
+    "retries": 0,
+    "rate_limited": 0,
+    "last_delivery_latency_ms": None,  # Détection -> message envoyé
+    "max_delivery_latency_ms": 0.0,
+}
+
+class RecipientCache:
+    """Cache des utilisateurs et salons Discord résolus, avec durée de vie.
+
+    Évite un fetch_user() (aller-retour REST) à chaque alerte: le cache local
+    du client est consulté d'abord, puis l'API, et le résultat est gardé `ttl`
+    secondes.
+    """
+
+    def __init__(self, client, ttl=3600):
+        self.client = client
+        self.ttl = ttl
+        self._entries = {}
+
+    async def resolve(self, kind, object_id):
+        key = (kind, object_id)
+        cached = self._entries.get(key)
+        if cached is not None and time.monotonic() - cached[1] < self.ttl:
+            return cached[0]
+        if kind == "user":
+            target = self.client.get_user(object_id) or await self.client.fetch_user(object_id)
+        else:
+            target = self.client.get_channel(object_id) or await self.client.fetch_channel(object_id)
+        self._entries[key] = (target, time.monotonic())
+        return target
+
+    def invalidate(self, kind, object_id):
+        self._entries.pop((kind, object_id), None)
+
+def retry_delay(error, attempt, base_delay):
+    """Délai avant la prochaine tentative: Retry-After pour un 429, backoff exponentiel sinon."""
+    if getattr(error, "status", None) == 429:
+        retry_after = getattr(error, "retry_after", None)
+        response = getattr(error, "response", None)
+        if retry_after is None and response is not None:
+            retry_after = (getattr(response, "headers", None) or {}).get("Retry-After")
+        if retry_after is not None:
+            return float(retry_after)
+    return base_delay * (2 ** attempt)
+
+def is_retryable(error):
+    """429 et erreurs serveur/réseau sont retentées; 403, 404... ne le sont pas."""
+    if isinstance(error, discord.HTTPException):
+        status = getattr(error, "status", 0)
+        return status == 429 or status >= 500
+    return isinstance(error, (OSError, asyncio.TimeoutError))
+
+class DiscordNotifier:
+    """Envoi des alertes aux utilisateurs (DM) et salons configurés.
+
+    Une alerte isolée est envoyée immédiatement. Les alertes qui arrivent
+    dans les `coalesce_window` secondes suivant un envoi sont fusionnées en un
+    seul message (galerie d'au plus `max_images` images), envoyé à la fin de
+    la fenêtre: au plus un message par fenêtre pendant une rafale, sans
+    retarder la première alerte. Chaque message est envoyé à tous les destinataires en parallèle
+    (asyncio.gather); un envoi qui échoue est retenté avec un backoff
+    exponentiel, en respectant le Retry-After des réponses 429, sans bloquer
+    les alertes suivantes.
+    """
+
+    def __init__(self, client, bridge, user_ids=(), channel_ids=(), coalesce_window=3.0,
+                 max_images=4, cache_ttl=3600, max_retries=5, base_retry_delay=1.0,
+                 dashboard_url=None, stats=None):
+        self.client = client
+        self.bridge = bridge
+        self.recipients = [("user", user_id) for user_id in user_ids] + \
+                          [("channel", channel_id) for channel_id in channel_ids]
+        self.coalesce_window = coalesce_window
+        self.max_images = max_images
+        self.max_retries = max_retries
+        self.base_retry_delay = base_retry_delay
+        self.dashboard_url = dashboard_url
+        self.stats = delivery_stats if stats is None else stats
+        self.cache = RecipientCache(client, cache_ttl)
+        self._deliveries = set()  # Références des tâches d'envoi en cours
+        self._window_end = 0.0    # Fin de la fenêtre de fusion ouverte par le dernier envoi
+
+    async def run(self):
+        print(f"Tâche d'envoi de notifications démarrée ({len(self.recipients)} destinataire(s)).")
+        self.bridge.bind(asyncio.get_running_loop())
+        while True:
+            try:
+                alerts = await self._next_batch()
+                task = asyncio.create_task(self.deliver(alerts))
+                self._deliveries.add(task)
+                task.add_done_callback(self._deliveries.discard)
+            except Exception as e:
+                print(f"Erreur inattendue dans la tâche de notification: {e}")
+                await asyncio.sleep(5)
+
+    async def _next_batch(self):
+        """Attend une alerte: seule si aucun envoi récent, sinon regroupée avec celles
+        qui arrivent jusqu'à la fin de la fenêtre de fusion en cours."""
+        alerts = [await self.bridge.get()]
+        if time.monotonic() < self._window_end:
+            alerts += await self._collect_until(self._window_end, self.max_images - 1)
+        self._window_end = time.monotonic() + self.coalesce_window
+        self.stats["alerts_received"] += len(alerts)
+        self.stats["alerts_coalesced"] += len(alerts) - 1
+        return alerts
+
+    async def _collect_until(self, deadline, limit):
+        alerts = []
+        while len(alerts) < limit:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                alerts.append(await asyncio.wait_for(self.bridge.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return alerts
+
+    def build_message(self, alerts):
+        """Construit (embeds, files) pour un lot d'alertes; à rappeler pour chaque envoi
+        (un discord.File ne peut être lu qu'une fois)."""
+        messages = list(dict.fromkeys(message for message, _, _ in alerts))
+        description = "\n".join(messages)
+        if len(alerts) > 1:
+            description += f"\n({len(alerts)} alertes regroupées)"
+        embed = discord.Embed(title="🚨 Mouvement détecté", description=description,
+                              color=discord.Color.red(), url=self.dashboard_url)
+        embed.set_footer(text="Système de détection - Sécurité")
+        embeds, files = [embed], []
+        for index, (_, image_bytes, _) in enumerate(alerts):
+            if not image_bytes:
+                continue
+            filename = f"capture_{index}.jpg"
+            files.append(discord.File(io.BytesIO(image_bytes), filename=filename))
+            # Les embeds partageant la même URL sont affichés en galerie par Discord
+            if len(files) > 1:
+                embeds.append(discord.Embed(url=self.dashboard_url))
+            embeds[-1].set_image(url=f"attachment://{filename}")
+        return embeds, files
+
+    async def deliver(self, alerts):
+        detected_at = min(alert[2] for alert in alerts)
+        await asyncio.gather(*(self.send_to(kind, object_id, alerts, detected_at)
+                               for kind, object_id in self.recipients))
+
+    async def send_to(self, kind, object_id, alerts, detected_at):
+        for attempt in range(self.max_retries + 1):
+            try:
+                target = await self.cache.resolve(kind, object_id)
+                embeds, files = self.build_message(alerts)
+                await target.send(embeds=embeds, files=files)
+                latency_ms = (time.time() - detected_at) * 1000
+                metrics.observe("stage_seconds", latency_ms / 1000, stage="notification_delivery")
+                self.stats["messages_sent"] += 1
+                self.stats["last_delivery_latency_ms"] = latency_ms
+                self.stats["max_delivery_latency_ms"] = max(self.stats["max_delivery_latency_ms"], latency_ms)
+                print(f"Notification envoyée à {getattr(target, 'name', object_id)} "
+                      f"({len(alerts)} alerte(s), latence détection -> envoi: {latency_ms:.0f} ms)")
+                return True
+            except Exception as e:
+                if isinstance(e, (discord.NotFound, discord.Forbidden)):
+                    self.cache.invalidate(kind, object_id)
+                if not is_retryable(e) or attempt == self.max_retries:
+                    self.stats["send_failures"] += 1
+                    print(f"Erreur: notification non envoyée au {kind} {object_id}: {e}")
+                    if isinstance(e, discord.Forbidden):
+                        print("Vérifiez que l'utilisateur partage un serveur avec le bot ou autorise les DMs.")
+                    return False
+                delay = retry_delay(e, attempt, self.base_retry_delay)
+                if getattr(e, "status", None) == 429:
+                    self.stats["rate_limited"] += 1
+                self.stats["retries"] += 1
+                print(f"Envoi au {kind} {object_id} échoué ({e}), nouvel essai dans {delay:.1f}s.")
+                await asyncio.sleep(delay)
+
+async def notification_sender_task(client, **options):
+    """Point d'entrée du bot: lance un DiscordNotifier branché sur notification_queue."""
+    options.setdefault("user_ids", [TARGET_USER_ID])
+    await DiscordNotifier(client, notification_queue, **options).run()
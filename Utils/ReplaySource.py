@@ -0,0 +1,169 @@
+import os
+import threading
+import time
+from urllib.parse import parse_qsl
+import cv2
+import numpy as np
+
+JPEG_SUFFIXES = (".jpg", ".jpeg")
+
+class ReplaySource:
+    """Rejoue une vidéo enregistrée ou un répertoire de JPEG comme une caméra.
+
+    Les images sont rendues au rythme de l'enregistrement multiplié par
+    `speed` (1: temps réel, 2: deux fois plus vite), ou aussi vite que
+    possible avec speed=None. Comme une vraie caméra, la source n'attend pas
+    la détection: une image non lue à temps est sautée par la chaîne.
+    À la fin du fichier la source recommence si `loop`, sinon `finished`
+    passe à True et read() renvoie (False, None).
+
+    Expose la même interface que MjpegHttpSource (isOpened, read, grab,
+    set, release, stats); un répertoire de JPEG fournit aussi read_jpeg()
+    pour emprunter le chemin sans décodage des caméras MJPEG.
+    """
+
+    def __init__(self, path, speed=1.0, loop=False, fps=None):
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self.running = True
+        self.finished = False
+        self.fps = fps or 15.0
+        self._index = 0        # Rang de la prochaine image depuis le début de la passe
+        self._started = None   # Instant (monotonic) de la première image de la passe
+        self._lock = threading.Lock()
+        self._stats = {"frames": 0, "loops": 0, "late_frames": 0, "finished": False}
+
+    @classmethod
+    def from_uri(cls, uri):
+        """Crée la source décrite par « replay:<chemin>[?speed=2|max&loop=1&fps=15] »."""
+        path, _, query = uri[len("replay:"):].partition("?")
+        options = dict(parse_qsl(query))
+        speed = options.get("speed", "1")
+        kwargs = {"speed": None if speed == "max" else float(speed),
+                  "loop": options.get("loop", "0") == "1",
+                  "fps": float(options["fps"]) if "fps" in options else None}
+        if os.path.isdir(path):
+            return JpegDirectoryReplay(path, **kwargs)
+        return VideoFileReplay(path, **kwargs)
+
+    def _wait_turn(self):
+        """Attend l'instant de la prochaine image (rythme de l'enregistrement)."""
+        now = time.monotonic()
+        if self._started is None:
+            self._started = now
+        if self.speed:
+            due = self._started + self._index / (self.fps * self.speed)
+            if due > now:
+                time.sleep(due - now)
+            elif now - due > 1.0 / self.fps:
+                self._stats["late_frames"] += 1  # Lecture plus lente que l'enregistrement
+        self._index += 1
+
+    def _end_of_pass(self):
+        """Fin du fichier: True si une nouvelle passe commence."""
+        if self.loop:
+            self._stats["loops"] += 1
+            self._index, self._started = 0, None
+            return True
+        if not self.finished:
+            print(f"Rejeu de '{self.path}' terminé ({self._stats['frames']} images).")
+        self.finished = True
+        self._stats["finished"] = True
+        return False
+
+    def isOpened(self):
+        return self.running
+
+    def grab(self):
+        return self._next() is not None
+
+    def set(self, prop_id, value):
+        return False  # Taille et cadence sont celles de l'enregistrement
+
+    def release(self):
+        self.running = False
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, fps=self.fps, speed=self.speed or "max", frames_skipped=0)
+
+class VideoFileReplay(ReplaySource):
+    """Vidéo lue par cv2.VideoCapture, à la cadence indiquée dans le fichier."""
+
+    def __init__(self, path, speed=1.0, loop=False, fps=None):
+        super().__init__(path, speed, loop, fps)
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            self.running = False
+            print(f"Impossible d'ouvrir la vidéo à rejouer: {path}")
+        elif fps is None:
+            self.fps = self.capture.get(cv2.CAP_PROP_FPS) or self.fps
+
+    def _next(self, buffer=None):
+        with self._lock:
+            if self.finished or not self.running:
+                return None
+            self._wait_turn()
+            ret, frame = self.capture.read(buffer)
+            if not ret:
+                if not self._end_of_pass():
+                    return None
+                self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = self.capture.read(buffer)
+                if not ret:
+                    return None
+            self._stats["frames"] += 1
+            return frame
+
+    def read(self, buffer=None):
+        frame = self._next(buffer)
+        if frame is None:
+            time.sleep(0.05)
+            return False, None
+        return True, frame
+
+    def release(self):
+        super().release()
+        self.capture.release()
+
+class JpegDirectoryReplay(ReplaySource):
+    """Répertoire de JPEG rejoués dans l'ordre des noms (15 images/s par défaut)."""
+
+    def __init__(self, path, speed=1.0, loop=False, fps=None):
+        super().__init__(path, speed, loop, fps)
+        self.files = sorted(os.path.join(path, name) for name in os.listdir(path)
+                            if name.lower().endswith(JPEG_SUFFIXES))
+        self._position = 0
+        if not self.files:
+            self.running = False
+            print(f"Aucune image JPEG à rejouer dans '{path}'.")
+
+    def _next(self):
+        with self._lock:
+            if self.finished or not self.running:
+                return None
+            if self._position >= len(self.files):
+                if not self._end_of_pass():
+                    return None
+                self._position = 0
+            self._wait_turn()
+            path = self.files[self._position]
+            self._position += 1
+            self._stats["frames"] += 1
+        with open(path, "rb") as image_file:
+            return image_file.read()
+
+    def read_jpeg(self):
+        jpeg = self._next()
+        if jpeg is None:
+            time.sleep(0.05)
+            return False, None
+        return True, jpeg
+
+    def read(self, buffer=None):
+        ret, jpeg = self.read_jpeg()
+        if not ret:
+            return False, None
+        frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+        return frame is not None, frame
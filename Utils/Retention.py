@@ -0,0 +1,204 @@
+import os
+import threading
+import time
+
+class RetainedDirectory:
+    """Index d'un répertoire surveillé et ses limites (octets, âge, nombre de fichiers).
+
+    L'index {nom: (mtime, taille)} est tenu à jour par un parcours incrémental
+    (au plus `scan_batch` entrées par passage, reprises au passage suivant) et
+    par note_file() pour les fichiers que l'application vient d'écrire: on ne
+    relit jamais tout le répertoire d'un coup sur la carte SD.
+
+    `on_evict(chemin)` est appelé après chaque suppression (fichiers associés,
+    ex. la vignette d'une image du journal).
+    """
+
+    def __init__(self, path, max_bytes=None, max_age=None, max_count=None,
+                 suffixes=(".jpg",), scan_batch=500, on_evict=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.max_count = max_count
+        self.suffixes = suffixes
+        self.scan_batch = scan_batch
+        self.on_evict = on_evict
+        self.files = {}
+        self.bytes_used = 0
+        self.evicted_files = 0
+        self.evicted_bytes = 0
+        self.errors = 0
+        self.full_scans = 0
+        self._scan = None        # Itérateur os.scandir du parcours en cours
+        self._seen = set()       # Noms vus pendant le parcours en cours
+
+    def _matches(self, name):
+        return name.endswith(self.suffixes)
+
+    def _set(self, name, mtime, size):
+        previous = self.files.get(name)
+        if previous is not None:
+            self.bytes_used -= previous[1]
+        self.files[name] = (mtime, size)
+        self.bytes_used += size
+
+    def _forget(self, name):
+        previous = self.files.pop(name, None)
+        if previous is not None:
+            self.bytes_used -= previous[1]
+
+    def note_file(self, name):
+        try:
+            stat = os.stat(os.path.join(self.path, name))
+        except OSError:
+            return
+        self._seen.add(name)  # Créé après le début du parcours en cours: ne pas l'oublier à la fin
+        self._set(name, stat.st_mtime, stat.st_size)
+
+    def scan_step(self):
+        """Avance le parcours du répertoire de `scan_batch` entrées au plus."""
+        if self._scan is None:
+            try:
+                self._scan = os.scandir(self.path)
+            except FileNotFoundError:
+                return
+            self._seen = set()
+        for _ in range(self.scan_batch):
+            try:
+                entry = next(self._scan)
+            except StopIteration:
+                # Fin du parcours: les fichiers disparus sont retirés de l'index
+                self._scan.close()
+                self._scan = None
+                for name in set(self.files) - self._seen:
+                    self._forget(name)
+                self.full_scans += 1
+                return
+            except OSError:
+                self.errors += 1
+                continue
+            if not self._matches(entry.name):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue  # Supprimé entre-temps
+            self._seen.add(entry.name)
+            self._set(entry.name, stat.st_mtime, stat.st_size)
+
+    def evict(self, now):
+        """Supprime les fichiers les plus anciens jusqu'à respecter les limites. Renvoie le nombre supprimé."""
+        evicted = 0
+        # Tant que le premier parcours n'est pas terminé, l'index est partiel:
+        # seule la limite d'âge est appliquée (les plus anciens ne sont pas encore tous connus)
+        indexed = self.full_scans > 0
+        for name, (mtime, size) in sorted(self.files.items(), key=lambda item: item[1][0]):
+            too_old = self.max_age is not None and now - mtime > self.max_age
+            too_many = indexed and self.max_count is not None and len(self.files) > self.max_count
+            too_big = indexed and self.max_bytes is not None and self.bytes_used > self.max_bytes
+            if not (too_old or too_many or too_big):
+                break  # Les suivants sont plus récents
+            try:
+                os.remove(os.path.join(self.path, name))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Erreur lors de la suppression de {name} dans '{self.path}': {e}")
+                self.errors += 1
+                continue
+            self._forget(name)
+            if self.on_evict is not None:
+                try:
+                    self.on_evict(os.path.join(self.path, name))
+                except OSError as e:
+                    print(f"Erreur lors du nettoyage associé à {name} dans '{self.path}': {e}")
+            self.evicted_files += 1
+            self.evicted_bytes += size
+            evicted += 1
+        return evicted
+
+    def stats(self):
+        return {"files": len(self.files), "bytes_used": self.bytes_used,
+                "evicted_files": self.evicted_files, "evicted_bytes": self.evicted_bytes,
+                "errors": self.errors, "full_scans": self.full_scans,
+                "max_bytes": self.max_bytes, "max_age": self.max_age, "max_count": self.max_count}
+
+class RetentionManager:
+    """Nettoyage en arrière-plan des répertoires d'images (journal, temporaires).
+
+    Un thread parcourt chaque répertoire par petits morceaux toutes les
+    `interval` secondes et supprime les fichiers les plus anciens dès qu'une
+    limite (octets, âge en secondes, nombre de fichiers) est dépassée.
+    """
+
+    def __init__(self, interval=30.0):
+        self.interval = interval
+        self._directories = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def add_directory(self, path, **limits):
+        with self._lock:
+            self._directories[os.path.normpath(path)] = RetainedDirectory(path, **limits)
+
+    def remove_orphans(self, path, suffixes=(".tmp",), all_files=False):
+        """Nettoyage au démarrage: fichiers laissés par un arrêt brutal.
+
+        Supprime les fichiers dont le nom finit par `suffixes` (écritures
+        atomiques interrompues), ou tous les fichiers si `all_files`
+        (répertoire temporaire: aucun fichier n'y est encore utilisé).
+        """
+        removed = 0
+        try:
+            entries = list(os.scandir(path))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            if entry.is_file() and (all_files or entry.name.endswith(suffixes)):
+                try:
+                    os.remove(entry.path)
+                    removed += 1
+                except OSError as e:
+                    print(f"Impossible de supprimer le fichier orphelin {entry.path}: {e}")
+        if removed:
+            print(f"{removed} fichier(s) orphelin(s) supprimé(s) dans '{path}'.")
+        return removed
+
+    def note_file(self, path):
+        """Signale un fichier qui vient d'être écrit (pris en compte sans attendre le parcours)."""
+        directory = self._directories.get(os.path.normpath(os.path.dirname(path)))
+        if directory is not None:
+            with self._lock:
+                directory.note_file(os.path.basename(path))
+            self._wakeup.set()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def run_once(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            for directory in self._directories.values():
+                directory.scan_step()
+                evicted = directory.evict(now)
+                if evicted:
+                    print(f"Rétention: {evicted} fichier(s) supprimé(s) dans '{directory.path}' "
+                          f"({directory.bytes_used / 1e6:.1f} Mo utilisés).")
+
+    def _run(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Erreur du nettoyage des images: {e}")
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+    def stats(self):
+        with self._lock:
+            return {directory.path: directory.stats() for directory in self._directories.values()}
@@ -0,0 +1,68 @@
+import cv2
+import numpy as np
+from Utils.Detections import Detections
+
+class RegionOfInterest:
+    """Zone utile d'une caméra (la porte), en coordonnées de la frame complète.
+
+    Accepte un rectangle (x1, y1, x2, y2) ou un polygone [(x, y), ...].
+    La frame est recadrée sur la boîte englobante du polygone avant
+    l'inférence, puis les détections sont replacées dans la frame complète et
+    celles dont le point bas-centre (les pieds) sort du polygone sont écartées.
+    """
+
+    def __init__(self, points):
+        if len(points) == 4 and all(isinstance(value, (int, float)) for value in points):
+            x1, y1, x2, y2 = points
+            points = [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
+        if len(points) < 3:
+            raise ValueError(f"ROI invalide (au moins 3 points attendus): {points}")
+        self.polygon = np.array(points, dtype=np.int32)
+
+    @classmethod
+    def from_config(cls, value):
+        """Construit une ROI depuis la config, ou renvoie None si aucune n'est définie."""
+        return cls(value) if value else None
+
+    def bounding_box(self, frame_shape):
+        """Boîte englobante (x1, y1, x2, y2) du polygone, bornée à la frame."""
+        height, width = frame_shape[:2]
+        x, y, w, h = cv2.boundingRect(self.polygon)
+        x1, y1 = max(0, x), max(0, y)
+        x2, y2 = min(width, x + w), min(height, y + h)
+        return x1, y1, x2, y2
+
+    def crop(self, frame):
+        """Renvoie (vue recadrée sans copie, décalage (x1, y1))."""
+        x1, y1, x2, y2 = self.bounding_box(frame.shape)
+        return frame[y1:y2, x1:x2], (x1, y1)
+
+    def contains(self, x, y):
+        return cv2.pointPolygonTest(self.polygon, (float(x), float(y)), False) >= 0
+
+    def draw(self, frame, color=(255, 200, 0)):
+        """Dessine le contour de la ROI sur une frame inscriptible."""
+        cv2.polylines(frame, [self.polygon], True, color, 1)
+
+    def map_result(self, result, frame, offset):
+        """Replace un résultat YOLO obtenu sur le recadrage dans la frame complète.
+
+        Les boîtes sont décalées de `offset` et filtrées par le polygone. Le
+        résultat renvoyé (Results Ultralytics ou Detections, selon l'entrée) a
+        `frame` pour image d'origine, si bien que plot() annote directement la
+        frame complète.
+        """
+        if isinstance(result, Detections):
+            data = result.boxes.copy()
+        else:
+            data = result.boxes.data.clone()
+        x_offset, y_offset = offset
+        data[:, [0, 2]] += x_offset
+        data[:, [1, 3]] += y_offset
+        keep = [self.contains((row[0] + row[2]) / 2, row[3]) for row in data.tolist()]
+        if keep:
+            data = data[keep]  # Masque booléen (accepté par torch et numpy)
+        if isinstance(result, Detections):
+            return Detections(data, frame, result.names)
+        from ultralytics.engine.results import Results
+        return Results(frame, path=result.path, names=result.names, boxes=data)
@@ -0,0 +1,178 @@
+import struct
+import threading
+import time
+import zlib
+from urllib.parse import parse_qsl
+from Utils.MjpegSource import LatestJpegSource
+
+try:
+    import serial
+    SERIAL_AVAILABLE = True
+except ImportError:
+    SERIAL_AVAILABLE = False
+
+# Trame envoyée par l'ESP32-CAM pour chaque image (entiers little-endian):
+#   MAGIC (4 octets) | numéro de trame (u32) | longueur du JPEG (u32) | CRC32 du JPEG (u32)
+#   | CRC32 des 16 octets précédents (u32) | JPEG
+# Le CRC de l'en-tête est vérifié avant d'attendre le JPEG: une longueur
+# corrompue ne fait jamais attendre des octets qui n'arriveront pas.
+FRAME_MAGIC = b"\xa5\x5aJP"
+FRAME_HEADER = struct.Struct("<4sIIII")
+HEADER_CHECKED_BYTES = FRAME_HEADER.size - 4  # Octets couverts par le CRC de l'en-tête
+
+def encode_frame(jpeg, seq):
+    """Construit la trame d'une image (utilisé par le simulateur et les tests de la carte)."""
+    header = struct.pack("<4sIII", FRAME_MAGIC, seq & 0xFFFFFFFF, len(jpeg), zlib.crc32(jpeg))
+    return header + struct.pack("<I", zlib.crc32(header)) + jpeg
+
+class FrameParser:
+    """Découpe un flux d'octets en JPEG, en se resynchronisant après une corruption.
+
+    Les octets reçus sont accumulés; un en-tête n'est accepté que si son
+    CRC32 est correct et sa longueur plausible (au plus `max_frame_bytes`),
+    puis la trame seulement si le CRC32 du JPEG est correct et le JPEG
+    délimité par FFD8/FFD9. Sinon on avance d'un octet après le MAGIC
+    rejeté et on recherche le suivant: une trame valide qui suit des octets
+    perdus ou corrompus est donc retrouvée sans attendre de délai.
+    """
+
+    def __init__(self, max_frame_bytes=512_000):
+        self.max_frame_bytes = max_frame_bytes
+        self._buffer = bytearray()
+        self._last_seq = None
+        self.stats = {"bytes": 0, "frames": 0, "crc_errors": 0, "header_errors": 0, "resyncs": 0,
+                      "oversize": 0, "invalid_jpeg": 0, "lost_frames": 0, "discarded_bytes": 0}
+
+    def feed(self, data):
+        """Ajoute des octets reçus; renvoie la liste des JPEG complets et valides."""
+        self.stats["bytes"] += len(data)
+        buffer = self._buffer
+        buffer += data
+        frames = []
+        while True:
+            start = buffer.find(FRAME_MAGIC)
+            if start < 0:
+                # Garder de quoi reconnaître un MAGIC coupé entre deux lectures
+                keep = len(FRAME_MAGIC) - 1
+                self._discard(max(0, len(buffer) - keep))
+                break
+            if start:
+                self._discard(start)
+                self.stats["resyncs"] += 1
+            if len(buffer) < FRAME_HEADER.size:
+                break
+            _, seq, length, crc, header_crc = FRAME_HEADER.unpack_from(buffer)
+            if zlib.crc32(buffer[:HEADER_CHECKED_BYTES]) != header_crc:
+                self.stats["header_errors"] += 1
+                self._discard(1)
+                continue
+            if length > self.max_frame_bytes:
+                self.stats["oversize"] += 1
+                self._discard(1)
+                continue
+            end = FRAME_HEADER.size + length
+            if len(buffer) < end:
+                break
+            jpeg = bytes(buffer[FRAME_HEADER.size:end])
+            if zlib.crc32(jpeg) != crc:
+                self.stats["crc_errors"] += 1
+                self._discard(1)
+                continue
+            if not (jpeg.startswith(b"\xff\xd8") and jpeg.endswith(b"\xff\xd9")):
+                self.stats["invalid_jpeg"] += 1
+                self._discard(end)
+                continue
+            del buffer[:end]
+            if self._last_seq is not None and seq > self._last_seq + 1:
+                self.stats["lost_frames"] += seq - self._last_seq - 1
+            self._last_seq = seq
+            self.stats["frames"] += 1
+            frames.append(jpeg)
+        return frames
+
+    def _discard(self, count):
+        if count:
+            del self._buffer[:count]
+            self.stats["discarded_bytes"] += count
+
+class SerialJpegSource(LatestJpegSource):
+    """Images JPEG de l'ESP32-CAM reçues par liaison série (UART haut débit, pyserial).
+
+    Un thread lit le port en continu et découpe les trames (FrameParser); seule
+    la dernière image complète est gardée (voir LatestJpegSource). Si le port
+    disparaît (carte débranchée), il est rouvert avec un délai exponentiel.
+    stats() ajoute le débit (octets/s), les images/s et les erreurs de CRC.
+    """
+
+    def __init__(self, port, baudrate=2_000_000, stale_after=2.0, max_frame_bytes=512_000,
+                 backoff_initial=0.5, backoff_max=30.0):
+        super().__init__(f"{port} ({baudrate} bauds)", stale_after,
+                         extra_stats={"bytes_per_s": 0.0, "crc_errors": 0, "header_errors": 0, "resyncs": 0})
+        self.port = port
+        self.baudrate = baudrate
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.parser = FrameParser(max_frame_bytes)
+        self._serial = None
+        if not SERIAL_AVAILABLE:
+            print("ERREUR: pyserial n'est pas installé (pip install pyserial): caméra série indisponible.")
+            self.running = False
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_uri(cls, uri, **kwargs):
+        """Crée la source décrite par « serial:<port>[?baud=2000000] » (ex. serial:COM5, serial:/dev/ttyUSB0)."""
+        port, _, query = uri[len("serial:"):].partition("?")
+        options = dict(parse_qsl(query))
+        if "baud" in options:
+            kwargs["baudrate"] = int(options["baud"])
+        return cls(port, **kwargs)
+
+    def _run(self):
+        delay = self.backoff_initial
+        window_start, window_bytes = time.monotonic(), 0
+        while self.running:
+            try:
+                self._serial = serial.Serial(self.port, self.baudrate, timeout=0.1)
+                with self._condition:
+                    self._stats["connected"] = True
+                print(f"Port série ouvert: {self.name}")
+                delay = self.backoff_initial
+                while self.running:
+                    data = self._serial.read(max(1, min(self._serial.in_waiting, 65536)))
+                    if data:
+                        for jpeg in self.parser.feed(data):
+                            self._store(jpeg)
+                        window_bytes += len(data)
+                    now = time.monotonic()
+                    if now - window_start >= 1.0:
+                        with self._condition:
+                            self._stats["bytes_per_s"] = round(window_bytes / (now - window_start))
+                            self._stats["crc_errors"] = self.parser.stats["crc_errors"]
+                            self._stats["header_errors"] = self.parser.stats["header_errors"]
+                            self._stats["resyncs"] = self.parser.stats["resyncs"]
+                        window_start, window_bytes = now, 0
+            except Exception as e:
+                if not self.running:
+                    break
+                self._set_disconnected(e)
+                print(f"Port série {self.port} indisponible ({e}); nouvelle tentative dans {delay:.1f}s.")
+                self._close_port()
+                time.sleep(delay)
+                delay = min(delay * 2, self.backoff_max)
+        self._close_port()
+
+    def _close_port(self):
+        port, self._serial = self._serial, None
+        if port is not None:
+            try:
+                port.close()
+            except Exception:
+                pass
+
+    def stats(self):
+        stats = super().stats()
+        stats["parser"] = dict(self.parser.stats)
+        return stats
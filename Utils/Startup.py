@@ -0,0 +1,52 @@
+import threading
+import time
+import traceback
+
+class StartupStatus:
+    """Démarrage en arrière-plan des composants lents (base, modèle, caméras).
+
+    Chaque composant démarre dans son propre thread, en parallèle des autres
+    et du serveur web, qui répond donc dès le lancement. run() enregistre
+    l'état de chaque composant: "starting", puis "ready", "degraded" (la
+    fonction a renvoyé False: l'application fonctionne en mode réduit, ex.
+    journal en mémoire sans MySQL) ou "failed" (exception).
+
+    L'application est prête (/readyz) quand tous les composants `required`
+    sont "ready".
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._components = {}
+        self._lock = threading.Lock()
+
+    def run(self, name, target, required=True):
+        with self._lock:
+            self._components[name] = {"state": "starting", "required": required,
+                                      "seconds": None, "error": None}
+        threading.Thread(target=self._run, args=(name, target), daemon=True,
+                         name=f"startup-{name}").start()
+
+    def _run(self, name, target):
+        start_time = time.monotonic()
+        try:
+            state = "degraded" if target() is False else "ready"
+            error = None
+        except Exception as e:
+            traceback.print_exc()
+            state, error = "failed", str(e)
+        seconds = round(time.monotonic() - start_time, 2)
+        with self._lock:
+            self._components[name].update(state=state, seconds=seconds, error=error)
+        print(f"Démarrage: {name} {state} en {seconds:.2f}s" + (f" ({error})" if error else ""))
+
+    def ready(self):
+        with self._lock:
+            return all(component["state"] == "ready"
+                       for component in self._components.values() if component["required"])
+
+    def snapshot(self):
+        with self._lock:
+            components = {name: dict(component) for name, component in self._components.items()}
+        return {"ready": self.ready(), "uptime_s": round(time.time() - self.started_at, 1),
+                "components": components}
@@ -0,0 +1,395 @@
+import asyncio
+import threading
+import time
+import cv2
+import numpy as np
+from Utils.FrameRing import FrameRef, EncodedFrame
+from Utils.Metrics import metrics
+
+MJPEG_BOUNDARY = b'--frame\r\n'
+
+def make_placeholder_frame(text, width=640, height=480):
+    """Crée une frame noire avec un message centré à gauche (attente, caméra absente...)."""
+    blank = np.zeros((height, width, 3), dtype=np.uint8)
+    cv2.putText(blank, text, (50, height // 2),
+                cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+    return blank
+
+def mjpeg_part(jpeg_bytes):
+    """Emballe des octets JPEG dans une partie multipart/x-mixed-replace."""
+    return (MJPEG_BOUNDARY +
+            b'Content-Type: image/jpeg\r\n\r\n' + jpeg_bytes + b'\r\n')
+
+# Paliers de largeur et de qualité: les demandes des clients sont ramenées au
+# palier inférieur, si bien qu'une frame n'est encodée qu'une fois par palier
+# (largeur, qualité), quel que soit le nombre de clients.
+WIDTH_TIERS = (320, 480, 640, 960, 1280, 1920)
+QUALITY_TIERS = (40, 55, 70, 85, 95)
+
+def snap_to_tier(value, tiers):
+    """Plus grand palier <= value (le plus petit palier si value est en dessous)."""
+    candidates = [tier for tier in tiers if tier <= value]
+    return candidates[-1] if candidates else tiers[0]
+
+class StreamProfile:
+    """Paramètres de flux d'un client: largeur, qualité JPEG et cadence maximale.
+
+    Avec `adaptive`, le temps passé bloqué à écrire vers le client est mesuré
+    sur des fenêtres de quelques secondes. Les tampons du noyau et du serveur
+    absorbent d'abord le retard, puis l'écriture bloque longtemps d'un coup:
+    c'est donc la part du temps passée bloquée, et non la durée d'un envoi,
+    qui décide. Au-delà de `downgrade_ratio` le profil descend d'un cran
+    (qualité puis largeur, en alternance); sous `upgrade_ratio` pendant
+    `upgrade_delay` secondes, il remonte vers les valeurs demandées.
+    """
+
+    window = 2.0             # Secondes de mesure avant une décision
+    downgrade_ratio = 0.5    # Bloqué plus de la moitié du temps: on descend
+    upgrade_ratio = 0.05     # Presque jamais bloqué: on peut remonter
+    upgrade_delay = 10.0     # Secondes minimum depuis le dernier changement pour remonter
+
+    def __init__(self, width=None, quality=85, max_fps=None, adaptive=True, passthrough=False):
+        self.requested_width = snap_to_tier(width, WIDTH_TIERS) if width else None
+        # Renvoyer tel quel le JPEG de la caméra quand il y en a un (niveau 0 seulement)
+        self.passthrough = passthrough
+        self.requested_quality = snap_to_tier(quality, QUALITY_TIERS)
+        self.max_fps = max_fps if max_fps and max_fps > 0 else None
+        self.adaptive = adaptive
+        self.level = 0
+        self.downgrades = 0
+        self.blocked_ratio = None  # Part du temps bloqué à écrire (dernière fenêtre)
+        self._ladder = None
+        self._source_width = None
+        self._window_start = None
+        self._blocked = 0.0
+        self._last_change = 0.0
+
+    @property
+    def frame_interval(self):
+        """Intervalle minimum entre deux frames envoyées (0: pas de limite)."""
+        return 1.0 / self.max_fps if self.max_fps else 0.0
+
+    def _build_ladder(self, source_width):
+        width = min(self.requested_width or source_width, source_width)
+        widths = [width] + [tier for tier in reversed(WIDTH_TIERS) if tier < width]
+        qualities = [self.requested_quality] + [tier for tier in reversed(QUALITY_TIERS)
+                                                if tier < self.requested_quality]
+        ladder = [(widths[0], qualities[0])]
+        width_index = quality_index = 0
+        while width_index < len(widths) - 1 or quality_index < len(qualities) - 1:
+            lower_quality = len(ladder) % 2 == 1 and quality_index < len(qualities) - 1
+            if lower_quality or width_index >= len(widths) - 1:
+                quality_index += 1
+            else:
+                width_index += 1
+            ladder.append((widths[width_index], qualities[quality_index]))
+        self._ladder = ladder
+        self._source_width = source_width
+        self.level = min(self.level, len(ladder) - 1)
+
+    def settings_for(self, source_width):
+        """(largeur ou None pour la taille d'origine, qualité) pour une frame de `source_width` px."""
+        if self._ladder is None or source_width != self._source_width:
+            self._build_ladder(source_width)
+        width, quality = self._ladder[self.level]
+        return (None if width >= source_width else width), quality
+
+    def record_write(self, seconds, now):
+        """Enregistre le temps bloqué à écrire une frame et ajuste le niveau si besoin."""
+        if not self.adaptive or self._ladder is None:
+            return
+        if self._window_start is None:
+            self._window_start = now - seconds
+            self._last_change = self._window_start
+        self._blocked += seconds
+        elapsed = now - self._window_start
+        if elapsed < self.window:
+            return
+        self.blocked_ratio = self._blocked / elapsed
+        self._window_start, self._blocked = now, 0.0
+        if self.blocked_ratio > self.downgrade_ratio and self.level < len(self._ladder) - 1:
+            self.level += 1
+            self.downgrades += 1
+            self._last_change = now
+        elif (self.blocked_ratio < self.upgrade_ratio and self.level > 0
+                and now - self._last_change >= self.upgrade_delay):
+            self.level -= 1
+            self._last_change = now
+
+class AsyncWakeup:
+    """Réveille depuis n'importe quel thread des tâches asyncio en attente.
+
+    Chaque tâche enregistre un asyncio.Event lié à sa boucle; notify_all()
+    planifie un seul rappel par boucle (loop.call_soon_threadsafe) qui lève
+    tous les événements de cette boucle. Aucun thread n'est bloqué par client.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters = {}  # boucle -> set(asyncio.Event)
+
+    def register(self):
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        with self._lock:
+            self._waiters.setdefault(loop, set()).add(event)
+        return event
+
+    def unregister(self, event):
+        with self._lock:
+            for loop, events in list(self._waiters.items()):
+                events.discard(event)
+                if not events:
+                    del self._waiters[loop]
+
+    def notify_all(self):
+        with self._lock:
+            targets = [(loop, tuple(events)) for loop, events in self._waiters.items()]
+        for loop, events in targets:
+            try:
+                loop.call_soon_threadsafe(_set_events, events)
+            except RuntimeError:
+                pass  # Boucle fermée
+
+def _set_events(events):
+    for event in events:
+        event.set()
+
+class FrameBroadcaster:
+    """Diffuse la dernière frame d'un flux à tous les clients MJPEG connectés.
+
+    Chaque frame publiée reçoit un numéro de séquence croissant. L'encodage JPEG
+    n'est fait qu'une seule fois par (séquence, qualité), au premier client qui
+    la demande ; les autres clients réutilisent les mêmes octets. Les abonnés
+    attendent la séquence suivante sur une Condition au lieu de dormir, ils ne
+    reçoivent donc jamais deux fois la même frame.
+
+    Les frames sont gardées sous forme de FrameRef: le hub conserve une
+    référence sur la dernière frame publiée et chaque lecteur prend sa propre
+    référence le temps de l'utiliser, ce qui permet de diffuser les slots du
+    FrameRing sans copie.
+    """
+
+    def __init__(self, name, placeholder_text="Attente de la premiere frame..."):
+        self.name = name
+        self._condition = threading.Condition()
+        self._seq = 0
+        self._ref = None
+        # Cache des parties MJPEG encodées pour la séquence courante: (largeur, qualité) -> octets
+        self._encoded = {}
+        self._encoded_seq = 0
+        self._encode_lock = threading.Lock()
+        self._placeholder = make_placeholder_frame(placeholder_text)
+        self._wakeup = AsyncWakeup()
+        self.encode_count = 0
+        self.passthrough_count = 0  # Frames envoyées avec le JPEG d'origine de la caméra
+        self.subscriber_count = 0
+        self.dropped_frames = 0  # Frames sautées pour des clients trop lents
+        self.downgrades = 0      # Baisses automatiques de qualité/taille (clients lents)
+
+    def publish(self, frame):
+        """Publie une nouvelle frame et réveille tous les abonnés.
+
+        Args:
+            frame: un FrameRef (dont le hub prend possession) ou un numpy.ndarray,
+                qui ne doit alors plus être modifié par l'appelant.
+        """
+        ref = frame if isinstance(frame, (FrameRef, EncodedFrame)) else FrameRef.detached(frame)
+        with self._condition:
+            previous = self._ref
+            self._seq += 1
+            self._ref = ref
+            self._condition.notify_all()
+        self._wakeup.notify_all()
+        if previous is not None:
+            previous.release()
+
+    def acquire_latest(self):
+        """Renvoie (séquence, FrameRef) de la dernière publication, ou (0, None).
+
+        La référence renvoyée doit être libérée par l'appelant.
+        """
+        with self._condition:
+            return self._seq, self._ref.retain() if self._ref is not None else None
+
+    def wait_for_next(self, last_seq, timeout=1.0):
+        """Bloque jusqu'à ce qu'une séquence > last_seq soit publiée.
+
+        Returns:
+            tuple: (séquence, FrameRef ou None) ; la séquence vaut last_seq et la
+            référence None si le délai a expiré.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._seq > last_seq, timeout)
+            if self._seq == last_seq or self._ref is None:
+                return self._seq, None
+            return self._seq, self._ref.retain()
+
+    def _cached_part(self, seq, key, build):
+        with self._encode_lock:
+            if self._encoded_seq != seq:
+                self._encoded = {}
+                self._encoded_seq = seq
+            part = self._encoded.get(key)
+            if part is None:
+                part = build()
+                if part is None:
+                    return None
+                self._encoded[key] = part
+            return part
+
+    def get_encoded(self, seq, frame, quality=85, width=None):
+        """Renvoie la partie MJPEG de la frame `seq`, encodée au plus une fois par (largeur, qualité).
+
+        `width` (None: taille d'origine) réduit la frame en gardant ses proportions.
+        """
+        source = frame if frame is not None else self._placeholder
+        if width is not None and width >= source.shape[1]:
+            width = None
+
+        def encode():
+            start_time = time.perf_counter()
+            image = source
+            if width is not None:
+                height = max(1, round(image.shape[0] * width / image.shape[1]))
+                image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+            ret, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            if not ret:
+                return None
+            self.encode_count += 1
+            metrics.observe("stage_seconds", time.perf_counter() - start_time,
+                            stage="jpeg_encode", stream=self.name)
+            return mjpeg_part(buffer.tobytes())
+
+        return self._cached_part(seq, (width, quality), encode)
+
+    def part_for(self, seq, ref, profile):
+        """Partie MJPEG de `ref` pour un client de profil `profile`.
+
+        Un JPEG venu de la caméra (EncodedFrame) est renvoyé sans décodage ni
+        réencodage tant que le client n'a demandé ni taille ni qualité et n'a
+        pas été rétrogradé; sinon il est décodé (une fois) puis encodé au palier.
+        """
+        if ref.jpeg is not None and profile.passthrough and profile.level == 0:
+            def forward():
+                self.passthrough_count += 1
+                return mjpeg_part(ref.jpeg)
+            return self._cached_part(seq, "source", forward)
+        width, quality = profile.settings_for(ref.width)
+        return self.get_encoded(seq, ref.frame, quality, width)
+
+    def _encode_latest(self, last_seq, profile):
+        """Renvoie (séquence, partie MJPEG) de la dernière frame si elle est plus récente que last_seq."""
+        seq, ref = self.acquire_latest()
+        if ref is None or seq <= last_seq:
+            if ref is not None:
+                ref.release()
+            return last_seq, None
+        with ref:
+            return seq, self.part_for(seq, ref, profile)
+
+    def _start_client(self, profile, kind):
+        with self._condition:
+            self.subscriber_count += 1
+            has_frame = self._seq > 0
+        print(f"Client{kind} connecté au flux '{self.name}' ({self.subscriber_count} client(s)).")
+        return has_frame
+
+    def _end_client(self, profile, last_seq, kind):
+        with self._condition:
+            self.subscriber_count -= 1
+            self.downgrades += profile.downgrades
+            if last_seq > 0:
+                # Frames publiées depuis le dernier envoi (client lent ou bloqué)
+                self.dropped_frames += self._seq - last_seq
+        print(f"Client{kind} déconnecté du flux '{self.name}'.")
+
+    def _after_send(self, profile, seq, last_seq, sent_at):
+        """Compte les frames sautées et adapte le profil à la durée d'écriture."""
+        now = time.monotonic()
+        if last_seq > 0 and seq > last_seq + 1:
+            with self._condition:
+                self.dropped_frames += seq - last_seq - 1
+        profile.record_write(now - sent_at, now)
+        return now
+
+    def subscribe(self, profile=None, timeout=1.0):
+        """Générateur de parties MJPEG pour un client (serveur WSGI).
+
+        Envoie l'image d'attente tant que rien n'a été publié, puis la frame la
+        plus récente à chaque tour, au plus à la cadence du profil du client.
+        Le temps entre deux reprises du générateur est le temps d'écriture vers
+        le client: il sert à adapter la qualité (voir StreamProfile).
+        """
+        profile = profile or StreamProfile(adaptive=False)
+        has_frame = self._start_client(profile, "")
+        last_seq, last_sent = 0, 0.0
+        try:
+            if not has_frame:
+                yield self.get_encoded(0, None, profile.requested_quality)
+            while True:
+                wait = last_sent + profile.frame_interval - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                seq, ref = self.wait_for_next(last_seq, timeout)
+                if ref is None:
+                    continue
+                with ref:
+                    part = self.part_for(seq, ref, profile)
+                if part is None:
+                    continue
+                sent_at = time.monotonic()
+                yield part
+                last_sent = self._after_send(profile, seq, last_seq, sent_at)
+                last_seq = seq
+        finally:
+            self._end_client(profile, last_seq, "")
+
+    def stats(self):
+        with self._condition:
+            return {"subscribers": self.subscriber_count, "encodes": self.encode_count,
+                    "passthrough": self.passthrough_count,
+                    "dropped_frames": self.dropped_frames, "downgrades": self.downgrades}
+
+    async def subscribe_async(self, profile=None, timeout=1.0):
+        """Générateur asynchrone de parties MJPEG pour un client (serveur ASGI).
+
+        La tâche attend la frame suivante sans occuper de thread. Contre-pression:
+        la partie suivante n'est produite qu'une fois la précédente envoyée
+        (l'appelant attend send()), et c'est alors toujours la frame la plus
+        récente: un client lent saute des frames au lieu de les accumuler, et
+        son profil descend en qualité/taille si ses envois restent lents.
+        L'encodage JPEG (partagé entre clients d'un même palier) est fait dans
+        l'exécuteur.
+        """
+        loop = asyncio.get_running_loop()
+        profile = profile or StreamProfile(adaptive=False)
+        event = self._wakeup.register()
+        has_frame = self._start_client(profile, " async")
+        last_seq, last_sent = 0, 0.0
+        try:
+            if not has_frame:
+                yield self.get_encoded(0, None, profile.requested_quality)
+            while True:
+                wait = last_sent + profile.frame_interval - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                event.clear()
+                with self._condition:
+                    newer = self._seq > last_seq
+                if not newer:
+                    try:
+                        await asyncio.wait_for(event.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                seq, part = await loop.run_in_executor(None, self._encode_latest, last_seq, profile)
+                if part is None:
+                    continue
+                sent_at = time.monotonic()
+                yield part
+                last_sent = self._after_send(profile, seq, last_seq, sent_at)
+                last_seq = seq
+        finally:
+            self._wakeup.unregister(event)
+            self._end_client(profile, last_seq, " async")
@@ -0,0 +1,190 @@
+import itertools
+import cv2
+import numpy as np
+
+def box_to_xywh(box):
+    x1, y1, x2, y2 = box[:4]
+    return np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1], dtype=np.float64)
+
+def xywh_to_box(state):
+    cx, cy, w, h = state[:4]
+    return np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], dtype=np.float64)
+
+def iou_matrix(boxes_a, boxes_b):
+    """IoU entre chaque boîte de `boxes_a` (N, 4+) et de `boxes_b` (M, 4+)."""
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)))
+    a = np.asarray(boxes_a, dtype=np.float64)[:, None, :4]
+    b = np.asarray(boxes_b, dtype=np.float64)[None, :, :4]
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-9)
+
+def greedy_match(iou, threshold):
+    """Associe lignes et colonnes par IoU décroissante. Renvoie [(ligne, colonne), ...]."""
+    matches = []
+    if iou.size == 0:
+        return matches
+    used_rows, used_cols = set(), set()
+    for flat_index in np.argsort(-iou, axis=None):
+        row, col = np.unravel_index(flat_index, iou.shape)
+        if iou[row, col] < threshold:
+            break
+        if row in used_rows or col in used_cols:
+            continue
+        used_rows.add(row)
+        used_cols.add(col)
+        matches.append((int(row), int(col)))
+    return matches
+
+class KalmanBox:
+    """Filtre de Kalman à vitesse constante sur (cx, cy, w, h).
+
+    Le bruit est proportionnel à la hauteur de la boîte, comme dans SORT/DeepSORT,
+    et la prédiction tient compte du temps réel écoulé (dt en secondes), si bien
+    que le suivi ne dépend pas de la cadence d'inférence.
+    """
+
+    position_noise = 1 / 20
+    velocity_noise = 1 / 10
+
+    def __init__(self, box):
+        self.x = np.zeros(8)
+        self.x[:4] = box_to_xywh(box)
+        height = max(self.x[3], 1.0)
+        self.P = np.diag(np.square(np.r_[[2 * self.position_noise * height] * 4,
+                                         [10 * self.velocity_noise * height] * 4]))
+
+    def predict(self, dt):
+        if dt <= 0:
+            return
+        F = np.eye(8)
+        F[:4, 4:] = dt * np.eye(4)
+        height = max(self.x[3], 1.0)
+        Q = np.diag(np.square(np.r_[[self.position_noise * height] * 4,
+                                    [self.velocity_noise * height] * 4])) * dt
+        self.x = F @ self.x
+        self.x[2:4] = np.maximum(self.x[2:4], 1.0)
+        self.P = F @ self.P @ F.T + Q
+
+    def update(self, box):
+        H = np.eye(4, 8)
+        R = np.eye(4) * (self.position_noise * max(self.x[3], 1.0)) ** 2
+        innovation = box_to_xywh(box) - H @ self.x
+        S = H @ self.P @ H.T + R
+        K = self.P @ H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ innovation
+        self.P = (np.eye(8) - K @ H) @ self.P
+
+    @property
+    def box(self):
+        return xywh_to_box(self.x)
+
+class Track:
+    """Une personne suivie: identifiant stable, boîte filtrée et durée de présence."""
+
+    def __init__(self, track_id, detection, timestamp):
+        self.track_id = track_id
+        self.kalman = KalmanBox(detection)
+        self.confidence = float(detection[4])
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.last_predicted = timestamp
+        self.hits = 1
+        self.alerted = False  # Une seule alerte par personne
+
+    @property
+    def box(self):
+        return self.kalman.box
+
+    @property
+    def duration(self):
+        """Temps (s) depuis la première détection jusqu'à la dernière."""
+        return self.last_seen - self.first_seen
+
+    def predict(self, timestamp):
+        self.kalman.predict(timestamp - self.last_predicted)
+        self.last_predicted = timestamp
+
+    def update(self, detection, timestamp):
+        self.kalman.update(detection)
+        self.confidence = float(detection[4])
+        self.last_seen = timestamp
+        self.hits += 1
+
+    def to_dict(self):
+        return {"track_id": self.track_id, "duration": round(self.duration, 2),
+                "confidence": round(self.confidence, 3),
+                "box": [round(float(value), 1) for value in self.box]}
+
+class IouTracker:
+    """Suivi multi-personnes léger (association IoU + Kalman, à la ByteTrack).
+
+    Chaque appel à update() reçoit les détections d'une frame (N, 6) et son
+    horodatage. Les pistes existantes sont d'abord associées aux détections
+    fiables (confiance >= `high_confidence`), puis les pistes restantes aux
+    détections faibles, qui prolongent une piste sans pouvoir en créer une
+    (une personne partiellement masquée n'interrompt pas sa piste). Une piste
+    sans détection depuis plus de `max_age` secondes est supprimée.
+
+    Une piste est confirmée quand elle a été vue pendant au moins
+    `confirm_seconds` secondes: la confirmation dépend du temps, pas du nombre
+    de frames inférées.
+    """
+
+    def __init__(self, high_confidence=0.7, iou_threshold=0.3, max_age=1.0, confirm_seconds=1.0):
+        self.high_confidence = high_confidence
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.confirm_seconds = confirm_seconds
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def update(self, detections, timestamp):
+        """Met à jour les pistes avec les détections (N, 6) d'une frame. Renvoie les pistes actives."""
+        detections = np.asarray(detections, dtype=np.float64).reshape(-1, 6)
+        for track in self.tracks:
+            track.predict(timestamp)
+
+        high = detections[detections[:, 4] >= self.high_confidence]
+        low = detections[detections[:, 4] < self.high_confidence]
+
+        # 1. Détections fiables
+        unmatched_tracks = list(range(len(self.tracks)))
+        track_boxes = [self.tracks[index].box for index in unmatched_tracks]
+        matches = greedy_match(iou_matrix(track_boxes, high), self.iou_threshold)
+        for row, col in matches:
+            self.tracks[unmatched_tracks[row]].update(high[col], timestamp)
+        matched_rows = {row for row, _ in matches}
+        matched_high = {col for _, col in matches}
+        unmatched_tracks = [index for row, index in enumerate(unmatched_tracks) if row not in matched_rows]
+
+        # 2. Détections faibles: prolongent seulement les pistes restantes
+        track_boxes = [self.tracks[index].box for index in unmatched_tracks]
+        for row, col in greedy_match(iou_matrix(track_boxes, low), self.iou_threshold):
+            self.tracks[unmatched_tracks[row]].update(low[col], timestamp)
+
+        # 3. Nouvelles pistes pour les détections fiables non associées
+        for col, detection in enumerate(high):
+            if col not in matched_high:
+                self.tracks.append(Track(next(self._ids), detection, timestamp))
+
+        self.tracks = [track for track in self.tracks if timestamp - track.last_seen <= self.max_age]
+        return list(self.tracks)
+
+    def confirmed_tracks(self):
+        return [track for track in self.tracks if track.duration >= self.confirm_seconds]
+
+    def draw(self, frame, color=(0, 0, 255), pending_color=(0, 200, 255)):
+        """Dessine les pistes (identifiant, durée) sur une frame inscriptible."""
+        for track in self.tracks:
+            confirmed = track.duration >= self.confirm_seconds
+            x1, y1, x2, y2 = (int(value) for value in track.box)
+            track_color = color if confirmed else pending_color
+            cv2.rectangle(frame, (x1, y1), (x2, y2), track_color, 2)
+            label = f"person #{track.track_id} {track.confidence:.2f} {track.duration:.1f}s"
+            cv2.putText(frame, label, (x1, max(12, y1 - 5)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, track_color, 1)
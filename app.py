@@ -1,4 +1,4 @@
-from flask import Flask, render_template, Response, jsonify
+from flask import Flask, render_template, Response, jsonify, request, send_from_directory
 import cv2
 import numpy as np
 import time
@@ -6,12 +6,47 @@ import os
 import threading
 import subprocess
 import queue
+import sys
 from bot import run_bot
-from Utils.Notifier import notification_queue
-from Utils.ImageManager import save_temp_image
-from config import DEV_MODE, CAMERA_SOURCE
-import mysql.connector
+from Utils.Notifier import notification_queue, delivery_stats
+from Utils.ImageManager import encode_jpeg_within_budget, snapshot_writer, TEMP_IMAGE_DIR
+from Utils.ImageManager import THUMBNAIL_EXT
+from Utils.StreamHub import FrameBroadcaster, StreamProfile, make_placeholder_frame
+from Utils.FrameRing import FrameRing
+from Utils.MotionGate import MotionGate
+from Utils.Roi import RegionOfInterest
+from Utils.InferenceBackends import load_detector
+from Utils.InferenceProcess import InferencePool
+from Utils.DoorLog import DoorLogStore
+from Utils.Detections import detection_array
+from Utils.Tracker import IouTracker
+from Utils.EventBus import EventBus
+from Utils.Retention import RetentionManager
+from Utils.ClipRecorder import ClipRecorder
+from Utils.MjpegSource import MjpegHttpSource
+from Utils.ReplaySource import ReplaySource
+from Utils.SerialSource import SerialJpegSource
+from Utils.Startup import StartupStatus
+from Utils.Metrics import metrics, SamplingProfiler
+from config import DEV_MODE, CAMERA_SOURCES
+from config import CAMERA_STALE_FRAME_MS, CAMERA_READ_TIMEOUT_SECONDS, CAMERA_RECONNECT_MAX_SECONDS
+from config import CAMERA_JPEG_PASSTHROUGH, CAMERA_SERIAL_BAUDRATE, CAMERA_SERIAL_MAX_FRAME_BYTES
+from config import (MOTION_GATE_ENABLED, MOTION_PIXEL_THRESHOLD,
+                    MOTION_AREA_THRESHOLD, MOTION_HEARTBEAT_SECONDS)
+from config import CAMERA_ROIS, INFERENCE_IMGSZ
+from config import (TRACK_CONFIRM_SECONDS, TRACK_MAX_AGE_SECONDS,
+                    TRACK_IOU_THRESHOLD, TRACK_LOW_CONFIDENCE)
+from config import INFERENCE_BACKEND, YOLO_MODEL_PATH, INFERENCE_WARMUP_RUNS, INFERENCE_PROCESSES
+from config import NOTIFICATION_IMAGE_MAX_BYTES, NOTIFICATION_IMAGE_MAX_WIDTH, NOTIFICATION_DASHBOARD_URL
+from config import (RETENTION_INTERVAL_SECONDS, LOG_IMAGE_MAX_BYTES, LOG_IMAGE_MAX_AGE_SECONDS,
+                    LOG_IMAGE_MAX_COUNT, TEMP_IMAGE_MAX_BYTES, TEMP_IMAGE_MAX_AGE_SECONDS)
+from config import (CLIP_RECORDING_ENABLED, CLIP_PRE_ROLL_SECONDS, CLIP_POST_ROLL_SECONDS,
+                    CLIP_MAX_SECONDS, CLIP_FPS, CLIP_WIDTH, CLIP_QUALITY,
+                    CLIP_BUFFER_MAX_BYTES, CLIP_DIR_MAX_BYTES)
+from config import PROFILER_ENABLED, PROFILER_MAX_SECONDS
 import uuid
+from werkzeug.security import safe_join
+import zlib
 import shutil
 
 # --- Configuration de la base de données MySQL ---
@@ -22,74 +57,138 @@ db_config = {
     "password": os.getenv("DATABASE_PASSWORD", ""),
     "database": os.getenv("DATABASE_NAME", "mydb"),
 }
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", 5))
+# DATABASE_ENABLED=0: journal en mémoire seulement, sans tentative de connexion (rejeu, benchmark)
+DATABASE_ENABLED = os.getenv("DATABASE_ENABLED", "1") != "0"
 
-try:
-    connection = mysql.connector.connect(**db_config)
-    print("Database connection successful!")
-except mysql.connector.Error as err:
-    print(f"Error: {err}")
-
-# Import pour YOLOv8
-try:
-    from ultralytics import YOLO
-    YOLOV8_AVAILABLE = True
-    print("Ultralytics (YOLOv8) importé avec succès")
-except ImportError:
-    YOLOV8_AVAILABLE = False
-    print("ERREUR: Ultralytics (YOLOv8) n'est pas installé. Veuillez l'installer avec 'pip install ultralytics'")
+# --- Serveur HTTP ---
+# Même port pour le serveur de développement (python app.py) et le mode
+# production ASGI (python asgi.py), et dans le conteneur Docker.
+SERVER_HOST = os.getenv("HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("PORT", 5000))
 
 app = Flask(__name__)
 
 # --- Variables Globales Partagées et Verrous ---
-last_processed_frame = None
-processed_frame_lock = threading.Lock()
+# Flux traités: la frame publiée par detection_worker est encodée une seule fois
+# par palier (largeur, qualité) puis partagée entre tous les clients de /video_feed.
+PROCESSED_STREAM_QUALITY = 85
+RAW_STREAM_QUALITY = 95
+# Nombre de slots du ring de capture: dernière frame + hubs + détection en cours + écriture
+FRAME_RING_SLOTS = 6
 
-door_button_visible = False
-door_button_hidden_until = 0
-button_state_lock = threading.Lock()
+# Caméra utilisée quand une route ne précise pas de nom (la première de la config)
+DEFAULT_CAMERA = next(iter(CAMERA_SOURCES))
 
 # Log des ouvertures
 LOG_IMAGE_DIR = os.path.join("static", "log_images")
-MAX_LOG_ENTRIES = 100
-door_opening_log = []
-log_lock = threading.Lock()
+LOG_THUMBNAIL_DIR = os.path.join(LOG_IMAGE_DIR, "thumbs")  # Vignettes du tableau de bord
+LOG_IMAGE_CACHE_SECONDS = 365 * 24 * 3600  # Noms uniques, jamais réécrits: cache « immutable »
+CLIP_DIR = os.path.join("static", "clips")
+MAX_LOG_ENTRIES = 100  # Taille du journal quand MySQL est indisponible
+LOGS_PAGE_SIZE = 50
+LOGS_MAX_PAGE_SIZE = 200
+# Journal persistant (MySQL via un pool de connexions, écritures groupées en arrière-plan)
+# La connexion est ouverte en arrière-plan (start_pipeline): journal en mémoire jusque-là.
+door_log = DoorLogStore(db_config if DATABASE_ENABLED else None, pool_size=DATABASE_POOL_SIZE,
+                        max_memory_entries=MAX_LOG_ENTRIES, connect=False)
+# Nettoyage des images sur disque (démarré avec la chaîne, voir start_pipeline).
+# Une entrée du journal peut survivre à son image: le tableau de bord affiche alors l'entrée sans image.
+image_retention = RetentionManager(interval=RETENTION_INTERVAL_SECONDS)
+image_retention.add_directory(LOG_IMAGE_DIR, max_bytes=LOG_IMAGE_MAX_BYTES,
+                              max_age=LOG_IMAGE_MAX_AGE_SECONDS, max_count=LOG_IMAGE_MAX_COUNT,
+                              on_evict=lambda path: remove_log_thumbnail(path))  # Définie plus bas
+image_retention.add_directory(LOG_THUMBNAIL_DIR, max_age=LOG_IMAGE_MAX_AGE_SECONDS,
+                              max_count=LOG_IMAGE_MAX_COUNT, suffixes=(THUMBNAIL_EXT,))
+image_retention.add_directory(TEMP_IMAGE_DIR, max_bytes=TEMP_IMAGE_MAX_BYTES,
+                              max_age=TEMP_IMAGE_MAX_AGE_SECONDS)
+image_retention.add_directory(CLIP_DIR, max_bytes=CLIP_DIR_MAX_BYTES,
+                              max_age=LOG_IMAGE_MAX_AGE_SECONDS, suffixes=(".avi",))
 
-# Classe singleton pour gérer la caméra
+# Une instance (et un thread de capture) par caméra nommée de CAMERA_SOURCES
 class CameraManager:
-    _instance = None
+    _instances = {}
     _lock = threading.Lock()
+    # Signalé à chaque nouvelle frame, toutes caméras confondues: réveille le
+    # planificateur de détection qui regroupe les frames en un seul lot.
+    new_frame_event = threading.Event()
 
     @classmethod
-    def get_instance(cls):
+    def get_instance(cls, name=None):
+        name = name or DEFAULT_CAMERA
         with cls._lock:
-            if cls._instance is None:
-                cls._instance = CameraManager()
-            return cls._instance
+            if name not in cls._instances:
+                cls._instances[name] = CameraManager(name, CAMERA_SOURCES[name])
+            return cls._instances[name]
 
-    def __init__(self):
+    @classmethod
+    def all_instances(cls):
+        return [cls.get_instance(name) for name in CAMERA_SOURCES]
+
+    def __init__(self, name, source):
+        self.name = name
+        self.source = source
         self.camera = None
-        self.frame = None
         self.running = True
-        self.lock = threading.Lock()
-        self.init_camera()
-        # Démarrer le thread de capture
+        # Ring de buffers préalloués: la capture décode directement dans un slot
+        # libre et les lecteurs reçoivent des vues en lecture seule (sans copie).
+        # Chaque frame valide reçoit un numéro de séquence et l'heure de capture.
+        self.ring = FrameRing(slots=FRAME_RING_SLOTS, shape=(480, 640, 3))
+        self.blank_frame = make_placeholder_frame("Camera non disponible")
+        # Diffusion du flux brut (/raw_feed) alimentée par le thread de capture
+        self.raw_hub = FrameBroadcaster(f"brut/{name}", placeholder_text="Camera non disponible")
+        # Dernières secondes du flux brut en mémoire, pour les clips des événements
+        self.clip_recorder = None
+        if CLIP_RECORDING_ENABLED:
+            self.clip_recorder = ClipRecorder(name, self.raw_hub, CLIP_DIR,
+                                              pre_roll=CLIP_PRE_ROLL_SECONDS, post_roll=CLIP_POST_ROLL_SECONDS,
+                                              fps=CLIP_FPS, width=CLIP_WIDTH, quality=CLIP_QUALITY,
+                                              max_bytes=CLIP_BUFFER_MAX_BYTES, max_seconds=CLIP_MAX_SECONDS,
+                                              on_written=image_retention.note_file)
+        # Statistiques de capture (cadence, temps passé dans read(): attente de la caméra et décodage, reconnexions)
+        self.capture_stats = {"frames": 0, "fps": 0.0, "read_ms": 0.0, "reconnects": 0, "last_frame_time": 0.0}
+        # Démarrer le thread de capture (il ouvre la caméra: l'ouverture peut prendre des secondes)
         self.capture_thread = threading.Thread(target=self.update, daemon=True)
         self.capture_thread.start()
-        print("CameraManager initialisé")
+        print(f"CameraManager '{name}' initialisé")
 
     def init_camera(self):
-        print(f"Initialisation de la caméra depuis la source: {CAMERA_SOURCE}...")
+        print(f"Initialisation de la caméra '{self.name}' depuis la source: {self.source}...")
         
         camera = None
         # Choisir le backend en fonction du type de source
-        if isinstance(CAMERA_SOURCE, int):
-            print("Source locale détectée (entier), utilisation de CAP_DSHOW.")
-            camera = cv2.VideoCapture(CAMERA_SOURCE, cv2.CAP_DSHOW)
-        elif isinstance(CAMERA_SOURCE, str):
+        if isinstance(self.source, str) and self.source.startswith(("http://", "https://")):
+            # Flux MJPEG HTTP (ESP32-CAM): lecteur dédié qui garde seulement la
+            # dernière image et se reconnecte lui-même (voir Utils/MjpegSource.py)
+            print("Flux MJPEG HTTP détecté, lecteur dédié.")
+            self.camera = MjpegHttpSource(self.source, read_timeout=CAMERA_READ_TIMEOUT_SECONDS,
+                                          stale_after=CAMERA_STALE_FRAME_MS / 1000,
+                                          backoff_max=CAMERA_RECONNECT_MAX_SECONDS)
+            return
+        if isinstance(self.source, str) and self.source.startswith("serial:"):
+            # ESP32-CAM sur port série: trames JPEG avec longueur et CRC (voir Utils/SerialSource.py)
+            print("Caméra série détectée, lecteur dédié.")
+            self.camera = SerialJpegSource.from_uri(self.source, baudrate=CAMERA_SERIAL_BAUDRATE,
+                                                    stale_after=CAMERA_STALE_FRAME_MS / 1000,
+                                                    max_frame_bytes=CAMERA_SERIAL_MAX_FRAME_BYTES,
+                                                    backoff_max=CAMERA_RECONNECT_MAX_SECONDS)
+            return
+        if isinstance(self.source, str) and self.source.startswith("replay:"):
+            # Enregistrement rejoué comme une caméra (voir Utils/ReplaySource.py)
+            print("Rejeu d'un enregistrement détecté.")
+            self.camera = ReplaySource.from_uri(self.source)
+            return
+        if isinstance(self.source, int):
+            # CAP_DSHOW n'existe que sous Windows; V4L2 est le backend natif de Linux
+            backend = cv2.CAP_DSHOW if sys.platform.startswith("win") else (
+                cv2.CAP_V4L2 if sys.platform.startswith("linux") else cv2.CAP_ANY)
+            print(f"Source locale détectée (entier), backend {backend}.")
+            camera = cv2.VideoCapture(self.source, backend)
+        elif isinstance(self.source, str):
             print("Source réseau/fichier détectée (chaîne), backend automatique.")
-            camera = cv2.VideoCapture(CAMERA_SOURCE)
+            camera = cv2.VideoCapture(self.source)
         else:
-            print(f"ERREUR: Type de CAMERA_SOURCE non supporté: {type(CAMERA_SOURCE)}")
+            print(f"ERREUR: Type de source non supporté pour '{self.name}': {type(self.source)}")
             return # Ne pas continuer si la source n'est pas valide
 
         # Vérifier si l'ouverture a réussi
@@ -103,228 +202,535 @@ class CameraManager:
             except Exception as e:
                  print(f"Note: Impossible de définir les propriétés de la caméra (normal pour certains flux): {e}")
             
-            print(f"Caméra/Flux ouvert avec succès depuis {CAMERA_SOURCE}")
+            print(f"Caméra/Flux '{self.name}' ouvert avec succès depuis {self.source}")
             self.camera = camera
             # Lire quelques frames pour stabiliser
             for _ in range(5):
                 ret, _ = self.camera.read()
         else:
-            print(f"Échec d'ouverture de la caméra/flux depuis {CAMERA_SOURCE}")
+            print(f"Échec d'ouverture de la caméra/flux '{self.name}' depuis {self.source}")
             self.camera = None
     
     def update(self):
-        blank_frame = np.zeros((480, 640, 3), dtype=np.uint8)
-        cv2.putText(blank_frame, "Camera non disponible", (50, 240), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-        
         frame_count = 0
+        reconnect_delay = 1.0
+        failures = 0  # Échecs de lecture consécutifs
         while self.running:
             if self.camera is None or not self.camera.isOpened():
-                # Tentative de réouverture
+                # Tentative de réouverture, avec un délai qui double à chaque échec
                 if self.camera is not None:
                     self.camera.release()
+                    self.capture_stats["reconnects"] += 1
                 self.init_camera()
-                with self.lock:
-                    self.frame = blank_frame.copy()
-                time.sleep(1)  # Attendre avant la prochaine tentative
+                self.raw_hub.publish(self.blank_frame)
+                if self.camera is None or not self.camera.isOpened():
+                    time.sleep(reconnect_delay)
+                    reconnect_delay = min(reconnect_delay * 2, CAMERA_RECONNECT_MAX_SECONDS)
+                else:
+                    reconnect_delay = 1.0
+                continue
+            if getattr(self.camera, "finished", False):
+                time.sleep(0.1)  # Rejeu terminé: plus rien à lire
+                continue
+
+            if CAMERA_JPEG_PASSTHROUGH and hasattr(self.camera, "read_jpeg"):
+                # JPEG de la caméra publié sans décodage (décodé plus tard, seulement si lu)
+                read_start = time.perf_counter()
+                ret, jpeg = self.camera.read_jpeg()
+                frame_count += 1
+                if ret:
+                    failures = 0
+                    now = time.time()
+                    self._record_capture(now, (time.perf_counter() - read_start) * 1000)
+                    try:
+                        ref = self.ring.publish_encoded(jpeg, now)
+                    except ValueError as e:
+                        print(f"Image JPEG invalide de la caméra '{self.name}': {e}")
+                        continue
+                    self.raw_hub.publish(ref)
+                    CameraManager.new_frame_event.set()
+                else:
+                    failures += 1
+                    self._read_failed(failures)
                 continue
-                
-            # Lire une frame
-            ret, frame = self.camera.read()
+
+            slot = self.ring.acquire_write_slot()
+            if slot is None:
+                # Tous les slots sont encore lus: on saute cette frame sans la décoder
+                self.camera.grab()
+                continue
+            index, buffer = slot
+
+            # Lire une frame directement dans le slot réservé
+            read_start = time.perf_counter()
+            ret, frame = self.camera.read(buffer)
             frame_count += 1
             
             if ret:
-                with self.lock:
-                    self.frame = frame.copy()
+                failures = 0
+                now = time.time()
+                self._record_capture(now, (time.perf_counter() - read_start) * 1000)
+                ref = self.ring.commit(index, frame, now)
+                self.raw_hub.publish(ref)
+                CameraManager.new_frame_event.set()
                 if frame_count % 100 == 0:
-                    print(f"Frame #{frame_count} capturée, taille: {frame.shape}")
+                    print(f"[{self.name}] Frame #{frame_count} capturée, taille: {frame.shape}")
             else:
-                print("Échec de lecture de la caméra")
-                with self.lock:
-                    self.frame = blank_frame.copy()
-                time.sleep(0.1)  # Pause courte en cas d'échec
-                
-            time.sleep(0.01)  # Limiter la cadence pour économiser les ressources
+                self.ring.abort(index)
+                failures += 1
+                self._read_failed(failures)
+            # Pas de pause fixe: read() bloque déjà au rythme de la caméra
     
+    def _read_failed(self, failures):
+        """Échec de lecture (source périmée ou absente). L'image d'attente n'est publiée
+        (et encodée pour les clients) qu'au premier échec; ensuite, pause croissante
+        (0.1 s -> 1 s) et un message de temps en temps seulement."""
+        if failures == 1:
+            print(f"Échec de lecture de la caméra '{self.name}': image d'attente publiée.")
+            self.raw_hub.publish(self.blank_frame)
+        elif failures % 100 == 0:
+            print(f"Caméra '{self.name}' toujours illisible ({failures} échecs consécutifs).")
+        time.sleep(min(0.1 * 2 ** min(failures - 1, 4), 1.0))
+
+    def _record_capture(self, now, read_ms):
+        stats = self.capture_stats
+        if stats["last_frame_time"]:
+            interval = now - stats["last_frame_time"]
+            if interval > 0:
+                stats["fps"] = round(0.9 * stats["fps"] + 0.1 / interval, 2)
+        stats["frames"] += 1
+        stats["read_ms"] = round(0.9 * stats["read_ms"] + 0.1 * read_ms, 2)
+        stats["last_frame_time"] = now
+        metrics.observe("stage_seconds", read_ms / 1000, stage="capture_read", camera=self.name)
+
+    def stats(self):
+        """Cadence de capture, temps de lecture/décodage et reconnexions de la source."""
+        stats = dict(self.capture_stats)
+        if stats["last_frame_time"]:
+            stats["frame_age_ms"] = round((time.time() - stats["last_frame_time"]) * 1000, 1)
+        if hasattr(self.camera, "stats"):
+            stats["source"] = self.camera.stats()
+        return stats
+
+    def acquire_frame(self):
+        """Renvoie un FrameRef sur la dernière frame capturée (vue en lecture seule), ou None."""
+        return self.ring.acquire_latest()
+
     def get_frame(self):
-        with self.lock:
-            if self.frame is not None:
-                return True, self.frame.copy()
-            else:
-                blank = np.zeros((480, 640, 3), dtype=np.uint8)
-                cv2.putText(blank, "Camera non disponible", (50, 240), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-                return False, blank
+        """Renvoie (ret, copie de la dernière frame); préférer acquire_frame() qui évite la copie."""
+        ref = self.ring.acquire_latest()
+        if ref is None:
+            return False, self.blank_frame.copy()
+        with ref:
+            return True, ref.frame.copy()
+
+    def wait_for_frame(self, last_seq, timeout=1.0):
+        """Bloque jusqu'à ce qu'une frame plus récente que `last_seq` soit capturée.
+
+        Returns:
+            FrameRef (avec .seq et .timestamp de capture) à libérer par l'appelant,
+            ou None si le délai a expiré sans nouvelle frame.
+        """
+        return self.ring.wait_for_newer(last_seq, timeout)
     
+    def record_clip(self, reason):
+        """Déclenche un clip pré-roll + post-roll. Renvoie son chemin relatif à static/, ou None."""
+        if self.clip_recorder is None:
+            return None
+        return self.clip_recorder.trigger(reason)
+
     def release(self):
         self.running = False
+        if self.clip_recorder is not None:
+            self.clip_recorder.stop()
+        self.ring.close()
         if self.camera is not None:
             self.camera.release()
         self.camera = None
-        print("Caméra libérée")
-
-# Configuration YOLOv8
-yolov8_model_path = "yolov8n.pt"  # Modèle nano (le plus petit et plus rapide)
-detection_interval = 0.1  # Intervalle entre les détections (en secondes)
-
-# Vérifier si le modèle existe
-if YOLOV8_AVAILABLE and not os.path.exists(yolov8_model_path):
-    print(f"ATTENTION: Le modèle {yolov8_model_path} n'existe pas!")
-    print(f"Vous pouvez le télécharger depuis: https://github.com/ultralytics/assets/releases/download/v0.0.0/yolov8n.pt")
-
-# Charger le modèle YOLOv8
-yolo_model = None
-if YOLOV8_AVAILABLE:
-    try:
-        print(f"Chargement du modèle YOLOv8 depuis {yolov8_model_path}...")
-        yolo_model = YOLO(yolov8_model_path)
-        print("Modèle YOLOv8 chargé avec succès")
-    except Exception as e:
-        print(f"Erreur lors du chargement du modèle YOLOv8: {e}")
-        yolo_model = None
-else:
-    print("YOLOv8 n'est pas disponible - la détection ne fonctionnera pas")
+        print(f"Caméra '{self.name}' libérée")
 
 # Variables pour la logique de notification
-CONSECUTIVE_DETECTION_THRESHOLD = 7
 HUMAN_CONFIDENCE_THRESHOLD = 0.70
 NOTIFICATION_COOLDOWN = 60
 
-consecutive_human_detections = 0
-last_notification_time = 0
+# État propre à chaque caméra: suivi des personnes, notifications,
+# visibilité du bouton de porte et flux traité. Rien n'est partagé entre caméras.
+class CameraState:
+    def __init__(self, name):
+        self.name = name
+        self.processed_hub = FrameBroadcaster(f"traité/{name}")
+        # Suivi des personnes: une alerte quand une piste dure TRACK_CONFIRM_SECONDS
+        self.tracker = IouTracker(high_confidence=HUMAN_CONFIDENCE_THRESHOLD,
+                                  iou_threshold=TRACK_IOU_THRESHOLD,
+                                  max_age=TRACK_MAX_AGE_SECONDS,
+                                  confirm_seconds=TRACK_CONFIRM_SECONDS)
+        self.last_notification_time = 0
+        self.door_button_visible = False
+        self.door_button_track_id = None  # Piste ayant fait apparaître le bouton
+        # Dernier résumé de détection poussé sur /events (voir publish_detection_summary)
+        self.detection_fps = 0.0
+        self.last_summary = None
+        self.last_summary_time = 0
+        self.door_button_hidden_until = 0
+        self.button_state_lock = threading.Lock()
+        self.last_seq = 0  # Dernière frame de la caméra passée à la détection
+        # Filtre de mouvement: sans mouvement, le dernier résultat YOLO est réutilisé
+        self.motion_gate = MotionGate(pixel_threshold=MOTION_PIXEL_THRESHOLD,
+                                      area_threshold=MOTION_AREA_THRESHOLD,
+                                      heartbeat=MOTION_HEARTBEAT_SECONDS)
+        self.last_result = None
+        # Zone utile de la caméra (None: frame complète)
+        self.roi = RegionOfInterest.from_config(CAMERA_ROIS.get(name))
 
-def detect_with_yolov8(frame):
-    # Cette fonction effectue la détection et la logique de notification.
-    # Elle renvoie TOUJOURS la frame annotée pour les notifications Discord.
-    # Le choix d'afficher ou non les annotations sur le web est fait dans detection_worker.
+camera_states = {name: CameraState(name) for name in CAMERA_SOURCES}
+
+# Événements d'état poussés aux tableaux de bord (/events): changements du
+# bouton de porte, nouvelles entrées du journal, résumés de détection
+event_bus = EventBus()
+DETECTION_SUMMARY_INTERVAL = 1.0  # Résumé de détection au plus une fois par seconde s'il ne change pas
+
+def button_event(state):
+    return {"camera": state.name, "visible": state.door_button_visible,
+            "track_id": state.door_button_track_id if state.door_button_visible else None}
+
+def get_camera_state(name=None):
+    """Renvoie l'état de la caméra `name` (caméra par défaut si None), ou None si inconnue."""
+    return camera_states.get(name or DEFAULT_CAMERA)
+
+# Modèle YOLOv8, chargé en arrière-plan par start_pipeline (voir load_model).
+# Tant qu'il vaut None, la détection publie les frames sans détection.
+yolo_model = None
+_model_lock = threading.Lock()
+
+def load_model():
+    # Charger le modèle YOLOv8 sur le backend configuré (export/cache automatique,
+    # préchauffage, repli sur PyTorch en cas d'échec). Avec INFERENCE_PROCESSES > 0,
+    # le modèle tourne dans des processus séparés et renvoie des boîtes que ce
+    # processus dessine. Renvoie True si un modèle est disponible.
     global yolo_model
-    global consecutive_human_detections, last_notification_time
+    with _model_lock:
+        if yolo_model is not None:
+            return True  # Déjà chargé (ou fourni par un outil de test)
+        model = None
+        if INFERENCE_PROCESSES > 0:
+            try:
+                model = InferencePool(INFERENCE_PROCESSES, INFERENCE_BACKEND, YOLO_MODEL_PATH,
+                                      imgsz=INFERENCE_IMGSZ, warmup_runs=INFERENCE_WARMUP_RUNS,
+                                      max_batch=len(CAMERA_SOURCES))
+            except Exception as e:
+                print(f"Erreur lors du démarrage des processus d'inférence: {e}")
+                print("Repli sur l'inférence dans le processus web.")
+        if model is None:
+            model = load_detector(INFERENCE_BACKEND, YOLO_MODEL_PATH, imgsz=INFERENCE_IMGSZ,
+                                  warmup_runs=INFERENCE_WARMUP_RUNS)
+        if model is None:
+            raise RuntimeError("YOLOv8 n'est pas disponible - la détection ne fonctionnera pas")
+        yolo_model = model
+        return True
+
+
+# Statistiques du worker de détection (latences mesurées depuis l'heure de capture)
+detection_stats = {
+    "frames_processed": 0,
+    "frames_skipped": 0,        # Frames capturées mais jamais passées à YOLO
+    "last_batch_size": 0,       # Nombre de caméras traitées au dernier appel YOLO
+    "frames_inferred": 0,       # Frames passées à YOLO
+    "frames_gated": 0,          # Frames sans mouvement: dernier résultat réutilisé
+    "last_latency_ms": 0.0,     # Capture -> frame traitée publiée
+    "max_latency_ms": 0.0,
+    "last_alert_latency_ms": None,  # Capture -> notification mise en file
+}
+detection_stats_lock = threading.Lock()
+
+def notify_if_needed(state, annotated_frame, current_time, capture_time=None):
+    # Logique de notification propre à une caméra, à appeler après mise à jour
+    # de state.tracker. Une seule alerte par piste (par personne): une piste
+    # confirmée pendant le délai entre deux alertes est considérée comme signalée.
+    new_tracks = [track for track in state.tracker.confirmed_tracks() if not track.alerted]
+    if not new_tracks:
+        return
+    for track in new_tracks:
+        track.alerted = True
+    if current_time - state.last_notification_time < NOTIFICATION_COOLDOWN:
+        return
+    track_ids = ", ".join(f"#{track.track_id}" for track in new_tracks)
+    print(f"[{state.name}] Conditions de notification remplies (piste(s) {track_ids}, "
+          f"{max(track.duration for track in new_tracks):.1f}s)! Préparation de la notification.")
+    
+    # Encoder l'image annotée en mémoire, réduite au budget d'octets de Discord:
+    # ni fichier temporaire ni relecture disque avant l'envoi
+    with metrics.timer("stage_seconds", stage="jpeg_encode", stream="notification"):
+        image_bytes = encode_jpeg_within_budget(annotated_frame, NOTIFICATION_IMAGE_MAX_BYTES,
+                                                max_width=NOTIFICATION_IMAGE_MAX_WIDTH)
+    if image_bytes is None:
+        print("Erreur: Impossible d'encoder l'image pour la notification (envoi du texte seul).")
+    
+    # Vidéo de l'événement (écrite après le post-roll, lien donné dès maintenant)
+    clip_path = CameraManager.get_instance(state.name).record_clip(f"alerte {track_ids}")
+    clip_link = f" Vidéo: {NOTIFICATION_DASHBOARD_URL}/static/{clip_path}" if clip_path else ""
+
+    try:
+        # Mettre un tuple (message, JPEG, instant de détection) dans la passerelle vers le bot
+        notification_data = (f"Alerte : Humain détecté sur la caméra '{state.name}' (personne {track_ids}) ! {NOTIFICATION_DASHBOARD_URL}{clip_link}",
+                             image_bytes, capture_time if capture_time is not None else current_time)
+        notification_queue.put_nowait(notification_data)
+        print(f"Notification (image de {len(image_bytes or b'')} octets) mise en file d'attente.")
+        state.last_notification_time = current_time 
+        if capture_time is not None:
+            alert_latency_ms = (time.time() - capture_time) * 1000
+            with detection_stats_lock:
+                detection_stats["last_alert_latency_ms"] = alert_latency_ms
+            print(f"Latence capture -> alerte: {alert_latency_ms:.0f} ms")
+    except queue.Full:
+        print("AVERTISSEMENT: La file d'attente de notification est pleine.")
+
+def detect_batch(states, frames, capture_times=None, annotate=True):
+    # Détection groupée: un seul appel YOLOv8 pour les frames de plusieurs caméras,
+    # puis logique de notification propre à chaque caméra (states[i] <-> frames[i]).
+    # Les frames peuvent être des vues en lecture seule du ring de capture: elles ne
+    # sont jamais modifiées, seule l'étape d'annotation travaille sur une copie privée.
+    # Avec annotate=False, une frame est renvoyée telle quelle si aucun humain n'y
+    # est détecté (pas de copie quand les annotations ne sont pas affichées).
+    # Les frames sans mouvement (MotionGate) ne passent pas par YOLO: le dernier
+    # résultat de la caméra est réutilisé pour que le suivi des personnes voie
+    # un flux de résultats cohérent (une personne immobile garde sa piste).
+    # YOLO est appelé au seuil bas TRACK_LOW_CONFIDENCE: les détections faibles
+    # ne font que prolonger les pistes existantes (voir IouTracker).
+    # Si la caméra a une ROI, seule sa boîte englobante est filtrée puis passée à
+    # YOLO (à la taille INFERENCE_IMGSZ); les boîtes sont replacées dans la frame
+    # complète et celles hors du polygone sont écartées.
+    # Renvoie la liste des frames annotées, dans le même ordre.
     current_time = time.time()
+    if capture_times is None:
+        capture_times = [None] * len(frames)
 
     if yolo_model is None:
-        cv2.putText(frame, "YOLOv8 non disponible", (10, 30), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-        return frame
+        if not annotate:
+            return list(frames)
+        annotated_frames = []
+        for frame in frames:
+            annotated_frame = frame.copy()
+            cv2.putText(annotated_frame, "YOLOv8 non disponible", (10, 30), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+            annotated_frames.append(annotated_frame)
+        return annotated_frames
 
-    if frame is None or frame.size == 0:
-        print("Frame invalide passée à detect_with_yolov8")
-        # Renvoyer une frame noire pourrait être mieux qu'un tableau vide
-        return np.zeros((480, 640, 3), dtype=np.uint8) 
+    # Recadrage sur la ROI (vue sans copie) de chaque caméra qui en a une
+    inputs, offsets = [], []
+    for state, frame in zip(states, frames):
+        if state.roi is not None:
+            cropped, offset = state.roi.crop(frame)
+        else:
+            cropped, offset = frame, None
+        inputs.append(cropped)
+        offsets.append(offset)
+
+    # Filtre de mouvement: ne garder pour YOLO que les frames qui ont bougé
+    # dans la zone utile (ou dont le battement est échu, ou sans résultat précédent)
+    to_infer = []
+    with metrics.timer("stage_seconds", stage="motion_gate"):
+        for index, (state, cropped) in enumerate(zip(states, inputs)):
+            if (not MOTION_GATE_ENABLED or state.last_result is None
+                    or state.motion_gate.should_infer(cropped, current_time)):
+                to_infer.append(index)
+    with detection_stats_lock:
+        detection_stats["frames_inferred"] += len(to_infer)
+        detection_stats["frames_gated"] += len(frames) - len(to_infer)
 
-    processed_frame = frame.copy()
-    annotated_frame = processed_frame
-    detection_successful = False # Flag pour savoir si la détection a fonctionné
-    
     try:
         start_time = time.time()
-        results = yolo_model(processed_frame, conf=HUMAN_CONFIDENCE_THRESHOLD, classes=[0])
-        detection_successful = True # La détection a été exécutée
-        
-        human_detected_in_frame = False
-        if results and len(results) > 0 and len(results[0].boxes) > 0:
-            human_detected_in_frame = True
-            annotated_frame = results[0].plot()
-        
-        # --- Logique de notification --- 
-        if human_detected_in_frame:
-            consecutive_human_detections += 1
-        else:
-            if consecutive_human_detections > 0:
-                consecutive_human_detections = 0
-
-        if consecutive_human_detections >= CONSECUTIVE_DETECTION_THRESHOLD:
-            if current_time - last_notification_time >= NOTIFICATION_COOLDOWN:
-                print(f"Conditions de notification remplies ({consecutive_human_detections} détections)! Préparation de la notification.")
-                
-                # Sauvegarder l'image annotée *avant* d'envoyer à la queue
-                image_path = save_temp_image(annotated_frame, filename_prefix="human_detected")
-                
-                if image_path:
-                    try:
-                        # Mettre un tuple (message, chemin_image) dans la queue
-                        notification_data = ("Alerte : Humain détecté sur la caméra ! http://192.168.1.183:5000", image_path)
-                        notification_queue.put_nowait(notification_data)
-                        print(f"Notification (avec image {os.path.basename(image_path)}) mise en file d'attente.")
-                        last_notification_time = current_time 
-                    except queue.Full:
-                        print("AVERTISSEMENT: La file d'attente de notification est pleine.")
-                        # Optionnel: Supprimer l'image si la queue est pleine ?
-                        # if os.path.exists(image_path): os.remove(image_path)
-                else:
-                    print("Erreur: Impossible de sauvegarder l'image pour la notification.")
-                    # Envoyer quand même une notif texte ?
-                    # try:
-                    #    notification_queue.put_nowait(("Alerte: Humain détecté (erreur sauvegarde image)!", None))
-                    #    last_notification_time = current_time
-                    # except queue.Full:
-                    #    print("AVERTISSEMENT: La file d'attente de notification est pleine.")
-
-        # --- Fin de la logique de notification ---
-
-        # Ajouter l'information de FPS (même si la détection a échoué, on veut savoir)
-        if detection_successful:
+        results = [state.last_result for state in states]
+        detection_time = 0.0
+        if to_infer:
+            inferred = yolo_model([inputs[index] for index in to_infer],
+                                  conf=TRACK_LOW_CONFIDENCE, classes=[0],
+                                  imgsz=INFERENCE_IMGSZ)
             detection_time = time.time() - start_time
-            fps = (1 / detection_time) if detection_time > 0 else 0 
-            fps_text = f"Detection: {fps:.1f} FPS"
-            cv2.putText(annotated_frame, fps_text, (10, 30), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-        
-        return annotated_frame
-            
+            metrics.observe("stage_seconds", detection_time, stage="inference")
+            for index, result in zip(to_infer, inferred):
+                if offsets[index] is not None:
+                    result = states[index].roi.map_result(result, frames[index], offsets[index])
+                results[index] = result
+                states[index].last_result = result
     except Exception as e:
         print(f"Erreur lors de la détection YOLOv8: {e}")
-        # Essayer d'ajouter l'erreur sur la frame originale
-        try:
-            cv2.putText(processed_frame, f"Erreur YOLO: {str(e)[:30]}...", (10, 50), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
-        except Exception as overlay_error:
-            print(f"Erreur lors de l'ajout du texte d'erreur sur l'image: {overlay_error}")
-        return processed_frame
+        if not annotate:
+            return list(frames)
+        # Essayer d'ajouter l'erreur sur une copie des frames originales
+        error_frames = []
+        for frame in frames:
+            error_frame = frame.copy()
+            try:
+                cv2.putText(error_frame, f"Erreur YOLO: {str(e)[:30]}...", (10, 50), 
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
+            except Exception as overlay_error:
+                print(f"Erreur lors de l'ajout du texte d'erreur sur l'image: {overlay_error}")
+            error_frames.append(error_frame)
+        return error_frames
+
+    # FPS total du lot: toutes les caméras ont été traitées en un seul appel
+    fps = (len(to_infer) / detection_time) if detection_time > 0 else 0
+    for index in to_infer:
+        states[index].detection_fps = fps
+    annotated_frames = []
+    for index, (state, frame, result, capture_time) in enumerate(zip(states, frames, results, capture_times)):
+        annotated_frame = frame
+        # --- Suivi des personnes (horodatage de capture: la durée d'une piste
+        # ne dépend pas de la cadence d'inférence) ---
+        stage_start = time.perf_counter()
+        state.tracker.update(detection_array(result),
+                             capture_time if capture_time is not None else current_time)
+        tracking_end = time.perf_counter()
+        metrics.observe("stage_seconds", tracking_end - stage_start, stage="tracking", camera=state.name)
+        if state.tracker.tracks:
+            # Les pistes (identifiant, durée) sont dessinées sur une copie privée
+            annotated_frame = frame.copy()
+            state.tracker.draw(annotated_frame)
+        annotation_time = time.perf_counter() - tracking_end
+        
+        # --- Logique de notification (par caméra) --- 
+        notify_if_needed(state, annotated_frame, current_time, capture_time)
+
+        # Ajouter l'information de FPS
+        if annotate:
+            stage_start = time.perf_counter()
+            if annotated_frame is frame:
+                annotated_frame = frame.copy()
+            if state.roi is not None:
+                state.roi.draw(annotated_frame)
+            fps_text = f"Detection: {fps:.1f} FPS" if index in to_infer else "Detection: scene immobile"
+            cv2.putText(annotated_frame, fps_text, (10, 30), 
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            annotation_time += time.perf_counter() - stage_start
+        metrics.observe("stage_seconds", annotation_time, stage="annotation", camera=state.name)
+        annotated_frames.append(annotated_frame)
+    return annotated_frames
+
+def detect_with_yolov8(frame, state=None, capture_time=None, annotate=True):
+    # Détection sur une seule frame (caméra par défaut si state est None).
+    # Elle renvoie TOUJOURS la frame annotée pour les notifications Discord.
+    if frame is None or frame.size == 0:
+        print("Frame invalide passée à detect_with_yolov8")
+        # Renvoyer une frame noire pourrait être mieux qu'un tableau vide
+        return np.zeros((480, 640, 3), dtype=np.uint8) 
+    state = state or get_camera_state()
+    return detect_batch([state], [frame], [capture_time], annotate)[0]
+
+def update_button_visibility(state):
+    # Logique de visibilité du bouton (après la logique de notification de detect_batch)
+    with state.button_state_lock:
+        current_time = time.time()
+        # Rendre visible si une piste est confirmée ET délai de masquage écoulé
+        confirmed = state.tracker.confirmed_tracks()
+        if confirmed and current_time >= state.door_button_hidden_until:
+            track = max(confirmed, key=lambda track: track.duration)
+            changed = not state.door_button_visible or state.door_button_track_id != track.track_id
+            if not state.door_button_visible: # Log seulement si changement d'état
+                print(f"[{state.name}] Conditions remplies (personne #{track.track_id}): Rendre le bouton visible.")
+            state.door_button_visible = True
+            state.door_button_track_id = track.track_id
+            if changed:
+                event_bus.publish("button", button_event(state))
+        # Note: Le bouton n'est rendu invisible que par l'action de clic via /control/door
+        # ou si le serveur redémarre (initialisé à False).
+
+def publish_detection_summary(state, current_time):
+    # Résumé poussé sur /events quand il change (pistes, personnes confirmées),
+    # et au plus une fois par DETECTION_SUMMARY_INTERVAL sinon (fps)
+    summary = {"camera": state.name,
+               "tracks": len(state.tracker.tracks),
+               "confirmed": len(state.tracker.confirmed_tracks())}
+    if summary == state.last_summary and current_time - state.last_summary_time < DETECTION_SUMMARY_INTERVAL:
+        return
+    state.last_summary = summary
+    state.last_summary_time = current_time
+    event_bus.publish("detection", dict(summary, fps=round(state.detection_fps, 1)))
 
 # --- Thread de Détection en Arrière-plan ---
+def detection_frame(camera_name, frame_ref):
+    # Frame passée à YOLO. Un JPEG de la caméra n'est décodé qu'ici; s'il fait au
+    # moins deux fois la taille d'inférence, le décodeur JPEG le réduit directement
+    # (1/2, 1/4, 1/8), ce qui coûte bien moins qu'un décodage complet. Pas de
+    # réduction avec une ROI: ses coordonnées sont celles de la frame complète.
+    if frame_ref.jpeg is None:
+        return frame_ref.frame  # Déjà décodée à la capture (compté dans capture_read)
+    with metrics.timer("stage_seconds", stage="decode", camera=camera_name):
+        if CAMERA_ROIS.get(camera_name):
+            return frame_ref.frame
+        factor = 1
+        while factor < 8 and frame_ref.width // (factor * 2) >= INFERENCE_IMGSZ:
+            factor *= 2
+        return frame_ref.reduced(factor)
+
 def detection_worker():
-    global last_processed_frame, door_button_visible, door_button_hidden_until
+    # Planificateur: à chaque tour, rassemble la dernière frame de chaque caméra
+    # qui en a une nouvelle et les passe en un seul appel YOLOv8.
     print(f"Thread de détection démarré. DEV_MODE: {DEV_MODE}")
-    camera_manager = CameraManager.get_instance()
+    cameras = CameraManager.all_instances()
     
     while True:
-        ret, frame = camera_manager.get_frame()
-        
-        if not ret or frame is None:
-            time.sleep(0.5)
+        # 1. Attendre qu'au moins une caméra ait capturé une frame (pas de sondage)
+        CameraManager.new_frame_event.wait(timeout=1.0)
+        CameraManager.new_frame_event.clear()
+
+        batch = []
+        for camera_manager in cameras:
+            state = camera_states[camera_manager.name]
+            frame_ref = camera_manager.acquire_frame()
+            if frame_ref is None:
+                continue
+            if frame_ref.seq <= state.last_seq:
+                frame_ref.release()
+                continue
+            skipped = frame_ref.seq - state.last_seq - 1 if state.last_seq > 0 else 0
+            state.last_seq = frame_ref.seq
+            # Attente entre la capture et la prise en charge par la détection
+            metrics.observe("stage_seconds", time.time() - frame_ref.timestamp,
+                            stage="queue_wait", camera=state.name)
+            batch.append((state, frame_ref, skipped))
+        if not batch:
             continue
-            
-        # 2. Exécuter la détection
-        annotated = detect_with_yolov8(frame.copy())
-        
-        # 3. Mettre à jour la frame pour le flux web selon DEV_MODE
-        with processed_frame_lock:
-            if DEV_MODE:
-                # En mode DEV, montrer la frame avec les annotations
-                last_processed_frame = annotated.copy()
-            else:
-                # Hors mode DEV, montrer la frame originale sans annotations
-                last_processed_frame = frame.copy() 
-            
-        # 4. Logique de visibilité du bouton (après la logique de notification dans detect_with_yolov8)
-        # Accéder à la variable globale (déjà modifiée dans detect_with_yolov8)
-        current_consecutive_detections = consecutive_human_detections
-        
-        with button_state_lock:
-            current_time = time.time()
-            # Rendre visible si seuil atteint ET délai de masquage écoulé
-            if current_consecutive_detections >= CONSECUTIVE_DETECTION_THRESHOLD and current_time >= door_button_hidden_until:
-                if not door_button_visible: # Log seulement si changement d'état
-                    print("Conditions remplies: Rendre le bouton visible.")
-                door_button_visible = True
-            # Note: Le bouton n'est rendu invisible que par l'action de clic via /control/door
-            # ou si le serveur redémarre (initialisé à False).
-            
-        time.sleep(0.05)
 
-# Afficher les caméras disponibles (Windows seulement)
-try:
-    if os.name == 'nt':  # Windows
+        try:
+            # 2. Exécuter la détection groupée sur les vues en lecture seule du ring
+            annotated_frames = detect_batch(
+                [state for state, _, _ in batch],
+                [detection_frame(state.name, frame_ref) for state, frame_ref, _ in batch],
+                [frame_ref.timestamp for _, frame_ref, _ in batch],
+                annotate=DEV_MODE)
+
+            for (state, frame_ref, skipped), annotated in zip(batch, annotated_frames):
+                # 3. Publier la frame pour le flux web selon DEV_MODE
+                if DEV_MODE:
+                    # En mode DEV, montrer la frame avec les annotations (copie privée)
+                    state.processed_hub.publish(annotated)
+                else:
+                    # Hors mode DEV, montrer la frame originale sans annotations ni copie
+                    state.processed_hub.publish(frame_ref.retain())
+
+                latency_ms = (time.time() - frame_ref.timestamp) * 1000
+                metrics.observe("stage_seconds", latency_ms / 1000, stage="capture_to_publish", camera=state.name)
+                with detection_stats_lock:
+                    detection_stats["frames_processed"] += 1
+                    detection_stats["frames_skipped"] += skipped
+                    detection_stats["last_latency_ms"] = latency_ms
+                    detection_stats["max_latency_ms"] = max(detection_stats["max_latency_ms"], latency_ms)
+
+                # 4. Visibilité du bouton de porte de cette caméra
+                update_button_visibility(state)
+                publish_detection_summary(state, time.time())
+            with detection_stats_lock:
+                detection_stats["last_batch_size"] = len(batch)
+        finally:
+            for _, frame_ref, _ in batch:
+                frame_ref.release()
+
+def list_system_cameras():
+    # Afficher les caméras disponibles (Windows seulement), pendant le démarrage
+    # en arrière-plan: PowerShell met plusieurs secondes à répondre.
+    if os.name != 'nt':
+        return
+    try:
         result = subprocess.run(['powershell', '-Command', "Get-CimInstance Win32_PnPEntity | Where-Object { $_.Caption -like '*camera*' -or $_.Caption -like '*webcam*' } | Select-Object Caption"], 
                              capture_output=True, text=True, check=False)
         if result.returncode == 0:
@@ -334,131 +740,172 @@ try:
                     print(f"- {line.strip()}")
         else:
             print("Impossible de lister les caméras via PowerShell")
-except Exception as e:
-    print(f"Erreur lors de la détection des caméras : {e}")
+    except Exception as e:
+        print(f"Erreur lors de la détection des caméras : {e}")
 
-# Fonction simple pour générer le flux vidéo brut
-def gen_raw_frames():
-    # Obtenir l'instance de la caméra
-    camera_manager = CameraManager.get_instance()
-    
-    while True:
-        ret, frame = camera_manager.get_frame()
-        
-        # Encoder et renvoyer la frame
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame_bytes = buffer.tobytes()
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-        
-        time.sleep(0.02)  # 50 FPS max
+def stream_profile_from_args(args, default_quality):
+    """Profil de flux d'un client à partir des paramètres ?w=&q=&fps=&adaptive=.
 
-# Fonction pour générer le flux vidéo avec détection
-def gen_processed_frames():
-    # Lit la dernière frame traitée par le worker thread
-    global last_processed_frame
-    print("Client connecté au flux traité.")
-    while True:
-        frame_to_send = None
-        with processed_frame_lock:
-            if last_processed_frame is not None:
-                frame_to_send = last_processed_frame.copy()
-            else:
-                # Afficher une image d'attente si aucune frame n'a encore été traitée
-                blank = np.zeros((480, 640, 3), dtype=np.uint8)
-                cv2.putText(blank, "Attente de la premiere frame...", (50, 240), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-                frame_to_send = blank
-                
-        if frame_to_send is not None:
-            ret, buffer = cv2.imencode('.jpg', frame_to_send, [cv2.IMWRITE_JPEG_QUALITY, 85])
-            frame_bytes = buffer.tobytes()
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-        
-        # Contrôler le débit du flux envoyé au client
-        time.sleep(0.04) # ~25 FPS pour le flux
+    w: largeur maximale (px), q: qualité JPEG, fps: cadence maximale,
+    adaptive=0 désactive la baisse automatique pour un client lent.
+    Les valeurs invalides sont ignorées.
+    """
+    def number(name, cast):
+        try:
+            value = cast(args.get(name))
+        except (TypeError, ValueError):
+            return None
+        return value if value > 0 else None
+
+    width = number('w', int)
+    quality = number('q', int)
+    return StreamProfile(width=width,
+                         quality=min(quality, 100) if quality else default_quality,
+                         max_fps=number('fps', float),
+                         adaptive=args.get('adaptive', '1') not in ('0', 'false', 'no'),
+                         # Sans taille ni qualité demandées, le JPEG de la caméra est renvoyé tel quel
+                         passthrough=width is None and quality is None)
+
+# Flux vidéo brut: chaque nouvelle frame capturée est encodée une seule fois
+# par palier et partagée entre tous les clients.
+def gen_raw_frames(camera_name=None, args=None):
+    camera_manager = CameraManager.get_instance(camera_name)
+    return camera_manager.raw_hub.subscribe(stream_profile_from_args(args or {}, RAW_STREAM_QUALITY))
+
+# Flux vidéo avec détection: lit les frames publiées par le worker de détection
+def gen_processed_frames(camera_name=None, args=None):
+    state = get_camera_state(camera_name)
+    return state.processed_hub.subscribe(stream_profile_from_args(args or {}, PROCESSED_STREAM_QUALITY))
 
 @app.route('/')
 def index():
     # Affiche la nouvelle page principale moderne
     return render_template('index.html')
 
-@app.route('/raw_feed')
-def raw_feed():
-    return Response(gen_raw_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+@app.route('/raw_feed', defaults={'camera_name': None})
+@app.route('/raw_feed/<camera_name>')
+def raw_feed(camera_name):
+    if get_camera_state(camera_name) is None:
+        return jsonify({"status": "error", "message": f"Caméra inconnue: {camera_name}"}), 404
+    return Response(gen_raw_frames(camera_name, request.args), mimetype='multipart/x-mixed-replace; boundary=frame')
 
 @app.route('/processed')
 def processed():
     return render_template('processed.html')
 
-@app.route('/video_feed')
-def video_feed():
-    return Response(gen_processed_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+@app.route('/video_feed', defaults={'camera_name': None})
+@app.route('/video_feed/<camera_name>')
+def video_feed(camera_name):
+    if get_camera_state(camera_name) is None:
+        return jsonify({"status": "error", "message": f"Caméra inconnue: {camera_name}"}), 404
+    return Response(gen_processed_frames(camera_name, request.args), mimetype='multipart/x-mixed-replace; boundary=frame')
 
-# --- Fonctions Utilitaires ---
-def setup_log_dir():
-    """Crée le répertoire pour les images de log s'il n'existe pas."""
-    if not os.path.exists(LOG_IMAGE_DIR):
-        try:
-            os.makedirs(LOG_IMAGE_DIR)
-            print(f"Répertoire de logs '{LOG_IMAGE_DIR}' créé.")
-        except OSError as e:
-            print(f"Erreur lors de la création du répertoire '{LOG_IMAGE_DIR}': {e}")
+@app.route('/cameras')
+def list_cameras():
+    return jsonify({"default": DEFAULT_CAMERA, "cameras": list(CAMERA_SOURCES)})
+
+def log_image_written(future):
+    path = future.result()
+    if path is None:
+        print("Erreur lors de la sauvegarde de l'image de log.")
+        return
+    print(f"Image de log sauvegardée: {path}")
+    image_retention.note_file(path)  # Comptée tout de suite dans le budget disque
+    image_retention.note_file(log_thumbnail_path(path))
+
+def log_thumbnail_written(future):
+    if future.result() is not None:
+        image_retention.note_file(future.result())
+
+def remove_log_thumbnail(image_path):
+    # Image du journal supprimée par la rétention: sa vignette ne sert plus
+    try:
+        os.remove(log_thumbnail_path(image_path))
+    except FileNotFoundError:
+        pass
+
+def log_thumbnail_path(image_path):
+    name = os.path.splitext(os.path.basename(image_path))[0]
+    return os.path.join(LOG_THUMBNAIL_DIR, name + THUMBNAIL_EXT)
+
+# Images du journal: /log_images/<nom sans extension> (image complète) ou
+# ?size=thumb (vignette du tableau de bord). Les noms sont uniques et jamais
+# réécrits: cache long « immutable », avec ETag/Last-Modified pour les requêtes
+# conditionnelles. Pour une image écrite avant les vignettes, la vignette est
+# demandée à snapshot_writer et l'image complète est servie cette fois, sans cache.
+@app.route('/log_images/<image_id>')
+def get_log_image(image_id):
+    image_path = safe_join(LOG_IMAGE_DIR, image_id + ".jpg")
+    if image_path is None:
+        return jsonify({"status": "error", "message": "Image inconnue."}), 404
+    if request.args.get('size') == 'thumb':
+        directory, filename = LOG_THUMBNAIL_DIR, image_id + THUMBNAIL_EXT
+        thumbnail_path = os.path.join(directory, filename)
+        if not os.path.exists(thumbnail_path) and os.path.exists(image_path):
+            future = snapshot_writer.submit_thumbnail(image_path, thumbnail_path)
+            future.add_done_callback(log_thumbnail_written)
+            response = send_from_directory(os.path.abspath(LOG_IMAGE_DIR), image_id + ".jpg")
+            response.cache_control.no_cache = True
+            return response
+    else:
+        directory, filename = LOG_IMAGE_DIR, image_id + ".jpg"
+    # Chemin absolu: relatif au répertoire courant, là où les images sont écrites (et non à app.root_path)
+    response = send_from_directory(os.path.abspath(directory), filename, max_age=LOG_IMAGE_CACHE_SECONDS)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
 
 # Nouvelle route pour le contrôle de la porte
 @app.route('/control/door', methods=['POST'])
 def control_door():
-    global door_button_visible, door_button_hidden_until, door_opening_log
+    state = get_camera_state(request.args.get('camera'))
+    if state is None:
+        return jsonify({"status": "error", "message": "Caméra inconnue."}), 404
     
     current_time_for_log = time.time()
-    log_image_filename = None
     log_image_relative_path = None
-    frame_to_log = None
+    future = None
     
-    # Essayer de capturer l'image juste avant de cacher le bouton
-    with processed_frame_lock:
-        if last_processed_frame is not None:
-            frame_to_log = last_processed_frame.copy()
+    # Capturer l'image juste avant de cacher le bouton. L'encodage et l'écriture
+    # sont faits par snapshot_writer: la requête n'attend jamais le disque.
+    # (la référence sur la frame publiée est libérée par l'écrivain après encodage)
+    _, frame_ref = state.processed_hub.acquire_latest()
 
-    if frame_to_log is not None:
-        setup_log_dir() # S'assurer que le dossier existe
-        try:
-            timestamp_str = time.strftime("%Y%m%d_%H%M%S", time.localtime(current_time_for_log))
-            unique_id = str(uuid.uuid4())[:4]
-            log_image_filename = f"log_{timestamp_str}_{unique_id}.jpg"
-            log_image_full_path = os.path.join(LOG_IMAGE_DIR, log_image_filename)
-            success = cv2.imwrite(log_image_full_path, frame_to_log)
-            if success:
-                log_image_relative_path = os.path.join("log_images", log_image_filename).replace("\\", "/") # Chemin relatif pour URL
-                print(f"Image de log sauvegardée: {log_image_relative_path}")
-            else:
-                print(f"Erreur lors de la sauvegarde de l'image de log: {log_image_full_path}")
-        except Exception as e:
-            print(f"Exception lors de la sauvegarde de l'image de log: {e}")
+    if frame_ref is not None:
+        timestamp_str = time.strftime("%Y%m%d_%H%M%S", time.localtime(current_time_for_log))
+        unique_id = str(uuid.uuid4())[:4]
+        log_image_filename = f"log_{state.name}_{timestamp_str}_{unique_id}.jpg"
+        log_image_full_path = os.path.join(LOG_IMAGE_DIR, log_image_filename)
+        log_image_relative_path = os.path.join("log_images", log_image_filename).replace("\\", "/") # Chemin relatif pour URL
+        future = snapshot_writer.submit(frame_ref, log_image_full_path,
+                                        thumbnail_path=log_thumbnail_path(log_image_full_path))
+        future.add_done_callback(log_image_written)
+
+    clip_path = CameraManager.get_instance(state.name).record_clip("porte")
 
     # Mettre à jour l'état du bouton et ajouter au log
-    with button_state_lock:
-        door_button_visible = False
-        door_button_hidden_until = current_time_for_log + 60
-        print(f"SIGNAL: Porte contrôlée. Bouton caché jusqu'à {time.strftime('%H:%M:%S', time.localtime(door_button_hidden_until))}")
-
-        # Ajouter au log (même si l'image n'a pas pu être sauvée)
-        with log_lock:
-            log_entry = {
-                "timestamp": current_time_for_log,
-                "image_path": log_image_relative_path # Sera None si erreur
-            }
-            door_opening_log.insert(0, log_entry) # Ajouter au début
-            # Limiter la taille du log
-            if len(door_opening_log) > MAX_LOG_ENTRIES:
-                # Optionnel: Supprimer l'image la plus ancienne si elle existe
-                oldest_entry = door_opening_log.pop() # Enlever la fin
-                # if oldest_entry.get("image_path"):
-                    # old_img_path = os.path.join("static", oldest_entry["image_path"])
-                    # if os.path.exists(old_img_path): 
-                    #    try: os.remove(old_img_path)
-                    #    except OSError as e: print(f"Could not remove old log image {old_img_path}: {e}")
+    with state.button_state_lock:
+        track_id = state.door_button_track_id
+        state.door_button_visible = False
+        state.door_button_hidden_until = current_time_for_log + 60
+        event_bus.publish("button", button_event(state))
+        print(f"SIGNAL: Porte '{state.name}' contrôlée. Bouton caché jusqu'à {time.strftime('%H:%M:%S', time.localtime(state.door_button_hidden_until))}")
+
+    # Ajouter au log (même si l'image n'a pas pu être sauvée); l'insertion en
+    # base est faite par lots dans le thread d'écriture du journal
+    log_entry = door_log.add({
+        "timestamp": current_time_for_log,
+        "camera": state.name,
+        "image_path": log_image_relative_path, # None si aucune frame disponible
+        "track_id": track_id, # Personne suivie qui a fait apparaître le bouton
+        "clip_path": clip_path # Vidéo pré/post-roll (disponible quelques secondes après)
+    })
+    if future is None:
+        event_bus.publish("log", log_entry)
+    else:
+        # Publiée une fois l'image et sa vignette écrites: le tableau de bord les
+        # demande dès réception de l'événement
+        future.add_done_callback(lambda _: event_bus.publish("log", log_entry))
     
     # Placeholder: Logique d'envoi de signal réelle ici...
     
@@ -467,22 +914,192 @@ def control_door():
 # Nouvelle route pour obtenir l'état du bouton
 @app.route('/button_status')
 def get_button_status():
-    with button_state_lock:
-        # print(f"DEBUG: /button_status requested, visible: {door_button_visible}") # Log de debug si besoin
-        return jsonify({"visible": door_button_visible})
+    state = get_camera_state(request.args.get('camera'))
+    if state is None:
+        return jsonify({"status": "error", "message": "Caméra inconnue."}), 404
+    with state.button_state_lock:
+        return jsonify(button_event(state))
+
+def parse_last_event_id(value):
+    return event_bus.parse_event_id(value)
+
+def events_initial_state():
+    # Événement "state" envoyé à la connexion: état complet des boutons
+    buttons = {}
+    for state in camera_states.values():
+        with state.button_state_lock:
+            buttons[state.name] = button_event(state)
+    return "state", {"default": DEFAULT_CAMERA, "buttons": buttons}
+
+# Flux Server-Sent Events: état du bouton, nouvelles entrées du journal et
+# résumés de détection, poussés dès qu'ils changent (une connexion inactive par
+# client au lieu d'un sondage toutes les 2 secondes). À la connexion, un
+# événement "state" donne l'état complet; Last-Event-ID permet de reprendre
+# après une reconnexion.
+@app.route('/events')
+def events():
+    response = Response(event_bus.subscribe(parse_last_event_id(request.headers.get('Last-Event-ID')),
+                                            initial=events_initial_state),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Pas de mise en tampon derrière un proxy nginx
+    return response
+
+# Statistiques de la chaîne de détection (frames sautées, latences)
+@app.route('/stats')
+def get_stats():
+    with detection_stats_lock:
+        stats = dict(detection_stats)
+    stats["snapshot_writer"] = snapshot_writer.stats()
+    stats["sources"] = {camera_manager.name: camera_manager.stats()
+                        for camera_manager in CameraManager._instances.values()}
+    stats["retention"] = image_retention.stats()
+    stats["clips"] = {camera_manager.name: camera_manager.clip_recorder.stats()
+                      for camera_manager in CameraManager._instances.values()
+                      if camera_manager.clip_recorder is not None}
+    stats["notifications"] = dict(delivery_stats)
+    stats["event_subscribers"] = event_bus.subscriber_count
+    stats["streams"] = {}
+    for camera_manager in CameraManager._instances.values():
+        stats["streams"][f"raw/{camera_manager.name}"] = camera_manager.raw_hub.stats()
+    for state in camera_states.values():
+        stats["streams"][f"processed/{state.name}"] = state.processed_hub.stats()
+    stats["threads"] = threading.active_count()
+    return jsonify(stats)
+
+# --- Métriques Prometheus ---
+# Durées par étape (quantiles sur les dernières mesures de chaque série), plus
+# les compteurs existants lus au moment de la collecte.
+metrics.describe("stage_seconds", "Durée des étapes de la chaîne capture -> détection -> flux -> notification")
+profiler = SamplingProfiler(max_seconds=PROFILER_MAX_SECONDS)
+
+def collect_pipeline_metrics():
+    for camera_manager in list(CameraManager._instances.values()):
+        labels = {"camera": camera_manager.name}
+        capture = camera_manager.capture_stats
+        yield "capture_fps", "gauge", "Cadence de capture", labels, capture["fps"]
+        yield "frames_captured_total", "counter", "Frames capturées", labels, capture["frames"]
+        yield "camera_reconnects_total", "counter", "Réouvertures de la caméra", labels, capture["reconnects"]
+        yield ("dropped_frames_total", "counter", "Frames abandonnées, par étape",
+               dict(labels, stage="capture_ring"), camera_manager.ring.overruns)
+        if hasattr(camera_manager.camera, "stats"):
+            yield ("dropped_frames_total", "counter", "Frames abandonnées, par étape",
+                   dict(labels, stage="source"), camera_manager.camera.stats()["frames_skipped"])
+        if isinstance(camera_manager.camera, SerialJpegSource):
+            serial_stats = camera_manager.camera.stats()
+            yield "serial_bytes_per_second", "gauge", "Débit reçu sur le port série", labels, serial_stats["bytes_per_s"]
+            yield "serial_crc_errors_total", "counter", "Trames série rejetées (CRC)", labels, serial_stats["crc_errors"]
+            yield ("serial_header_errors_total", "counter", "En-têtes de trame série rejetés (CRC)",
+                   labels, serial_stats["header_errors"])
+            yield "serial_resyncs_total", "counter", "Resynchronisations du flux série", labels, serial_stats["resyncs"]
+    for state in camera_states.values():
+        yield "detection_fps", "gauge", "Cadence d'inférence YOLO", {"camera": state.name}, state.detection_fps
+    with detection_stats_lock:
+        stats = dict(detection_stats)
+    yield "dropped_frames_total", "counter", "Frames abandonnées, par étape", {"stage": "detection"}, stats["frames_skipped"]
+    yield "frames_inferred_total", "counter", "Frames passées à YOLO", {}, stats["frames_inferred"]
+    yield "frames_gated_total", "counter", "Frames sans mouvement (YOLO évité)", {}, stats["frames_gated"]
+    hubs = [camera_manager.raw_hub for camera_manager in list(CameraManager._instances.values())]
+    hubs += [state.processed_hub for state in camera_states.values()]
+    for hub in hubs:
+        hub_stats = hub.stats()
+        labels = {"stream": hub.name}
+        yield "stream_clients", "gauge", "Clients MJPEG connectés", labels, hub_stats["subscribers"]
+        yield ("dropped_frames_total", "counter", "Frames abandonnées, par étape",
+               dict(labels, stage="stream"), hub_stats["dropped_frames"])
+        yield "stream_encodes_total", "counter", "Encodages JPEG des flux", labels, hub_stats["encodes"]
+    yield "event_clients", "gauge", "Clients connectés à /events", {}, event_bus.subscriber_count
+    queue_help = "Éléments en attente, par file"
+    yield "queue_depth", "gauge", queue_help, {"queue": "notifications"}, notification_queue.qsize()
+    yield "queue_depth", "gauge", queue_help, {"queue": "snapshots"}, snapshot_writer.stats()["queued"]
+    yield "queue_depth", "gauge", queue_help, {"queue": "door_log"}, door_log.pending_count
+    yield "notifications_sent_total", "counter", "Messages Discord envoyés", {}, delivery_stats["messages_sent"]
+    yield "notification_failures_total", "counter", "Messages Discord abandonnés", {}, delivery_stats["send_failures"]
+    yield "threads", "gauge", "Threads du processus web", {}, threading.active_count()
+    for name, component in startup.snapshot()["components"].items():
+        yield ("startup_component_ready", "gauge", "Composant démarré (1), en cours, dégradé ou en échec (0)",
+               {"component": name}, component["state"] == "ready")
+
+metrics.add_collector(collect_pipeline_metrics)
+
+@app.route('/metrics')
+def get_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# Profil à la demande (piles repliées), désactivé par défaut: /debug/profile?seconds=10
+@app.route('/debug/profile')
+def debug_profile():
+    if not PROFILER_ENABLED:
+        return jsonify({"status": "error", "message": "Profileur désactivé (PROFILER_ENABLED)."}), 404
+    seconds = request.args.get('seconds', 5.0, type=float)
+    interval = request.args.get('interval', 5.0, type=float) / 1000
+    result = profiler.profile(seconds, max(0.001, interval))
+    if result is None:
+        return jsonify({"status": "error", "message": "Un profil est déjà en cours."}), 409
+    return Response(result, mimetype='text/plain')
 
 # Nouvelle route pour récupérer les logs
+# Pagination par curseur (?cursor=<next_cursor>&limit=, curseur opaque), filtres ?since=&until=
+# (timestamps epoch) et ?camera=. L'ETag suit la version du journal: un client
+# qui renvoie If-None-Match sans nouveauté reçoit un 304 sans requête en base.
 @app.route('/logs')
 def get_logs():
-    with log_lock:
-        # Renvoyer une copie pour éviter les modifications concurrentes pendant l'itération
-        return jsonify(list(door_opening_log))
+    try:
+        cursor = DoorLogStore.parse_cursor(request.args.get('cursor'))
+        limit = min(request.args.get('limit', LOGS_PAGE_SIZE, type=int), LOGS_MAX_PAGE_SIZE)
+        since = request.args.get('since', type=float)
+        until = request.args.get('until', type=float)
+    except ValueError:
+        return jsonify({"status": "error", "message": "Paramètres de pagination invalides."}), 400
+    camera = request.args.get('camera')
 
-if __name__ == '__main__':
-    print("Initialisation de l'application...")
-    
-    # Initialiser CameraManager (démarre son thread de capture)
-    camera_manager = CameraManager.get_instance()
+    etag = f"logs-{door_log.version}-{zlib.crc32(request.query_string)}"
+    if request.if_none_match.contains(etag):
+        not_modified = Response(status=304)
+        not_modified.set_etag(etag)
+        return not_modified
+
+    page = door_log.query(cursor=cursor, limit=max(1, limit), since=since, until=until, camera=camera)
+    response = jsonify(page)
+    if not page.get("degraded"):
+        response.set_etag(etag)  # Page partielle (base indisponible): ne pas la mettre en cache
+    return response
+
+# --- Démarrage de la chaîne capture -> détection -> notifications ---
+# Une seule fois par processus, quel que soit le serveur (développement ou ASGI).
+# start_pipeline() rend la main tout de suite: base de données, modèle et
+# caméras démarrent en parallèle en arrière-plan pendant que le serveur web
+# répond déjà (tableau de bord, /healthz); /readyz indique quand tout est prêt.
+_pipeline_lock = threading.Lock()
+_pipeline_started = False
+startup = StartupStatus()
+
+def prepare_storage():
+    # Fichiers laissés par un arrêt brutal, puis nettoyage périodique des images
+    image_retention.remove_orphans(TEMP_IMAGE_DIR, all_files=True)
+    image_retention.remove_orphans(LOG_IMAGE_DIR)
+    image_retention.remove_orphans(LOG_THUMBNAIL_DIR)
+    image_retention.remove_orphans(CLIP_DIR)
+    image_retention.start()
+
+def start_cameras():
+    # Un CameraManager par caméra configurée (chacun ouvre sa caméra dans son
+    # thread de capture); prêt quand chaque caméra a fourni une première frame.
+    list_system_cameras()
+    cameras = CameraManager.all_instances()
+    while not all(camera_manager.capture_stats["frames"] for camera_manager in cameras):
+        time.sleep(0.1)
+
+def start_pipeline():
+    global _pipeline_started
+    with _pipeline_lock:
+        if _pipeline_started:
+            return
+        _pipeline_started = True
+    startup.run("storage", prepare_storage, required=False)
+    startup.run("database", door_log.connect, required=False)  # Sans MySQL: journal en mémoire
+    startup.run("model", load_model)
+    startup.run("cameras", start_cameras)
     
     # Démarrer le bot Discord dans un thread séparé
     print("Démarrage du bot Discord dans un thread...")
@@ -493,19 +1110,44 @@ if __name__ == '__main__':
     print("Démarrage du worker de détection dans un thread...")
     detection_thread = threading.Thread(target=detection_worker, daemon=True)
     detection_thread.start()
+
+def create_app():
+    # Fabrique utilisée par les serveurs (python app.py, asgi.py): lance le
+    # démarrage en arrière-plan et renvoie l'application Flask immédiatement.
+    start_pipeline()
+    return app
+
+# Vivacité: le processus répond (ne dépend d'aucun composant)
+@app.route('/healthz')
+def healthz():
+    return jsonify({"status": "ok", "uptime_s": round(time.time() - startup.started_at, 1)})
+
+# Disponibilité: 503 tant que le modèle et les caméras ne sont pas prêts
+@app.route('/readyz')
+def readyz():
+    status = startup.snapshot()
+    return jsonify(status), 200 if status["ready"] else 503
+
+def stop_pipeline():
+    # Libérer les caméras et les processus d'inférence
+    print("Libération des ressources...")
+    for camera_manager in list(CameraManager._instances.values()):
+        camera_manager.release()
+    if isinstance(yolo_model, InferencePool):
+        yolo_model.close()
+    # Note: Le thread du bot (daemon) s'arrêtera automatiquement avec le processus principal.
+
+if __name__ == '__main__':
+    print("Initialisation de l'application...")
+    flask_app = create_app()
     
-    # Laisser un peu de temps aux threads pour démarrer
-    time.sleep(5) 
-    
-    print("Démarrage du serveur Flask...")
+    print("Démarrage du serveur Flask (développement; production: python asgi.py)...")
     try:
         # Lancer Flask (bloquant jusqu'à l'arrêt)
         # Note: debug=True recharge le code mais peut causer des problèmes avec les threads
         # Il est préférable de le désactiver (False) pour un fonctionnement stable.
-        app.run(debug=False, host='0.0.0.0', port=5000, use_reloader=False)
+        flask_app.run(debug=False, host=SERVER_HOST, port=SERVER_PORT, use_reloader=False)
     finally:
-        # Libérer la caméra à la fermeture (si Flask s'arrête proprement)
-        print("Arrêt de Flask, libération des ressources...")
-        camera_manager.release()
+        print("Arrêt de Flask.")
+        stop_pipeline()
         print("Application terminée.")
-        # Note: Le thread du bot (daemon) s'arrêtera automatiquement avec le processus principal.
@@ -0,0 +1,154 @@
+"""Lancement de production: application ASGI servie par uvicorn.
+
+    python asgi.py                      (ou: uvicorn asgi:application --host 0.0.0.0 --port 5000)
+
+Les flux longs (/video_feed, /raw_feed, /events) sont servis nativement en
+asyncio: chaque client est une tâche qui attend la frame ou l'événement
+suivant, sans thread dédié. Un client lent reçoit toujours la frame la plus
+récente une fois l'envoi précédent terminé (les frames intermédiaires sont
+sautées, jamais accumulées) et, si ses envois restent lents, son flux passe
+à une taille ou une qualité inférieure (voir StreamProfile). Les autres
+routes sont celles de l'application Flask, exécutées via asgiref.
+
+Capture, détection et bot Discord démarrent une seule fois, au démarrage du
+serveur (lifespan), en arrière-plan: /healthz répond dès l'écoute du port,
+/readyz quand le modèle et les caméras sont prêts. Le serveur tourne dans UN processus: les caméras ne
+peuvent être ouvertes qu'une fois et la concurrence des clients est assurée
+par asyncio, pas par des workers supplémentaires.
+"""
+import asyncio
+import json
+import os
+import socket
+from urllib.parse import parse_qsl
+from asgiref.wsgi import WsgiToAsgi
+
+import app as web
+
+flask_application = WsgiToAsgi(web.app)
+
+MJPEG_CONTENT_TYPE = b"multipart/x-mixed-replace; boundary=frame"
+
+# Tampon d'envoi du noyau par connexion. Sans limite, Linux peut mettre en
+# tampon plusieurs Mo pour un client lent avant que send() n'attende: la
+# contre-pression (frames sautées) n'interviendrait qu'après des secondes de retard.
+STREAM_SEND_BUFFER = int(os.getenv("STREAM_SEND_BUFFER", 256 * 1024))
+
+async def send_json(send, status, payload):
+    body = json.dumps(payload).encode()
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"),
+                            (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+async def stream_response(receive, send, content_type, chunks, extra_headers=()):
+    """Envoie un flux sans fin jusqu'à la déconnexion du client.
+
+    send() n'est rappelé qu'une fois l'envoi précédent accepté par le serveur
+    (contrôle de flux d'uvicorn): c'est cette attente qui fait sauter des
+    frames aux clients lents. La déconnexion est surveillée en parallèle pour
+    libérer l'abonnement même quand aucune donnée n'est produite.
+    """
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", content_type),
+                            (b"cache-control", b"no-cache")] + list(extra_headers)})
+
+    async def wait_disconnect():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    watcher = asyncio.ensure_future(wait_disconnect())
+    iterator = chunks.__aiter__()
+    next_chunk = None
+    try:
+        while True:
+            next_chunk = asyncio.ensure_future(iterator.__anext__())
+            done, _ = await asyncio.wait({next_chunk, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if watcher in done:
+                break
+            try:
+                chunk = next_chunk.result()
+            except StopAsyncIteration:
+                break
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+    except OSError:
+        pass  # Client parti pendant l'envoi
+    finally:
+        watcher.cancel()
+        if next_chunk is not None and not next_chunk.done():
+            # Le générateur doit être arrêté avant aclose()
+            next_chunk.cancel()
+            await asyncio.wait({next_chunk})
+        await chunks.aclose()
+
+def route_stream(path, headers, query_string=b""):
+    """Renvoie (content_type, générateur, en-têtes) pour un flux, None si la route n'en est pas un,
+    ou un tuple (404, message) pour une caméra inconnue."""
+    parts = path.strip("/").split("/")
+    if parts[0] in ("video_feed", "raw_feed") and len(parts) <= 2:
+        camera_name = parts[1] if len(parts) == 2 else None
+        state = web.get_camera_state(camera_name)
+        if state is None:
+            return 404, f"Caméra inconnue: {camera_name}"
+        args = dict(parse_qsl(query_string.decode("latin-1")))
+        if parts[0] == "video_feed":
+            profile = web.stream_profile_from_args(args, web.PROCESSED_STREAM_QUALITY)
+            chunks = state.processed_hub.subscribe_async(profile)
+        else:
+            hub = web.CameraManager.get_instance(state.name).raw_hub
+            chunks = hub.subscribe_async(web.stream_profile_from_args(args, web.RAW_STREAM_QUALITY))
+        return MJPEG_CONTENT_TYPE, chunks, ()
+    if path == "/events":
+        last_event_id = web.parse_last_event_id(headers.get(b"last-event-id", b"").decode() or None)
+        chunks = web.event_bus.subscribe_async(last_event_id, initial=web.events_initial_state)
+        return b"text/event-stream", chunks, [(b"x-accel-buffering", b"no")]
+    return None
+
+async def lifespan(receive, send):
+    loop = asyncio.get_running_loop()
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # Rend la main tout de suite: base, modèle et caméras démarrent en
+            # arrière-plan et le serveur accepte les connexions sans les attendre
+            web.create_app()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await loop.run_in_executor(None, web.stop_pipeline)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] == "http" and scope["method"] == "GET":
+        route = route_stream(scope["path"], dict(scope["headers"]), scope.get("query_string", b""))
+        if route is not None:
+            if route[0] == 404:
+                await send_json(send, 404, {"status": "error", "message": route[1]})
+                return
+            content_type, chunks, extra_headers = route
+            await stream_response(receive, send, content_type, chunks, extra_headers)
+            return
+    await flask_application(scope, receive, send)
+
+def listening_socket(host, port, send_buffer):
+    """Socket d'écoute dont les connexions acceptées héritent du tampon d'envoi."""
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if send_buffer:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, send_buffer)
+    sock.bind((host, port))
+    sock.listen(2048)
+    return sock
+
+if __name__ == '__main__':
+    import uvicorn
+    # Un seul processus (voir plus haut); timeout_graceful_shutdown borne l'attente
+    # des flux sans fin à l'arrêt.
+    config = uvicorn.Config(application, timeout_graceful_shutdown=3)
+    print(f"Serveur ASGI sur http://{web.SERVER_HOST}:{web.SERVER_PORT}")
+    uvicorn.Server(config).run(sockets=[listening_socket(web.SERVER_HOST, web.SERVER_PORT, STREAM_SEND_BUFFER)])
@@ -2,6 +2,9 @@ import discord
 import os
 import asyncio
 from Utils.Notifier import notification_queue, notification_sender_task
+from config import (NOTIFICATION_USER_IDS, NOTIFICATION_CHANNEL_IDS, NOTIFICATION_DASHBOARD_URL,
+                    NOTIFICATION_COALESCE_SECONDS, NOTIFICATION_MAX_IMAGES,
+                    NOTIFICATION_CACHE_TTL, NOTIFICATION_MAX_RETRIES)
 
 DISCORD_TOKEN = ""
 
@@ -13,15 +16,28 @@ intents.message_content = True # Nécessaire pour lire le contenu des messages
 intents.members = True 
 
 client = discord.Client(intents=intents)
+sender_task = None  # on_ready est rappelé à chaque reconnexion
 
 @client.event
 async def on_ready():
     """Affiche un message lorsque le bot est connecté et prêt."""
     print(f'Connecté en tant que {client.user}')
     print('------')
-    # Démarrer la tâche d'envoi de notifications en arrière-plan
+    # Démarrer la tâche d'envoi de notifications en arrière-plan (une seule fois)
+    global sender_task
+    if sender_task is not None and not sender_task.done():
+        return
     print("Lancement de la tâche d'envoi de notifications...")
-    asyncio.create_task(notification_sender_task(client))
+    sender_task = asyncio.create_task(notification_sender_task(
+        client,
+        user_ids=NOTIFICATION_USER_IDS,
+        channel_ids=NOTIFICATION_CHANNEL_IDS,
+        coalesce_window=NOTIFICATION_COALESCE_SECONDS,
+        max_images=NOTIFICATION_MAX_IMAGES,
+        cache_ttl=NOTIFICATION_CACHE_TTL,
+        max_retries=NOTIFICATION_MAX_RETRIES,
+        dashboard_url=NOTIFICATION_DASHBOARD_URL,
+    ))
 
 @client.event
 async def on_message(message):
@@ -9,4 +9,142 @@ DEV_MODE = True  # Mettez à False pour la production/démonstration
 # Mettre un entier (ex: 0, 1) pour une caméra locale connectée au PC.
 # Mettre une URL (chaîne de caractères, ex: 'http://192.168.1.10:8080/video') 
 # pour un flux vidéo réseau (IP Camera, autre PC, etc.).
+# Mettre 'serial:<port>' (ex: 'serial:COM5', 'serial:/dev/ttyUSB0?baud=921600')
+# pour l'ESP32-CAM reliée en série (trames JPEG avec longueur et CRC32).
+# Mettre 'replay:<vidéo ou répertoire de JPEG>' pour rejouer un enregistrement
+# (options: ?speed=2 ou ?speed=max, &loop=1, &fps=15 pour les JPEG).
 CAMERA_SOURCE = 0 # 0 pour la webcam par défaut sur le PC
+
+
+# Caméras nommées (multi-caméras)
+# Chaque entrée associe un nom (utilisé dans les URLs, ex: /video_feed/porte,
+# /button_status?camera=porte) à une source, au même format que CAMERA_SOURCE.
+# Chaque caméra a son propre thread de capture et son propre état (détections,
+# notifications, bouton de porte); un seul modèle YOLO les traite en lot.
+# La première entrée est la caméra par défaut des routes sans nom.
+CAMERA_SOURCES = {
+    "porte": CAMERA_SOURCE,
+    # "garage": 'http://192.168.1.11:81/stream',
+}
+
+# Lecture des caméras réseau
+# Une URL http(s):// est lue comme flux MJPEG (ESP32-CAM) par un lecteur dédié
+# qui ne garde que l'image la plus récente. Sans image depuis
+# CAMERA_STALE_FRAME_MS, la caméra est signalée périmée (image d'attente sur le
+# flux); sans données pendant CAMERA_READ_TIMEOUT_SECONDS, la connexion est
+# refaite avec un délai exponentiel plafonné à CAMERA_RECONNECT_MAX_SECONDS.
+CAMERA_STALE_FRAME_MS = 2000
+CAMERA_READ_TIMEOUT_SECONDS = 5
+CAMERA_RECONNECT_MAX_SECONDS = 30
+# Les JPEG d'un flux MJPEG sont gardés tels quels: /raw_feed les renvoie sans
+# décodage ni réencodage, et seule la détection les décode (à taille réduite
+# par le décodeur JPEG quand la frame fait au moins deux fois INFERENCE_IMGSZ
+# et qu'aucune ROI n'est définie pour la caméra).
+CAMERA_JPEG_PASSTHROUGH = True
+# Liaison série de l'ESP32-CAM (source 'serial:'): débit par défaut de l'UART
+# et taille maximale d'une trame (au-delà, l'en-tête est considéré corrompu).
+CAMERA_SERIAL_BAUDRATE = 2_000_000
+CAMERA_SERIAL_MAX_FRAME_BYTES = 512_000
+
+# Filtre de mouvement avant YOLO
+# Quand la scène est immobile, YOLO n'est lancé qu'au rythme du battement et le
+# dernier résultat est réutilisé (une personne immobile reste donc comptée).
+MOTION_GATE_ENABLED = True
+MOTION_PIXEL_THRESHOLD = 25       # Écart de niveau de gris (0-255) pour qu'un pixel soit "en mouvement"
+MOTION_AREA_THRESHOLD = 0.01      # Proportion de pixels en mouvement déclenchant l'inférence
+MOTION_HEARTBEAT_SECONDS = 2.0    # Inférence forcée au moins toutes les N secondes
+
+# Zone utile (ROI) par caméra, en pixels de la frame complète
+# Rectangle (x1, y1, x2, y2) ou polygone [(x, y), ...]. Seule cette zone est
+# passée à YOLO; une détection dont les pieds sont hors du polygone est ignorée
+# (évite les alertes pour la rue derrière la porte). Absent/None: frame complète.
+CAMERA_ROIS = {
+    # "porte": (120, 0, 520, 480),
+    # "porte": [(150, 40), (500, 40), (560, 480), (90, 480)],
+}
+
+# Taille d'entrée de YOLO (côté du carré, multiple de 32). 640 = défaut du modèle;
+# 320 ou 416 réduisent fortement la latence sur CPU, surtout avec une ROI.
+INFERENCE_IMGSZ = 640
+
+# Backend d'inférence YOLO
+# "pytorch": modèle .pt natif; "onnx": ONNX Runtime (CPU); "openvino": OpenVINO (CPU).
+# Les modèles ONNX/OpenVINO sont exportés automatiquement au premier lancement
+# et mis en cache dans models_cache/. En cas d'échec, repli sur PyTorch.
+# Comparer les backends avec: python -m tools.benchmark_backends --clip video.mp4
+INFERENCE_BACKEND = "pytorch"
+YOLO_MODEL_PATH = "yolov8n.pt"  # Modèle nano (le plus petit et plus rapide)
+INFERENCE_WARMUP_RUNS = 3       # Inférences à vide avant l'ouverture des flux
+
+# Processus d'inférence séparés
+# 0: YOLO tourne dans un thread du processus web (par défaut).
+# N > 0: YOLO tourne dans N processus dédiés; les frames passent par mémoire
+# partagée et seules les boîtes reviennent, ce qui libère le GIL pour Flask,
+# la capture et le bot Discord.
+INFERENCE_PROCESSES = 0
+
+# Image jointe aux alertes Discord
+# Encodée en mémoire puis réduite (taille puis qualité JPEG) jusqu'à tenir dans
+# le budget, pour rester sous la limite de pièce jointe de Discord.
+NOTIFICATION_IMAGE_MAX_BYTES = 1_000_000
+NOTIFICATION_IMAGE_MAX_WIDTH = 1280
+
+# Destinataires des alertes Discord
+# Identifiants des utilisateurs (message privé) et des salons notifiés; les
+# envois sont faits en parallèle. Les objets résolus sont gardés en cache.
+NOTIFICATION_USER_IDS = [272795289218318336]
+NOTIFICATION_CHANNEL_IDS = []
+NOTIFICATION_DASHBOARD_URL = "http://192.168.1.183:5000"
+NOTIFICATION_COALESCE_SECONDS = 3.0  # Première alerte envoyée tout de suite; les suivantes de la fenêtre sont fusionnées (galerie)
+NOTIFICATION_MAX_IMAGES = 4          # Images par message (galerie Discord: 4 maximum)
+NOTIFICATION_CACHE_TTL = 3600        # Durée de vie du cache utilisateurs/salons (s)
+NOTIFICATION_MAX_RETRIES = 5         # Nouveaux essais (backoff exponentiel, Retry-After sur 429)
+
+# Suivi des personnes (confirmation d'une présence humaine)
+# Une alerte est envoyée (et le bouton de porte affiché) quand une même personne
+# est suivie pendant TRACK_CONFIRM_SECONDS, quelle que soit la cadence de YOLO.
+# Une frame manquée ne remet rien à zéro: une piste survit TRACK_MAX_AGE_SECONDS
+# sans détection. Une seule alerte par personne suivie.
+TRACK_CONFIRM_SECONDS = 1.0
+TRACK_MAX_AGE_SECONDS = 1.0
+TRACK_IOU_THRESHOLD = 0.3    # Recouvrement minimum pour associer une détection à une piste
+TRACK_LOW_CONFIDENCE = 0.35  # Détections faibles: prolongent une piste sans en créer
+
+# Rétention des images sur disque (carte SD)
+# Un thread supprime les images les plus anciennes dès qu'une limite est
+# dépassée (None: pas de limite). Les répertoires sont parcourus par petits
+# morceaux. Au démarrage, temp_images/ est vidé et les écritures interrompues
+# (*.tmp) sont supprimées.
+RETENTION_INTERVAL_SECONDS = 30
+LOG_IMAGE_MAX_BYTES = 500_000_000        # Images du journal des ouvertures (static/log_images)
+LOG_IMAGE_MAX_AGE_SECONDS = 90 * 24 * 3600
+LOG_IMAGE_MAX_COUNT = 10_000
+TEMP_IMAGE_MAX_BYTES = 50_000_000        # Images temporaires (temp_images)
+TEMP_IMAGE_MAX_AGE_SECONDS = 3600
+
+# Clips vidéo des événements (alerte, ouverture de porte)
+# Les CLIP_PRE_ROLL_SECONDS dernières secondes du flux brut sont gardées en
+# mémoire (JPEG, au plus CLIP_BUFFER_MAX_BYTES par caméra); à chaque événement,
+# un AVI Motion-JPEG pré-roll + post-roll est écrit dans static/clips et lié
+# à l'entrée du journal.
+CLIP_RECORDING_ENABLED = True
+CLIP_PRE_ROLL_SECONDS = 5
+CLIP_POST_ROLL_SECONDS = 5
+CLIP_MAX_SECONDS = 30            # Un clip prolongé par des événements rapprochés ne dépasse pas cette durée
+CLIP_FPS = 5
+CLIP_WIDTH = 640
+CLIP_QUALITY = 70
+# Mémoire par caméra: au plus 2 x CLIP_BUFFER_MAX_BYTES, soit le pré-roll plus
+# les clips (en cours et en attente d'écriture, un seul thread d'écriture) qui
+# partagent le second budget. Si le disque ne suit pas, les nouveaux clips
+# sont refusés (compteur clips_dropped de /stats) jusqu'à ce qu'il rattrape.
+CLIP_BUFFER_MAX_BYTES = 8_000_000
+CLIP_DIR_MAX_BYTES = 1_000_000_000     # Rétention du répertoire des clips
+
+# Instrumentation
+# /metrics (format Prometheus) est toujours disponible. Le profileur par
+# échantillonnage (/debug/profile?seconds=N) relève les piles de tous les
+# threads pendant N secondes: utile pour trouver le chemin chaud, mais il
+# expose le code interne, il est donc désactivé par défaut.
+PROFILER_ENABLED = False
+PROFILER_MAX_SECONDS = 30
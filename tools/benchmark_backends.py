@@ -0,0 +1,86 @@
+"""Compare la latence des backends d'inférence YOLO sur une vidéo enregistrée.
+
+Usage (depuis la racine du projet):
+    python -m tools.benchmark_backends --clip enregistrement.mp4
+    python -m tools.benchmark_backends --clip enregistrement.mp4 --backends pytorch onnx --imgsz 320
+"""
+import argparse
+import json
+import time
+import cv2
+from Utils.InferenceBackends import BACKEND_EXPORT_FORMATS, load_detector
+from config import YOLO_MODEL_PATH, INFERENCE_IMGSZ
+
+def percentile(sorted_values, fraction):
+    """Percentile par rang le plus proche sur une liste déjà triée."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def load_clip(path, max_frames):
+    capture = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = capture.read()
+        if not ret:
+            break
+        frames.append(frame)
+    capture.release()
+    return frames
+
+def benchmark_backend(backend, frames, model_path, imgsz, warmup_runs):
+    detector = load_detector(backend, model_path, imgsz=imgsz, warmup_runs=warmup_runs, fallback=False)
+    if detector is None:
+        return None
+    latencies = []
+    start_time = time.perf_counter()
+    for frame in frames:
+        frame_start = time.perf_counter()
+        detector([frame], conf=0.7, classes=[0], verbose=False)
+        latencies.append((time.perf_counter() - frame_start) * 1000)
+    total_time = time.perf_counter() - start_time
+    latencies.sort()
+    return {
+        "backend": backend,
+        "frames": len(frames),
+        "p50_ms": percentile(latencies, 0.50),
+        "p99_ms": percentile(latencies, 0.99),
+        "fps": len(frames) / total_time if total_time > 0 else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des backends d'inférence YOLO")
+    parser.add_argument("--clip", required=True, help="Vidéo enregistrée à rejouer")
+    parser.add_argument("--backends", nargs="+", default=list(BACKEND_EXPORT_FORMATS),
+                        choices=list(BACKEND_EXPORT_FORMATS))
+    parser.add_argument("--model", default=YOLO_MODEL_PATH)
+    parser.add_argument("--imgsz", type=int, default=INFERENCE_IMGSZ)
+    parser.add_argument("--frames", type=int, default=300, help="Nombre maximum de frames utilisées")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--json", help="Écrire les résultats dans ce fichier JSON")
+    args = parser.parse_args()
+
+    frames = load_clip(args.clip, args.frames)
+    if not frames:
+        raise SystemExit(f"Impossible de lire des frames depuis {args.clip}")
+    print(f"{len(frames)} frames chargées depuis {args.clip}")
+
+    results = []
+    for backend in args.backends:
+        result = benchmark_backend(backend, frames, args.model, args.imgsz, args.warmup)
+        if result is None:
+            print(f"Backend {backend} indisponible, ignoré.")
+            continue
+        results.append(result)
+
+    print(f"\n{'backend':<10} {'p50 (ms)':>10} {'p99 (ms)':>10} {'fps':>8}")
+    for result in results:
+        print(f"{result['backend']:<10} {result['p50_ms']:>10.1f} {result['p99_ms']:>10.1f} {result['fps']:>8.1f}")
+
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump({"clip": args.clip, "imgsz": args.imgsz, "results": results}, output, indent=2)
+
+if __name__ == "__main__":
+    main()
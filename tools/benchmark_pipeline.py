@@ -0,0 +1,267 @@
+"""Benchmark de bout en bout: capture -> détection -> notification -> flux, sur un enregistrement.
+
+Rejoue une vidéo ou un répertoire de JPEG (Utils/ReplaySource.py) dans le
+code de l'application (CameraManager, detection_worker, notify_if_needed,
+FrameBroadcaster), sans MySQL (journal en mémoire) ni Discord (client local
+de tools.fake_discord derrière le vrai DiscordNotifier). Mesure le débit,
+les latences par étape, les alertes envoyées et le pic mémoire, et écrit un
+résultat JSON pour comparer deux exécutions sur la même machine.
+
+Usage (depuis la racine du projet):
+    python -m tools.benchmark_pipeline --replay enregistrement.mp4
+    python -m tools.benchmark_pipeline --replay images/ --speed max --cameras 2 --output base.json
+    python -m tools.benchmark_pipeline --replay enregistrement.mp4 --baseline base.json --max-regression 0.1
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+def percentiles_ms(values):
+    """p50/p95/p99/max en millisecondes (rang le plus proche) d'une liste de secondes."""
+    values = sorted(values)
+    if not values:
+        return None
+    last = len(values) - 1
+    result = {f"p{round(q * 100)}_ms": round(values[min(last, int(q * len(values)))] * 1000, 2)
+              for q in (0.5, 0.95, 0.99)}
+    result["max_ms"] = round(values[-1] * 1000, 2)
+    result["samples"] = len(values)
+    return result
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=False).stdout.strip() or None
+    except OSError:
+        return None
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    # ru_maxrss est en Ko sous Linux, en octets sous macOS
+    peak = resource.getrusage(who).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def configure(args):
+    """Prépare config et l'environnement AVANT l'import de app (lus à l'import)."""
+    os.environ["DATABASE_ENABLED"] = "0"
+    import config
+    source = f"replay:{args.replay}?speed={args.speed}"
+    config.CAMERA_SOURCES.clear()
+    for index in range(args.cameras):
+        config.CAMERA_SOURCES[f"rejeu{index}"] = source
+    config.CLIP_RECORDING_ENABLED = args.clips
+    if args.backend:
+        config.INFERENCE_BACKEND = args.backend
+    if args.processes is not None:
+        config.INFERENCE_PROCESSES = args.processes
+    from Utils.Metrics import metrics
+    metrics.window = args.max_samples  # Toutes les mesures du run, pas seulement les dernières
+
+def start_local_notifier(app):
+    """Remplace le bot Discord par le vrai DiscordNotifier branché sur un client local."""
+    from tools.fake_discord import FakeClient, FakeRecipient
+    from Utils.Notifier import DiscordNotifier
+    import config
+    recipient = FakeRecipient(1, "benchmark", latency=0.05)
+
+    def run_local_bot():
+        notifier = DiscordNotifier(FakeClient(users=[recipient], fetch_latency=0.0), app.notification_queue,
+                                   user_ids=[recipient.id], coalesce_window=config.NOTIFICATION_COALESCE_SECONDS,
+                                   max_images=config.NOTIFICATION_MAX_IMAGES, base_retry_delay=0.1,
+                                   dashboard_url=config.NOTIFICATION_DASHBOARD_URL)
+        asyncio.run(notifier.run())
+
+    app.run_bot = run_local_bot
+    return recipient
+
+def start_stream_clients(app, count, stop):
+    """Clients du flux traité (comme /video_feed), lus dans des threads."""
+    from Utils.StreamHub import StreamProfile
+    clients = []
+
+    def read_stream(hub, result):
+        for part in hub.subscribe(StreamProfile(quality=app.PROCESSED_STREAM_QUALITY, adaptive=False)):
+            result["frames"] += 1
+            result["bytes"] += len(part)
+            if stop.is_set():
+                break
+
+    for state in app.camera_states.values():
+        for _ in range(count):
+            result = {"stream": state.processed_hub.name, "frames": 0, "bytes": 0}
+            threading.Thread(target=read_stream, args=(state.processed_hub, result), daemon=True).start()
+            clients.append(result)
+    return clients
+
+def run(args):
+    configure(args)
+    import app
+    import config
+    from Utils.Metrics import metrics
+    recipient = start_local_notifier(app)
+    stop = threading.Event()
+    clients = start_stream_clients(app, args.stream_clients, stop)
+    rss_after_load = peak_rss_mb()
+
+    # Modèle chargé avant le rejeu: les premières frames ne doivent pas passer sans détection
+    try:
+        app.load_model()
+    except RuntimeError as e:
+        print(f"{e} (mesure sans détection)")
+    started = time.monotonic()
+    app.start_pipeline()
+    cameras = app.CameraManager.all_instances()
+    last_report = started
+    while time.monotonic() - started < args.duration:
+        if all(getattr(camera.camera, "finished", False) for camera in cameras):
+            break
+        if time.monotonic() - last_report >= 5:
+            last_report = time.monotonic()
+            with app.detection_stats_lock:
+                processed = app.detection_stats["frames_processed"]
+            print(f"... {last_report - started:.0f}s, {processed} frames traitées")
+        time.sleep(0.2)
+    replay_seconds = time.monotonic() - started
+
+    # Laisser la détection finir la dernière frame de chaque caméra
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline and any(
+            app.camera_states[camera.name].last_seq < camera.ring.seq for camera in cameras):
+        time.sleep(0.05)
+    elapsed = time.monotonic() - started
+    # Puis les notifications en cours de fusion ou d'envoi
+    time.sleep(config.NOTIFICATION_COALESCE_SECONDS + 1.0 if app.delivery_stats["alerts_received"]
+               or app.notification_queue.qsize() else 0.5)
+    stop.set()
+
+    with app.detection_stats_lock:
+        detection = dict(app.detection_stats)
+    end_to_end = []  # Capture -> frame traitée publiée, toutes caméras
+    stages = {}
+    for labels, summary in metrics.series("stage_seconds"):
+        stage = labels.pop("stage")
+        key = stage + "".join(f"[{value}]" for _, value in sorted(labels.items()))
+        stages[key] = percentiles_ms(list(summary.snapshot()[0]))
+        if stage == "capture_to_publish":
+            end_to_end.extend(summary.snapshot()[0])
+    sources = {camera.name: camera.camera.stats() for camera in cameras}
+    app.stop_pipeline()
+    # Processus d'inférence terminés: leur pic est connu (avant tout autre sous-processus)
+    children_peak = peak_rss_mb(resource.RUSAGE_CHILDREN) if app.INFERENCE_PROCESSES > 0 else None
+
+    frames_replayed = sum(source["frames"] for source in sources.values())
+    return {
+        "run": {
+            "replay": args.replay, "speed": args.speed, "cameras": args.cameras,
+            "stream_clients": args.stream_clients, "clips": args.clips,
+            "backend": app.INFERENCE_BACKEND, "model": app.YOLO_MODEL_PATH, "imgsz": app.INFERENCE_IMGSZ,
+            "inference_processes": app.INFERENCE_PROCESSES, "model_loaded": app.yolo_model is not None,
+            "revision": git_revision(), "python": platform.python_version(),
+            "machine": platform.machine(), "cpus": os.cpu_count(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": {
+            "duration_s": round(elapsed, 2),
+            "replay_s": round(replay_seconds, 2),
+            "frames_replayed": frames_replayed,
+            "frames_processed": detection["frames_processed"],
+            "frames_skipped": detection["frames_skipped"],
+            "frames_inferred": detection["frames_inferred"],
+            "frames_gated": detection["frames_gated"],
+            "throughput_fps": round(detection["frames_processed"] / elapsed, 2) if elapsed > 0 else 0.0,
+            "late_replay_frames": sum(source["late_frames"] for source in sources.values()),
+            "latency": percentiles_ms(end_to_end),
+            "alerts": app.delivery_stats["alerts_received"],
+            "messages_sent": len(recipient.messages),
+            "stream_frames": sum(client["frames"] for client in clients),
+            "stream_mbytes": round(sum(client["bytes"] for client in clients) / 1e6, 2),
+            "peak_rss_mb": peak_rss_mb(),
+            "rss_after_import_mb": rss_after_load,
+            "peak_rss_children_mb": children_peak,
+            "stages": stages,
+        },
+    }
+
+# Indicateurs comparés avec --baseline: (chemin dans "results", True si plus grand = mieux)
+COMPARED = [
+    (("throughput_fps",), True),
+    (("latency", "p50_ms"), False),
+    (("latency", "p95_ms"), False),
+    (("latency", "p99_ms"), False),
+    (("peak_rss_mb",), False),
+]
+
+def compare(report, baseline, max_regression):
+    """Affiche l'écart avec un résultat précédent; renvoie les indicateurs en régression."""
+    regressions = []
+    for path, higher_is_better in COMPARED:
+        current, previous = report["results"], baseline["results"]
+        for key in path:
+            current = (current or {}).get(key)
+            previous = (previous or {}).get(key)
+        if not current or not previous:
+            continue
+        change = (current - previous) / previous
+        worse = -change if higher_is_better else change
+        flag = ""
+        if worse > max_regression:
+            regressions.append(".".join(path))
+            flag = "  <-- RÉGRESSION"
+        print(f"  {'.'.join(path)}: {previous} -> {current} ({change:+.1%}){flag}")
+    if report["results"]["alerts"] != baseline["results"].get("alerts"):
+        print(f"  alertes: {baseline['results'].get('alerts')} -> {report['results']['alerts']}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de bout en bout sur un enregistrement rejoué")
+    parser.add_argument("--replay", required=True, help="Vidéo ou répertoire de JPEG à rejouer")
+    parser.add_argument("--speed", default="1", help="Vitesse de rejeu: 1 (temps réel), 2..., ou max")
+    parser.add_argument("--cameras", type=int, default=1, help="Nombre de caméras rejouant la même source")
+    parser.add_argument("--stream-clients", type=int, default=1, help="Clients du flux traité par caméra")
+    parser.add_argument("--duration", type=float, default=600.0, help="Durée maximale (s)")
+    parser.add_argument("--backend", help="Backend d'inférence (défaut: INFERENCE_BACKEND)")
+    parser.add_argument("--processes", type=int, help="Processus d'inférence (défaut: INFERENCE_PROCESSES)")
+    parser.add_argument("--clips", action="store_true", help="Enregistrer aussi les clips des alertes")
+    parser.add_argument("--max-samples", type=int, default=100_000, help="Mesures gardées par série")
+    parser.add_argument("--output", help="Fichier JSON du résultat")
+    parser.add_argument("--baseline", help="Résultat JSON précédent à comparer")
+    parser.add_argument("--max-regression", type=float, default=0.1,
+                        help="Écart relatif toléré avant de signaler une régression (0.1 = 10%%)")
+    args = parser.parse_args()
+
+    report = run(args)
+    results = report["results"]
+    print(f"\nRejeu de {args.replay} ({args.cameras} caméra(s), vitesse {args.speed}) en {results['duration_s']}s")
+    print(f"  frames: {results['frames_replayed']} rejouées, {results['frames_processed']} traitées "
+          f"({results['throughput_fps']} fps), {results['frames_skipped']} sautées, "
+          f"{results['frames_gated']} sans mouvement")
+    if results["latency"]:
+        latency = results["latency"]
+        print(f"  latence capture -> publication: p50 {latency['p50_ms']} ms, p95 {latency['p95_ms']} ms, "
+              f"p99 {latency['p99_ms']} ms")
+    print(f"  alertes: {results['alerts']} ({results['messages_sent']} message(s) envoyé(s))")
+    memory = f"  mémoire: pic {results['peak_rss_mb']} Mo"
+    if results["peak_rss_children_mb"] is not None:
+        memory += f", {results['peak_rss_children_mb']} Mo (processus d'inférence)"
+    print(memory)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+        print(f"Résultat écrit dans {args.output}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+        print(f"Comparaison avec {args.baseline}:")
+        regressions = compare(report, baseline, args.max_regression)
+        if regressions:
+            print(f"Régression sur: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Client Discord local pour essayer les notifications sans token ni réseau.
+
+FakeClient imite la partie de discord.Client utilisée par Utils.Notifier
+(get_user/fetch_user, get_channel/fetch_channel, send). Les destinataires
+enregistrent les messages reçus et peuvent simuler des erreurs HTTP (429 avec
+Retry-After, 500...) ainsi qu'une latence réseau.
+
+Démonstration (rafale d'alertes fusionnée, 429 retenté):
+    python -m tools.fake_discord
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+
+import discord
+
+from Utils.Notifier import DiscordNotifier, NotificationBridge
+
+class FakeResponse:
+    """Réponse HTTP minimale acceptée par discord.HTTPException."""
+
+    def __init__(self, status, reason="", headers=None):
+        self.status = status
+        self.reason = reason
+        self.headers = headers or {}
+
+def http_error(status, retry_after=None):
+    """Construit l'exception que discord.py lèverait pour ce code HTTP."""
+    headers = {"Retry-After": str(retry_after)} if retry_after is not None else {}
+    response = FakeResponse(status, "fake", headers)
+    error_class = {403: discord.Forbidden, 404: discord.NotFound}.get(status, discord.HTTPException)
+    return error_class(response, f"erreur simulée {status}")
+
+class FakeRecipient:
+    """Utilisateur ou salon: enregistre les envois, échoue selon `failures`.
+
+    `failures` est une liste de codes HTTP (ou (429, retry_after)) consommés
+    un par un aux premiers envois.
+    """
+
+    def __init__(self, object_id, name, failures=(), latency=0.0):
+        self.id = object_id
+        self.name = name
+        self.failures = list(failures)
+        self.latency = latency
+        self.messages = []
+
+    async def send(self, content=None, embeds=None, files=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        if self.failures:
+            failure = self.failures.pop(0)
+            status, retry_after = failure if isinstance(failure, tuple) else (failure, None)
+            raise http_error(status, retry_after)
+        self.messages.append({
+            "time": time.time(),
+            "embeds": len(embeds or []),
+            "files": [getattr(file, "filename", None) for file in files or []],
+        })
+
+class FakeClient:
+    def __init__(self, users=(), channels=(), fetch_latency=0.05):
+        self.users = {user.id: user for user in users}
+        self.channels = {channel.id: channel for channel in channels}
+        self.fetch_latency = fetch_latency
+        self.fetch_count = 0
+
+    def get_user(self, user_id):
+        return None  # Cache interne vide: force le passage par fetch_user
+
+    def get_channel(self, channel_id):
+        return None
+
+    async def fetch_user(self, user_id):
+        return await self._fetch(self.users, user_id)
+
+    async def fetch_channel(self, channel_id):
+        return await self._fetch(self.channels, channel_id)
+
+    async def _fetch(self, registry, object_id):
+        self.fetch_count += 1
+        await asyncio.sleep(self.fetch_latency)
+        if object_id not in registry:
+            raise http_error(404)
+        return registry[object_id]
+
+async def demo(alerts, interval, coalesce_window):
+    user = FakeRecipient(1, "utilisateur", failures=[(429, 0.2)], latency=0.05)
+    channel = FakeRecipient(2, "salon", failures=[500], latency=0.05)
+    client = FakeClient(users=[user], channels=[channel])
+    bridge = NotificationBridge()
+    stats = {key: 0 for key in ("alerts_received", "messages_sent", "alerts_coalesced",
+                                 "send_failures", "retries", "rate_limited")}
+    stats.update(last_delivery_latency_ms=None, max_delivery_latency_ms=0.0)
+    notifier = DiscordNotifier(client, bridge, user_ids=[1], channel_ids=[2],
+                               coalesce_window=coalesce_window, base_retry_delay=0.1,
+                               dashboard_url="http://localhost:5000", stats=stats)
+    runner = asyncio.create_task(notifier.run())
+    await asyncio.sleep(0)  # Laisser run() attacher la passerelle
+
+    def produce():
+        for index in range(alerts):
+            bridge.put_nowait((f"Alerte simulée {index}", b"\xff\xd8fake-jpeg\xff\xd9", time.time()))
+            time.sleep(interval)
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+    await asyncio.to_thread(producer.join)
+    await asyncio.sleep(coalesce_window + 1.0)
+    runner.cancel()
+    return {
+        "stats": stats,
+        "fetch_count": client.fetch_count,
+        "user_messages": user.messages,
+        "channel_messages": channel.messages,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Essai des notifications Discord avec un client local")
+    parser.add_argument("--alerts", type=int, default=6, help="Nombre d'alertes envoyées")
+    parser.add_argument("--interval", type=float, default=0.2, help="Secondes entre deux alertes")
+    parser.add_argument("--coalesce", type=float, default=1.0, help="Fenêtre de fusion (s)")
+    args = parser.parse_args()
+    report = asyncio.run(demo(args.alerts, args.interval, args.coalesce))
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Serveur MJPEG local qui imite le flux /stream d'une ESP32-CAM.
+
+Permet d'essayer la lecture des caméras réseau (Utils/MjpegSource.py) sans
+matériel, y compris les pannes: coupure de connexion, flux figé, serveur
+arrêté puis relancé.
+
+    python -m tools.fake_mjpeg_server --port 8081 --fps 15
+    python -m tools.fake_mjpeg_server --video clip.mp4 --drop-every 20 --stall-every 45 --stall-seconds 5
+
+puis dans config.py: CAMERA_SOURCES = {"porte": "http://127.0.0.1:8081/stream"}
+"""
+import argparse
+import http.server
+import time
+import cv2
+import numpy as np
+
+# Même format que l'exemple CameraWebServer de l'ESP32
+PART_BOUNDARY = "123456789000000000000987654321"
+
+class FrameSource:
+    """Images JPEG d'une vidéo (en boucle) ou d'une mire animée."""
+
+    def __init__(self, video=None, width=640, height=480, quality=80):
+        self.video = video
+        self.width = width
+        self.height = height
+        self.quality = quality
+        self.capture = cv2.VideoCapture(video) if video else None
+        self.index = 0
+
+    def next_jpeg(self):
+        frame = None
+        if self.capture is not None:
+            ret, frame = self.capture.read()
+            if not ret:
+                self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = self.capture.read()
+                frame = frame if ret else None
+        if frame is None:
+            frame = np.full((self.height, self.width, 3), 60, np.uint8)
+            x = (self.index * 8) % self.width
+            cv2.rectangle(frame, (x, 150), (x + 80, 330), (0, 200, 255), -1)
+        cv2.putText(frame, f"#{self.index} {time.strftime('%H:%M:%S')}", (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+        self.index += 1
+        ret, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        return buffer.tobytes()
+
+def make_handler(options):
+    class StreamHandler(http.server.BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            print(f"[fake_mjpeg] {self.address_string()} {format % args}")
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/stream":
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", f"multipart/x-mixed-replace;boundary={PART_BOUNDARY}")
+            self.end_headers()
+            source = FrameSource(options.video, options.width, options.height, options.quality)
+            started = time.monotonic()
+            next_stall = options.stall_every
+            interval = 1.0 / options.fps
+            try:
+                while True:
+                    elapsed = time.monotonic() - started
+                    if options.drop_every and elapsed >= options.drop_every:
+                        print("[fake_mjpeg] Coupure simulée de la connexion.")
+                        return
+                    if next_stall and elapsed >= next_stall:
+                        print(f"[fake_mjpeg] Flux figé pendant {options.stall_seconds}s.")
+                        time.sleep(options.stall_seconds)
+                        next_stall += options.stall_every
+                    jpeg = source.next_jpeg()
+                    headers = "Content-Type: image/jpeg\r\n"
+                    if not options.no_length:
+                        headers += f"Content-Length: {len(jpeg)}\r\n"
+                    self.wfile.write(f"\r\n--{PART_BOUNDARY}\r\n{headers}\r\n".encode() + jpeg)
+                    self.wfile.flush()
+                    time.sleep(interval)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # Client parti
+
+    return StreamHandler
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur MJPEG de test (façon ESP32-CAM)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--fps", type=float, default=15.0)
+    parser.add_argument("--quality", type=int, default=80, help="Qualité JPEG")
+    parser.add_argument("--video", help="Vidéo diffusée en boucle (sinon mire animée)")
+    parser.add_argument("--width", type=int, default=640, help="Largeur de la mire animée")
+    parser.add_argument("--height", type=int, default=480, help="Hauteur de la mire animée")
+    parser.add_argument("--drop-every", type=float, default=0, help="Coupe chaque connexion après N secondes")
+    parser.add_argument("--stall-every", type=float, default=0, help="Fige le flux toutes les N secondes")
+    parser.add_argument("--stall-seconds", type=float, default=5.0, help="Durée d'un flux figé")
+    parser.add_argument("--no-length", action="store_true", help="Parties sans Content-Length")
+    options = parser.parse_args()
+
+    server = http.server.ThreadingHTTPServer((options.host, options.port), make_handler(options))
+    print(f"Flux MJPEG sur http://{options.host}:{options.port}/stream")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
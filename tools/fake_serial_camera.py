@@ -0,0 +1,116 @@
+"""ESP32-CAM série simulée sur un pseudo-terminal (pty), pour essayer la caméra série sans carte.
+
+Écrit des trames JPEG (format de Utils/SerialSource.py) au débit d'une UART
+réelle (--baud), avec des corruptions et pertes d'octets à la demande pour
+vérifier la resynchronisation. Linux/macOS seulement (pty).
+
+    python -m tools.fake_serial_camera --jpegs images/ --fps 10
+    python -m tools.fake_serial_camera --video clip.mp4 --corrupt-every 20 --drop-every 50 --link /tmp/esp32cam
+
+puis dans config.py: CAMERA_SOURCES = {"porte": "serial:/tmp/esp32cam"} (ou le /dev/pts/N affiché).
+"""
+import argparse
+import os
+import random
+import select
+import time
+import tty
+
+from tools.fake_mjpeg_server import FrameSource
+from Utils.SerialSource import FRAME_HEADER, encode_frame
+
+class JpegFiles:
+    """JPEG d'un répertoire, renvoyés en boucle dans l'ordre des noms."""
+
+    def __init__(self, path):
+        self.files = sorted(os.path.join(path, name) for name in os.listdir(path)
+                            if name.lower().endswith((".jpg", ".jpeg")))
+        if not self.files:
+            raise SystemExit(f"Aucune image JPEG dans '{path}'.")
+        self.index = 0
+
+    def next_jpeg(self):
+        path = self.files[self.index % len(self.files)]
+        self.index += 1
+        with open(path, "rb") as image_file:
+            return image_file.read()
+
+def write_paced(fd, data, bytes_per_second, timeout=0.5):
+    """Écrit au débit de l'UART. Renvoie False si personne ne lit (le reste est perdu, comme sur une UART)."""
+    chunk_size = max(64, int(bytes_per_second / 100))  # ~10 ms de données par écriture
+    for offset in range(0, len(data), chunk_size):
+        chunk = data[offset:offset + chunk_size]
+        _, writable, _ = select.select([], [fd], [], timeout)
+        if not writable:
+            return False
+        os.write(fd, chunk)
+        time.sleep(len(chunk) / bytes_per_second)
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="ESP32-CAM série simulée (pseudo-terminal)")
+    parser.add_argument("--jpegs", help="Répertoire de JPEG rejoués en boucle")
+    parser.add_argument("--video", help="Vidéo rejouée en boucle (sinon mire animée)")
+    parser.add_argument("--width", type=int, default=640, help="Largeur de la mire animée")
+    parser.add_argument("--height", type=int, default=480, help="Hauteur de la mire animée")
+    parser.add_argument("--quality", type=int, default=80, help="Qualité JPEG (vidéo, mire)")
+    parser.add_argument("--fps", type=float, default=10.0, help="Cadence maximale (le débit peut la limiter)")
+    parser.add_argument("--baud", type=int, default=2_000_000, help="Débit simulé de l'UART (bauds)")
+    parser.add_argument("--corrupt-every", type=int, default=0,
+                        help="Inverse un octet d'une trame sur N (en alternance dans l'en-tête et dans le JPEG)")
+    parser.add_argument("--drop-every", type=int, default=0, help="Perd 100 octets d'une trame sur N")
+    parser.add_argument("--link", help="Lien symbolique stable vers le pseudo-terminal")
+    options = parser.parse_args()
+
+    source = JpegFiles(options.jpegs) if options.jpegs else FrameSource(
+        options.video, options.width, options.height, options.quality)
+    master, slave = os.openpty()
+    tty.setraw(slave)  # Pas d'écho ni de traitement de ligne sur le port simulé
+    port = os.ttyname(slave)
+    if options.link:
+        if os.path.islink(options.link):
+            os.remove(options.link)
+        os.symlink(port, options.link)
+        port = f"{options.link} -> {port}"
+    print(f"Port série simulé: {port} ({options.baud} bauds)")
+
+    bytes_per_second = options.baud / 10  # 8N1: 10 bits par octet
+    interval = 1.0 / options.fps
+    seq, sent, lost, corruptions = 0, 0, 0, 0
+    started = last_report = time.monotonic()
+    try:
+        while True:
+            frame_start = time.monotonic()
+            frame = bytearray(encode_frame(source.next_jpeg(), seq))
+            seq += 1
+            if options.corrupt_every and seq % options.corrupt_every == 0:
+                corruptions += 1
+                # Une fois sur deux dans l'en-tête (MAGIC, longueur, CRC...), sinon dans le JPEG
+                if corruptions % 2:
+                    position = random.randrange(0, FRAME_HEADER.size)
+                else:
+                    position = random.randrange(FRAME_HEADER.size, len(frame))
+                frame[position] ^= 0xFF
+            if options.drop_every and seq % options.drop_every == 0:
+                position = random.randrange(0, max(1, len(frame) - 100))
+                del frame[position:position + 100]
+            if write_paced(master, bytes(frame), bytes_per_second):
+                sent += 1
+            else:
+                lost += 1
+            now = time.monotonic()
+            if now - last_report >= 5:
+                print(f"[fake_serial] {sent} trames envoyées ({sent / (now - started):.1f}/s), "
+                      f"{lost} perdues faute de lecteur")
+                last_report = now
+            time.sleep(max(0.0, interval - (now - frame_start)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if options.link and os.path.islink(options.link):
+            os.remove(options.link)
+        os.close(master)
+        os.close(slave)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Test de charge des flux MJPEG: N clients simultanés, dont certains lents.
+
+Lancer le serveur (python asgi.py), puis:
+    python -m tools.load_test_streams --clients 50 --duration 30
+    python -m tools.load_test_streams --clients 50 --slow 10 --json
+
+Chaque client est une connexion HTTP brute (asyncio, sans dépendance) qui
+compte les frames reçues. Les clients lents ne lisent que quelques Ko par
+intervalle: le serveur doit leur sauter des frames sans accumuler de retard
+ni de mémoire. /stats est lu pendant le test pour relever le nombre de
+threads du serveur et les frames sautées par flux.
+"""
+import argparse
+import asyncio
+import json
+import socket
+import statistics
+import time
+from urllib.parse import urlsplit
+
+BOUNDARY = b"--frame"
+
+async def http_get_json(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    _, _, body = data.partition(b"\r\n\r\n")
+    return json.loads(body)
+
+async def stream_client(host, port, path, duration, slow_read=None):
+    """Lit le flux pendant `duration` s. Renvoie (frames, octets, latence de la première frame)."""
+    if slow_read:
+        # Petit tampon de réception: simule un lien lent plutôt qu'un tampon local de plusieurs Mo
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 16 * 1024)
+        sock.setblocking(False)
+        await asyncio.get_running_loop().sock_connect(sock, (host, port))
+        reader, writer = await asyncio.open_connection(sock=sock)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+    await writer.drain()
+    start_time = time.monotonic()
+    deadline = start_time + duration
+    frames, received, first_frame = 0, 0, None
+    tail = b""
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                chunk = await asyncio.wait_for(reader.read(slow_read[0] if slow_read else 65536), remaining)
+            except asyncio.TimeoutError:
+                break
+            if not chunk:
+                break
+            received += len(chunk)
+            data = tail + chunk
+            count = data.count(BOUNDARY)
+            if count and first_frame is None:
+                first_frame = time.monotonic() - start_time
+            frames += count
+            tail = data[-(len(BOUNDARY) - 1):]
+            if slow_read:
+                await asyncio.sleep(slow_read[1])
+    finally:
+        writer.close()
+    return frames, received, first_frame
+
+async def run(url, clients, slow, duration, slow_bytes, slow_interval):
+    parts = urlsplit(url)
+    host, port, path = parts.hostname, parts.port or 80, parts.path or "/video_feed"
+    before = await http_get_json(host, port, "/stats")
+
+    async def sample_stats():
+        await asyncio.sleep(duration / 2)
+        return await http_get_json(host, port, "/stats")
+
+    tasks = [stream_client(host, port, path, duration,
+                           (slow_bytes, slow_interval) if index < slow else None)
+             for index in range(clients)]
+    started = time.monotonic()
+    results, during = await asyncio.gather(asyncio.gather(*tasks), sample_stats())
+    elapsed = time.monotonic() - started
+    await asyncio.sleep(1.0)  # Laisser le serveur constater les déconnexions
+    after = await http_get_json(host, port, "/stats")
+
+    def summary(selected):
+        if not selected:
+            return None
+        fps = [frames / duration for frames, _, _ in selected]
+        return {"clients": len(selected),
+                "fps_min": round(min(fps), 2), "fps_median": round(statistics.median(fps), 2),
+                "fps_max": round(max(fps), 2),
+                "mbytes": round(sum(received for _, received, _ in selected) / 1e6, 2),
+                "first_frame_s_max": max((first or 0) for _, _, first in selected)}
+
+    return {
+        "url": url,
+        "duration_s": round(elapsed, 1),
+        "fast_clients": summary(results[slow:]),
+        "slow_clients": summary(results[:slow]),
+        "server_threads": {"before": before.get("threads"), "during": during.get("threads"),
+                           "after": after.get("threads")},
+        "streams_during": during.get("streams"),
+        "streams_after": after.get("streams"),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge des flux MJPEG")
+    parser.add_argument("--url", default="http://127.0.0.1:5000/video_feed", help="URL du flux")
+    parser.add_argument("--clients", type=int, default=50, help="Nombre de clients simultanés")
+    parser.add_argument("--slow", type=int, default=5, help="Dont clients lents")
+    parser.add_argument("--duration", type=float, default=20.0, help="Durée du test (s)")
+    parser.add_argument("--slow-bytes", type=int, default=4096, help="Octets lus par un client lent à chaque lecture")
+    parser.add_argument("--slow-interval", type=float, default=0.1, help="Pause d'un client lent entre deux lectures (s)")
+    parser.add_argument("--json", action="store_true", help="Sortie JSON brute")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.url, args.clients, min(args.slow, args.clients), args.duration,
+                             args.slow_bytes, args.slow_interval))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"Test de {report['duration_s']}s sur {args.url}")
+    for label in ("fast_clients", "slow_clients"):
+        result = report[label]
+        if result:
+            print(f"  {label}: {result['clients']} clients, fps min/médiane/max "
+                  f"{result['fps_min']}/{result['fps_median']}/{result['fps_max']}, "
+                  f"{result['mbytes']} Mo, première frame <= {result['first_frame_s_max']:.2f}s")
+    threads = report["server_threads"]
+    print(f"  threads serveur: avant {threads['before']}, pendant {threads['during']}, après {threads['after']}")
+    for name, stream in (report["streams_after"] or {}).items():
+        during = (report["streams_during"] or {}).get(name, {})
+        print(f"  flux {name}: {during.get('subscribers')} abonnés pendant le test, "
+              f"{stream['encodes']} encodages, {stream['dropped_frames']} frames sautées (cumul)")
+
+if __name__ == "__main__":
+    main()